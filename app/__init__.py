@@ -1,9 +1,6 @@
 import os
-import json
-from flask import Flask
+from flask import Flask, flash, redirect, request, url_for
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials
 import datetime
 
 # Load environment variables
@@ -11,12 +8,41 @@ load_dotenv()
 
 def create_app():
     app = Flask(__name__)
-    app.config['SECRET_KEY'] = os.urandom(24)
     
-    # Initialize Firebase Admin SDK
-    service_account = os.getenv('SERVICE_ACCOUNT')
-    cred = credentials.Certificate(json.loads(service_account))
-    firebase_admin.initialize_app(cred)
+    # Sessions are kept server-side and shared by all worker processes (see
+    # app/models/session_store.py); the key that signs their IDs must be the
+    # same in every worker and survive restarts
+    from app.models.clients import DATA_BACKEND
+    from app.models.session_store import ServerSideSessionInterface, create_store, load_secret_key
+    app.config['SECRET_KEY'] = load_secret_key(os.getenv('SECRET_KEY_FILE', '.secret_key'))
+    app.config['PERMANENT_SESSION_LIFETIME'] = datetime.timedelta(hours=int(os.getenv('SESSION_LIFETIME_HOURS', 12)))
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.session_interface = ServerSideSessionInterface(create_store(
+        os.getenv('SESSION_BACKEND', 'memory' if DATA_BACKEND == 'memory' else 'sqlite'),
+        path=os.getenv('SESSION_STORE_PATH', 'sessions.sqlite3'),
+        redis_url=os.getenv('SESSION_REDIS_URL')
+    ))
+    
+    # Reject oversized submissions from the Content-Length header, before any
+    # of the body is read: five full-size attachments plus the form fields
+    from app.models.upload_utils import MAX_ATTACHMENTS, MAX_ATTACHMENT_SIZE
+    app.config['MAX_CONTENT_LENGTH'] = MAX_ATTACHMENTS * MAX_ATTACHMENT_SIZE + 1024 * 1024
+    
+    # Firebase clients are created lazily in each worker process
+    # (see app/models/clients.py), so nothing is initialized here
+    
+    @app.errorhandler(413)
+    def request_too_large(e):
+        flash('The upload is too large. Attach at most 5 files of up to 5MB each.', 'danger')
+        return redirect(request.referrer or url_for('main.index'))
+    
+    # Per-route latency, status codes and Firestore usage, served on /metrics
+    from app.models.metrics import install_request_metrics
+    install_request_metrics(app)
+    
+    # Fingerprinted, precompressed static files built by build_assets.py
+    from app.models.assets import install_assets
+    install_assets(app)
     
     # Add context processor for datetime
     @app.context_processor
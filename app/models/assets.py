@@ -0,0 +1,264 @@
+"""
+Fingerprinted, precompressed static files
+
+build_assets.py copies every file under app/static into app/static/dist
+with a content hash in its name (css/style.css becomes
+dist/css/style.<hash>.css), minifies the stylesheets and scripts with
+rcssmin and rjsmin, and writes gzip and brotli versions of the text files
+next to them. dist/manifest.json maps each source file to its built copy.
+The build needs those three packages and fails without them; serving the
+built files does not.
+
+install_assets() makes url_for('static', filename=...) point at the built
+copies, and serves them with a year-long immutable Cache-Control in the
+best encoding the browser accepts. A changed file gets a new name, so
+browsers never have to check back for the old one. Files that are not in
+the manifest, or changed since the last build, are served from app/static
+as before.
+
+Third-party files (VENDOR_FILES) are served like our own once they are
+committed under app/static/vendor, so pages make no requests to a CDN.
+Templates link to them with vendor_url(), which falls back to the pinned
+CDN copy of the same release while the file is not there.
+"""
+
+import os
+import re
+import json
+import gzip
+import hashlib
+import mimetypes
+import posixpath
+from flask import request, send_from_directory, url_for
+
+# Needed by build_assets() only, so the application can serve without them
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+BUILD_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# A year, the longest max-age browsers honour
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Only text files are worth compressing; images are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+MIN_COMPRESS_SIZE = 256
+
+# Encodings in order of preference: (Accept-Encoding name, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Third-party files under app/static: path -> CDN URL of the same pinned release
+VENDOR_FILES = {
+    'vendor/chart.js/chart.min.js': 'https://cdn.jsdelivr.net/npm/chart.js@3.7.1/dist/chart.min.js'
+}
+
+# Manifest Functions
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def manifest_path(static_folder):
+    return os.path.join(static_folder, BUILD_DIR, MANIFEST_NAME)
+
+def load_manifest(static_folder):
+    """Source path -> manifest entry, leaving out files changed since the last build"""
+    try:
+        with open(manifest_path(static_folder), encoding='utf-8') as f:
+            files = json.load(f).get('files', {})
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error loading static manifest: {e}")
+        return {}
+
+    manifest = {}
+    for source, entry in files.items():
+        try:
+            with open(os.path.join(static_folder, source), 'rb') as f:
+                current = _sha256(f.read())
+        except OSError:
+            current = None
+        built = os.path.join(static_folder, *entry['path'].split('/'))
+        if current == entry['source'] and os.path.exists(built):
+            manifest[source] = entry
+        else:
+            print(f"Static file {source} changed since the last build; serving it unversioned")
+    return manifest
+
+# Minification
+
+_CSS_URLS = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+def minify_css(text):
+    return rcssmin.cssmin(text)
+
+def minify_js(text):
+    return rjsmin.jsmin(text)
+
+def _rewrite_css_urls(text, source, paths):
+    """Point relative url() references at the built copies of the files"""
+    folder = posixpath.dirname(source)
+
+    def replace(match):
+        quote, url = match.groups()
+        if re.match(r'^([a-z]+:|/|#)', url, re.I):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(folder, path))
+        if target not in paths:
+            return match.group(0)
+        built = posixpath.relpath(paths[target], posixpath.join(BUILD_DIR, folder))
+        return f"url({quote}{built}{suffix}{quote})"
+    return _CSS_URLS.sub(replace, text)
+
+# Build Functions
+
+def missing_build_packages():
+    """Names of the packages build_assets() needs that are not installed"""
+    modules = (('rcssmin', rcssmin), ('rjsmin', rjsmin), ('brotli', brotli))
+    return [name for name, module in modules if module is None]
+
+def missing_vendor_files(static_folder):
+    """(path, CDN URL) of the third-party files that are not in app/static"""
+    return [(path, url) for path, url in VENDOR_FILES.items()
+            if not os.path.isfile(os.path.join(static_folder, *path.split('/')))]
+
+def _source_files(static_folder):
+    """Relative paths of the static files, images before stylesheets that may refer to them"""
+    sources = []
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder) and BUILD_DIR in dirs:
+            dirs.remove(BUILD_DIR)
+        dirs.sort()
+        for name in sorted(files):
+            sources.append(os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/'))
+    return sorted(sources, key=lambda source: source.endswith('.css'))
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+def build_assets(static_folder, clean=False, on_file=None):
+    """Fingerprint, minify and precompress every static file, and write the manifest
+
+    Built files of earlier builds are kept, so pages rendered before a
+    deploy can still load them, unless clean is set. Raises RuntimeError
+    if a build package is missing.
+    """
+    packages = missing_build_packages()
+    if packages:
+        raise RuntimeError(f"Missing build packages: {', '.join(packages)} (pip install -r requirements.txt)")
+
+    build_folder = os.path.join(static_folder, BUILD_DIR)
+    files = {}
+    paths = {}
+
+    for source in _source_files(static_folder):
+        with open(os.path.join(static_folder, source), 'rb') as f:
+            original = f.read()
+
+        data = original
+        minified = '.min.' in posixpath.basename(source)
+        if source.endswith('.css'):
+            text = _rewrite_css_urls(original.decode('utf-8'), source, paths)
+            data = (text if minified else minify_css(text)).encode('utf-8')
+        elif source.endswith('.js') and not minified:
+            data = minify_js(original.decode('utf-8')).encode('utf-8')
+
+        stem, extension = posixpath.splitext(source)
+        path = f"{BUILD_DIR}/{stem}.{_sha256(data)[:12]}{extension}"
+        target = os.path.join(static_folder, *path.split('/'))
+        _write(target, data)
+
+        encodings = []
+        if source.endswith(COMPRESSIBLE_EXTENSIONS) and len(data) >= MIN_COMPRESS_SIZE:
+            compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0),
+                          'br': brotli.compress(data, quality=11)}
+            for encoding, suffix in ENCODINGS:
+                if encoding in compressed and len(compressed[encoding]) < len(data):
+                    _write(target + suffix, compressed[encoding])
+                    encodings.append(encoding)
+
+        paths[source] = path
+        files[source] = {'path': path, 'source': _sha256(original), 'encodings': encodings}
+        if on_file:
+            on_file(source, path, len(original), len(data), encodings)
+
+    _write(manifest_path(static_folder), json.dumps({'files': files}, indent=2, sort_keys=True).encode('utf-8'))
+
+    removed = 0
+    if clean:
+        keep = {MANIFEST_NAME}
+        for entry in files.values():
+            keep.add(entry['path'][len(BUILD_DIR) + 1:])
+            keep.update(entry['path'][len(BUILD_DIR) + 1:] + suffix for _, suffix in ENCODINGS)
+        for root, dirs, names in os.walk(build_folder):
+            for name in names:
+                relative = os.path.relpath(os.path.join(root, name), build_folder).replace(os.sep, '/')
+                if relative not in keep:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+    return files, removed
+
+# Serving
+
+def install_assets(app):
+    """Serve fingerprinted static files through url_for('static', ...), and add vendor_url() to templates"""
+    static_folder = app.static_folder
+    manifest = load_manifest(static_folder)
+    built = {entry['path']: entry for entry in manifest.values()}
+    cdn_urls = dict(missing_vendor_files(static_folder))
+    for path, url in cdn_urls.items():
+        print(f"Third-party file app/static/{path} is missing; linking to {url}")
+
+    @app.template_global()
+    def vendor_url(path):
+        """URL of a third-party file: our copy when it is committed, otherwise the pinned CDN copy"""
+        if path in cdn_urls:
+            return cdn_urls[path]
+        return url_for('static', filename=path)
+
+    @app.url_defaults
+    def fingerprint_static_url(endpoint, values):
+        if endpoint == 'static':
+            entry = manifest.get(values.get('filename'))
+            if entry is not None:
+                values['filename'] = entry['path']
+
+    def static(filename):
+        entry = built.get(filename)
+        if entry is None:
+            return app.send_static_file(filename)
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        for encoding, suffix in ENCODINGS:
+            if encoding in entry['encodings'] and request.accept_encodings[encoding]:
+                response = send_from_directory(static_folder, filename + suffix, mimetype=mimetype,
+                                               max_age=IMMUTABLE_MAX_AGE)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(static_folder, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+
+        if entry['encodings']:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = static
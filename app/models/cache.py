@@ -0,0 +1,89 @@
+import threading
+import time
+import copy
+from collections import OrderedDict
+
+# Sentinel so cached None values can be told apart from cache misses
+_MISSING = object()
+
+class TTLCache:
+    """Small thread-safe in-process cache with a time-to-live and LRU eviction
+
+    Each worker process keeps its own copy, so this is only suitable for data
+    that changes rarely and where every write goes through this process's
+    invalidation (or where serving a value up to `ttl` seconds old is fine).
+    """
+
+    def __init__(self, maxsize=128, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a value loaded before one is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return a copy of the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store a copy of value under key, evicting the least recently used entry if full"""
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() to fill it on a miss
+
+        If the cache is invalidated while loader() runs, the value may
+        predate the change, so it is returned but not stored.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            with self._lock:
+                generation = self._generation
+            value = loader()
+            with self._lock:
+                if self._generation == generation:
+                    self._store(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or the whole cache when no key is given"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        """Hit/miss counters and current size, for monitoring"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
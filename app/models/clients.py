@@ -0,0 +1,201 @@
+"""
+Per-process Firebase clients
+
+Nothing is created at import time. The Firebase Admin app, the Firestore
+client, Firebase Auth and the pyrebase auth/storage clients are built the
+first time they are used in a process, and built again in a child process
+after a fork. gRPC channels do not survive fork(), so this lets a pre-fork
+server (gunicorn) import the application in the master and still give
+every worker its own working connection. Call warm_clients() when a worker
+boots to open that connection before the first request arrives.
+
+The web application, the seed scripts and clean_db.py all get their
+clients from here. DATA_BACKEND=memory serves the in-memory store from
+app/models/local_store.py instead.
+"""
+
+import os
+import json
+import threading
+import firebase_admin
+from firebase_admin import credentials, firestore
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# 'firestore' (default) talks to Firebase; 'memory' keeps everything in-process
+# for offline development, tests and benchmarks (see app/models/local_store.py)
+DATA_BACKEND = os.getenv('DATA_BACKEND', 'firestore').lower()
+
+STORAGE_BUCKET = "studentgrievancems.appspot.com"
+
+# Define a dummy storage class for development/testing
+class DummyStorage:
+    def child(self, path):
+        print(f"Storage operation attempted on path {path} but storage is not available")
+        return self
+
+    def put(self, *args, **kwargs):
+        print("Storage upload attempted but storage is not available")
+        raise ValueError("Firebase Storage is not properly configured")
+
+    def get_url(self, *args, **kwargs):
+        print("Storage URL request attempted but storage is not available")
+        return ""
+
+    def delete(self, *args, **kwargs):
+        print("Storage delete attempted but storage is not available")
+        return False
+
+def load_service_account():
+    """Service account from the SERVICE_ACCOUNT variable, or service_account.json in the project root"""
+    service_account = os.getenv('SERVICE_ACCOUNT')
+    if service_account:
+        return json.loads(service_account)
+
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                        'service_account.json')
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def _firebase_config(service_account_dict):
+    """Pyrebase configuration for client-side authentication"""
+    return {
+        "apiKey": os.getenv("Web_API_Key"),
+        "authDomain": "studentgrievancems.firebaseapp.com",
+        "projectId": "studentgrievancems",
+        "storageBucket": STORAGE_BUCKET,
+        "messagingSenderId": os.getenv("MESSAGING_SENDER_ID", ""),
+        "appId": os.getenv("APP_ID", ""),
+        "databaseURL": "https://studentgrievancems-default-rtdb.firebaseio.com",
+        "serviceAccount": service_account_dict
+    }
+
+class FirebaseClients:
+    """The clients one process uses: db, auth (admin), pyrebase_auth and storage"""
+
+    def __init__(self, db, auth, pyrebase_auth, storage, firebase_app=None):
+        self.db = db
+        self.auth = auth
+        self.pyrebase_auth = pyrebase_auth
+        self.storage = storage
+        self.firebase_app = firebase_app
+
+class ClientProvider:
+    """Builds FirebaseClients on first use and again after every fork"""
+
+    def __init__(self, backend=DATA_BACKEND):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._clients = None
+        self._inherited = None
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Locks held by other threads at fork time stay locked forever in the child
+        self._lock = threading.Lock()
+        # The in-memory store holds no connections, so the child keeps using it
+        if self.backend != 'memory' and self._clients is not None:
+            self._inherited = self._clients
+            self._clients = None
+
+    def get(self):
+        """Return this process's clients, creating them if needed"""
+        clients = self._clients
+        if clients is None:
+            with self._lock:
+                if self._clients is None:
+                    self._clients = self._build()
+                clients = self._clients
+        return clients
+
+    def _build(self):
+        if self.backend == 'memory':
+            from app.models.local_store import LocalFirestore, LocalAuth
+
+            # Same client interface as Firestore/Firebase Auth, no credentials needed
+            local_auth = LocalAuth()
+            print("Using in-memory data backend")
+            return FirebaseClients(LocalFirestore(), local_auth, local_auth, DummyStorage())
+
+        if self.backend != 'firestore':
+            raise ValueError(f"Unknown DATA_BACKEND '{self.backend}', expected 'firestore' or 'memory'")
+
+        import pyrebase
+        from firebase_admin import auth
+
+        service_account_dict = load_service_account()
+
+        # An app created before a fork still holds the parent's channels; replace it
+        if self._inherited is not None and self._inherited.firebase_app is not None:
+            try:
+                firebase_admin.delete_app(self._inherited.firebase_app)
+            except ValueError:
+                pass
+            self._inherited = None
+
+        # Initialize Firebase Admin SDK (reuse an app a script has already set up)
+        try:
+            app = firebase_admin.get_app()
+        except ValueError:
+            try:
+                cred = credentials.Certificate(service_account_dict)
+                app = firebase_admin.initialize_app(cred, {'storageBucket': STORAGE_BUCKET})
+            except Exception as e:
+                print(f"Error initializing Firebase: {e}")
+                raise
+
+        # Initialize Firestore
+        db = firestore.client(app)
+
+        # Initialize Pyrebase
+        firebase = pyrebase.initialize_app(_firebase_config(service_account_dict))
+        pyrebase_auth = firebase.auth()
+
+        # Initialize storage only after other services
+        try:
+            storage = firebase.storage()
+        except Exception as e:
+            print(f"Warning: Error initializing Firebase Storage: {str(e)}")
+            # Use the dummy storage object
+            storage = DummyStorage()
+
+        return FirebaseClients(db, auth, pyrebase_auth, storage, app)
+
+    def warm(self):
+        """Create the clients and make one small read so the connection is open"""
+        clients = self.get()
+        try:
+            clients.db.collection('departments').select([]).limit(1).get()
+        except Exception as e:
+            print(f"Warning: Could not warm Firestore connection: {e}")
+        return clients
+
+provider = ClientProvider()
+
+def get_clients():
+    """Return the Firebase clients for the current process"""
+    return provider.get()
+
+def warm_clients():
+    """Initialize the clients ahead of the first request, e.g. from a worker boot hook"""
+    return provider.warm()
+
+class LazyClient:
+    """Module-level stand-in that forwards to the current process's client
+
+    Lets modules keep writing `db.collection(...)` or `auth.create_user(...)`
+    while the real client is only created on first use.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(getattr(provider.get(), self._name), attr)
+
+    def __repr__(self):
+        return f"<LazyClient {self._name}>"
@@ -0,0 +1,180 @@
+"""
+Near-duplicate grievance detection with MinHash and locality-sensitive hashing
+
+Each grievance's title and description are split into overlapping word
+shingles and summarised by a MinHash signature: NUM_PERMUTATIONS
+independent 32-bit hashes of every shingle (one SHAKE-128 digest each),
+keeping the smallest value of each. The fraction of equal values in two
+signatures estimates the Jaccard similarity of the two shingle sets.
+
+The signature is cut into BANDS bands of ROWS values and every band is
+hashed into a bucket. Grievances that share any bucket are candidates, so
+finding the duplicates of a new grievance is a handful of indexed bucket
+lookups instead of a comparison with every earlier grievance. With 16
+bands of 4 rows a pair with similarity 0.6 becomes a candidate about 89%
+of the time, and one with similarity 0.3 about 12% of the time; candidates
+are then checked against DUPLICATE_THRESHOLD using their signatures.
+
+Grievances found to be near-duplicates share a cluster, named after the
+first grievance in it. The cluster is stored on the grievances in
+Firestore (duplicateClusterId); this index only holds signatures and
+buckets and can be rebuilt with rebuild_search_index.py.
+"""
+
+import re
+import struct
+import hashlib
+from app.models.search_index import SQLiteIndex, _iso
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+
+# Words per shingle
+SHINGLE_SIZE = 2
+
+# Minimum estimated similarity for a grievance to join a cluster
+DUPLICATE_THRESHOLD = 0.6
+
+# Most recent candidates compared per lookup; large clusters fill whole buckets
+MAX_CANDIDATES = 200
+
+_SIGNATURE_FORMAT = f'<{NUM_PERMUTATIONS}I'
+
+_WORD_RE = re.compile(r'\w+')
+
+DUPLICATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS duplicate_docs (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    cluster_id TEXT,
+    created_at TEXT,
+    signature BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS duplicate_docs_cluster ON duplicate_docs (cluster_id);
+CREATE TABLE IF NOT EXISTS duplicate_buckets (
+    bucket INTEGER NOT NULL,
+    doc INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS duplicate_buckets_bucket ON duplicate_buckets (bucket);
+CREATE INDEX IF NOT EXISTS duplicate_buckets_doc ON duplicate_buckets (doc);
+"""
+
+def shingles(text):
+    """Set of SHINGLE_SIZE-word shingles of the lower-cased words of text"""
+    words = _WORD_RE.findall((text or '').lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def minhash_signature(text):
+    """MinHash signature (list of NUM_PERMUTATIONS ints) of a text, or None if it has no words"""
+    hashes = [struct.unpack(_SIGNATURE_FORMAT, hashlib.shake_128(shingle.encode('utf-8')).digest(4 * NUM_PERMUTATIONS))
+              for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return [min(values) for values in zip(*hashes)]
+
+def grievance_signature(title, description):
+    """Signature of a grievance's title and description"""
+    return minhash_signature(f"{title or ''}\n{description or ''}")
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return sum(1 for a, b in zip(signature, other) if a == b) / NUM_PERMUTATIONS
+
+def _buckets(signature):
+    """One bucket key per band, as signed 64-bit integers for SQLite"""
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<H{ROWS}I', band, *values), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+def _pack(signature):
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+def _unpack(blob):
+    return struct.unpack(_SIGNATURE_FORMAT, blob)
+
+class DuplicateIndex(SQLiteIndex):
+    """LSH index of grievance MinHash signatures"""
+
+    SCHEMA = DUPLICATE_SCHEMA
+    TABLES = ('duplicate_buckets', 'duplicate_docs')
+    DOCS_TABLE = 'duplicate_docs'
+
+    @staticmethod
+    def _insert(conn, grievance_id, signature, cluster_id, created_at):
+        DuplicateIndex._delete(conn, [grievance_id])
+        rowid = conn.execute('INSERT INTO duplicate_docs (id, cluster_id, created_at, signature) VALUES (?, ?, ?, ?)',
+                             (grievance_id, cluster_id, _iso(created_at), _pack(signature))).lastrowid
+        conn.executemany('INSERT INTO duplicate_buckets (bucket, doc) VALUES (?, ?)',
+                         [(bucket, rowid) for bucket in _buckets(signature)])
+
+    @staticmethod
+    def _upsert(conn, grievance_id, data):
+        signature = grievance_signature(data.get('title'), data.get('description'))
+        if signature is None:
+            DuplicateIndex._delete(conn, [grievance_id])
+            return
+        DuplicateIndex._insert(conn, grievance_id, signature, data.get('duplicateClusterId'), data.get('createdAt'))
+
+    @staticmethod
+    def _delete(conn, grievance_ids):
+        for grievance_id in grievance_ids:
+            row = conn.execute('SELECT rowid FROM duplicate_docs WHERE id = ?', (grievance_id,)).fetchone()
+            if row:
+                conn.execute('DELETE FROM duplicate_buckets WHERE doc = ?', row)
+                conn.execute('DELETE FROM duplicate_docs WHERE rowid = ?', row)
+
+    def add(self, grievance_id, signature, cluster_id=None, created_at=None):
+        """Index a grievance's signature, replacing any earlier entry for it"""
+        self._write(self._insert, grievance_id, signature, cluster_id, created_at)
+
+    def set_cluster(self, grievance_id, cluster_id):
+        """Record that an indexed grievance now belongs to a cluster"""
+        self._write(lambda conn: conn.execute('UPDATE duplicate_docs SET cluster_id = ? WHERE id = ?',
+                                              (cluster_id, grievance_id)))
+
+    def find(self, signature, since=None):
+        """Most similar earlier grievance at or above DUPLICATE_THRESHOLD
+
+        Args:
+            signature: MinHash signature of the new grievance
+            since: Only consider grievances created at or after this datetime
+
+        Returns:
+            Dictionary with 'id', 'clusterId' (None if that grievance is not
+            in a cluster yet) and 'similarity', or None if there is no match
+        """
+        if signature is None:
+            return None
+
+        buckets = _buckets(signature)
+        sql = f"""SELECT d.id, d.cluster_id, d.signature FROM duplicate_docs d
+                  WHERE d.rowid IN (SELECT doc FROM duplicate_buckets WHERE bucket IN ({', '.join('?' * len(buckets))}))"""
+        params = list(buckets)
+        if since is not None:
+            sql += ' AND d.created_at >= ?'
+            params.append(_iso(since))
+        sql += ' ORDER BY d.rowid DESC LIMIT ?'
+        params.append(MAX_CANDIDATES)
+
+        conn = self._connection()
+        with self._lock:
+            candidates = conn.execute(sql, params).fetchall()
+
+        best = None
+        for grievance_id, cluster_id, blob in candidates:
+            score = similarity(signature, _unpack(blob))
+            if score >= DUPLICATE_THRESHOLD and (best is None or score > best['similarity']):
+                best = {'id': grievance_id, 'clusterId': cluster_id, 'similarity': score}
+        return best
+
+    def cluster_size(self, cluster_id):
+        """Number of indexed grievances in a cluster"""
+        conn = self._connection()
+        with self._lock:
+            return conn.execute('SELECT count(*) FROM duplicate_docs WHERE cluster_id = ?', (cluster_id,)).fetchone()[0]
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import uuid
+import queue
+import smtplib
+import threading
+
+class SMTPConnectionPool:
+    """Pool of authenticated SMTP sessions that are reused between messages
+
+    Opening a session costs a TCP connect, STARTTLS and LOGIN, so delivery
+    workers borrow an already authenticated connection instead. Idle
+    connections are checked with NOOP before reuse and replaced if the
+    server has dropped them.
+    """
+
+    def __init__(self, host, port, user, password, size=2, timeout=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.starttls()
+        server.login(self.user, self.password)
+        return server
+
+    def acquire(self):
+        """Get a live, logged-in SMTP connection"""
+        while True:
+            with self._lock:
+                server = self._idle.pop() if self._idle else None
+            if server is None:
+                return self._connect()
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self.discard(server)
+
+    def release(self, server):
+        """Return a healthy connection to the pool"""
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(server)
+                return
+        self.discard(server)
+
+    def discard(self, server):
+        """Close a connection that failed or is no longer needed"""
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def send_message(self, msg):
+        """Send one message over a pooled connection"""
+        server = self.acquire()
+        try:
+            server.send_message(msg)
+        except Exception:
+            self.discard(server)
+            raise
+        self.release(server)
+
+class EmailQueue:
+    """Background email delivery backed by an on-disk spool
+
+    Every message is written to `<spool_dir>/pending` before enqueue returns,
+    so nothing is lost if the process restarts. Worker threads claim a
+    message by renaming it into `sending/`, call `deliver(payload)`, and
+    delete it on success. Failures are retried with exponential backoff;
+    after `max_attempts` the message is moved to `failed/` for inspection.
+
+    Workers are started by start(), called when each worker process boots,
+    or at the latest by the first enqueue in the process, which keeps the
+    queue safe to import before a pre-fork server forks. Starting requeues
+    whatever an earlier run left in the spool. Several
+    processes may share one spool directory: the rename in `sending/` makes
+    sure only one of them delivers a given message.
+    """
+
+    # A claimed message untouched for this long is assumed to be orphaned
+    STALE_AFTER = 600
+
+    def __init__(self, spool_dir, deliver, workers=2, max_attempts=5, backoff_base=30, backoff_max=3600):
+        self.spool_dir = spool_dir
+        self.deliver = deliver
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._owner = None
+
+    def _dir(self, name):
+        return os.path.join(self.spool_dir, name)
+
+    def _write(self, path, payload):
+        # Write to a temporary file first so a crash never leaves half a message
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    def enqueue(self, recipient, subject, message, from_email=None):
+        """Spool a message for background delivery and return its ID"""
+        self._ensure_started()
+
+        message_id = f"{time.time():.6f}-{uuid.uuid4().hex}.json"
+        payload = {
+            'recipient': recipient,
+            'subject': subject,
+            'message': message,
+            'from_email': from_email,
+            'attempts': 0,
+            'next_attempt': 0,
+            'last_error': None
+        }
+        self._write(os.path.join(self._dir('pending'), message_id), payload)
+        self._queue.put(message_id)
+        return message_id
+
+    def start(self):
+        """Start delivering, including mail spooled before a restart"""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        """Start the worker threads once per process (again after a fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._queue = queue.Queue()
+            # PIDs get reused across restarts, so tag claims with a per-process token too
+            self._owner = f"{os.getpid()}.{uuid.uuid4().hex[:8]}"
+            for name in ('pending', 'sending', 'failed'):
+                os.makedirs(self._dir(name), exist_ok=True)
+
+            self._recover()
+
+            for i in range(self.workers):
+                worker = threading.Thread(target=self._work, name=f"email-worker-{i}", daemon=True)
+                worker.start()
+            self._pid = os.getpid()
+
+    def _recover(self):
+        """Requeue spooled messages left behind by a previous run"""
+        # Messages claimed by a process that is gone (or stuck) go back to pending
+        for name in os.listdir(self._dir('sending')):
+            owner, _, message_id = name.partition('-')
+            path = os.path.join(self._dir('sending'), name)
+            pid = owner.split('.')[0]
+            try:
+                stale = time.time() - os.path.getmtime(path) > self.STALE_AFTER
+                if stale or not pid.isdigit() or not _process_alive(int(pid)):
+                    os.replace(path, os.path.join(self._dir('pending'), message_id))
+            except OSError:
+                pass
+
+        for message_id in sorted(os.listdir(self._dir('pending'))):
+            if not message_id.endswith('.json'):
+                continue
+            path = os.path.join(self._dir('pending'), message_id)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    next_attempt = json.load(f).get('next_attempt', 0)
+            except ValueError as e:
+                self._discard_unreadable(path, message_id, e)
+                continue
+            except OSError:
+                continue
+            self._schedule(message_id, max(0, next_attempt - time.time()))
+
+    def _schedule(self, message_id, delay):
+        if delay <= 0:
+            self._queue.put(message_id)
+            return
+        timer = threading.Timer(delay, self._queue.put, args=(message_id,))
+        timer.daemon = True
+        timer.start()
+
+    def _work(self):
+        while True:
+            message_id = self._queue.get()
+            try:
+                self._process(message_id)
+            except Exception as e:
+                print(f"Email worker error for {message_id}: {e}")
+
+    def _process(self, message_id):
+        pending_path = os.path.join(self._dir('pending'), message_id)
+        sending_path = os.path.join(self._dir('sending'), f"{self._owner}-{message_id}")
+
+        # Claim the message; if another worker or process got it first, skip it
+        try:
+            os.rename(pending_path, sending_path)
+            os.utime(sending_path)
+        except OSError:
+            return
+
+        try:
+            with open(sending_path, encoding='utf-8') as f:
+                payload = json.load(f)
+        except ValueError as e:
+            self._discard_unreadable(sending_path, message_id, e)
+            return
+
+        try:
+            self.deliver(payload)
+        except Exception as e:
+            payload['attempts'] += 1
+            payload['last_error'] = str(e)
+
+            if payload['attempts'] >= self.max_attempts:
+                print(f"Giving up on email to {payload['recipient']} after {payload['attempts']} attempts: {e}")
+                self._write(os.path.join(self._dir('failed'), message_id), payload)
+                os.remove(sending_path)
+                return
+
+            delay = min(self.backoff_base * 2 ** (payload['attempts'] - 1), self.backoff_max)
+            payload['next_attempt'] = time.time() + delay
+            print(f"Error sending email to {payload['recipient']} (attempt {payload['attempts']}), retrying in {delay}s: {e}")
+            self._write(pending_path, payload)
+            os.remove(sending_path)
+            self._schedule(message_id, delay)
+            return
+
+        os.remove(sending_path)
+
+    def _discard_unreadable(self, path, message_id, error):
+        """Move a spool file that is not a valid message to failed/, where it is never retried"""
+        print(f"Unreadable spooled email {message_id}, moving it to failed: {error}")
+        try:
+            os.replace(path, os.path.join(self._dir('failed'), message_id))
+        except OSError:
+            pass
+
+    def stats(self):
+        """Number of spooled messages by state, for monitoring"""
+        counts = {}
+        for name in ('pending', 'sending', 'failed'):
+            try:
+                counts[name] = len([f for f in os.listdir(self._dir(name)) if not f.endswith('.tmp')])
+            except OSError:
+                counts[name] = 0
+        return counts
+
+def _process_alive(pid):
+    """Check whether a process with this PID is still running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
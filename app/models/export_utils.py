@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+# Columns written for each grievance, in order
+EXPORT_FIELDS = ['id', 'studentId', 'title', 'description', 'department', 'status', 'createdAt', 'updatedAt']
+
+# Spreadsheets run cells starting with these as formulas; students write the
+# titles and descriptions, so a CSV opened by an admin could run theirs
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _export_value(value, spreadsheet=False):
+    """Convert a grievance field into a plain string/number for export
+    
+    For spreadsheet formats, text that would be read as a formula is
+    prefixed with an apostrophe so it is shown as text instead.
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if spreadsheet and isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def grievances_to_csv(grievances):
+    """Yield CSV text for an iterable of grievances, one line at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    
+    for grievance in grievances:
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerow([_export_value(grievance.get(field, ''), spreadsheet=True) for field in EXPORT_FIELDS])
+        yield buffer.getvalue()
+
+def grievances_to_jsonl(grievances):
+    """Yield JSON Lines text for an iterable of grievances, one line at a time"""
+    for grievance in grievances:
+        row = {field: _export_value(grievance.get(field)) for field in EXPORT_FIELDS}
+        yield json.dumps(row, default=str) + '\n'
+
+EXPORT_FORMATS = {
+    'csv': (grievances_to_csv, 'text/csv'),
+    'jsonl': (grievances_to_jsonl, 'application/x-ndjson')
+}
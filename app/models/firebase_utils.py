@@ -1,84 +1,46 @@
 import os
-import pyrebase
-import firebase_admin
-from firebase_admin import auth, firestore, credentials
+from firebase_admin import firestore
 from dotenv import load_dotenv
+from flask import g, has_app_context
 from werkzeug.utils import secure_filename
-import uuid
+from app.models.cache import TTLCache
+from app.models.upload_utils import ATTACHMENT_TYPES, UPLOAD_CHUNK_SIZE, AttachmentStream, upload_stream, storage_url
+from app.models.preview_utils import (
+    PREVIEW_CONTENT_TYPE, PREVIEW_EXTENSION, PreviewQueue, can_preview, make_preview
+)
+from app.models.clients import DATA_BACKEND, DummyStorage, LazyClient, get_clients
+from app.models.search_index import SearchIndex
+from app.models.duplicate_index import DuplicateIndex, grievance_signature
+from app.models.live_updates import EventBus
+from app.models.metrics import traced_client
+import io
 import json
-from datetime import datetime
+import base64
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables
 load_dotenv()
 
-service_account = os.getenv('SERVICE_ACCOUNT')
-service_account_dict = json.loads(service_account)
-cred = credentials.Certificate(service_account_dict)
+# Clients are created on first use in each process (see app/models/clients.py).
+# Firestore reads and writes are counted per request for /metrics (see app/models/metrics.py)
+db = traced_client(LazyClient('db'))
+auth = LazyClient('auth')
+pyrebase_auth = LazyClient('pyrebase_auth')
+storage = LazyClient('storage')
 
-def initialize_firebase():
-    """Initialize Firebase Admin SDK and Firestore"""
-    try:
-        # Try to get existing app
-        return firebase_admin.get_app()
-    except ValueError:
-        # If no app exists, initialize with credentials
-        try:
-            # Load service account from environment variable
-            service_account = os.getenv('SERVICE_ACCOUNT')
-            cred = credentials.Certificate(json.loads(service_account))
-            return firebase_admin.initialize_app(cred)
-        except Exception as e:
-            print(f"Error initializing Firebase: {e}")
-            raise
-
-# Pyrebase configuration for client-side authentication
-firebase_config = {
-    "apiKey": os.getenv("Web_API_Key"),
-    "authDomain": "studentgrievancems.firebaseapp.com",
-    "projectId": "studentgrievancems",
-    "storageBucket": "studentgrievancems.appspot.com",
-    "messagingSenderId": os.getenv("MESSAGING_SENDER_ID", ""),
-    "appId": os.getenv("APP_ID", ""),
-    "databaseURL": "https://studentgrievancems-default-rtdb.firebaseio.com",
-    "serviceAccount": service_account_dict
-}
-
-# Define a dummy storage class for development/testing
-class DummyStorage:
-    def child(self, path):
-        print(f"Storage operation attempted on path {path} but storage is not available")
-        return self
-    
-    def put(self, *args, **kwargs):
-        print("Storage upload attempted but storage is not available")
-        raise ValueError("Firebase Storage is not properly configured")
-        
-    def get_url(self, *args, **kwargs):
-        print("Storage URL request attempted but storage is not available")
-        return ""
-        
-    def delete(self, *args, **kwargs):
-        print("Storage delete attempted but storage is not available")
-        return False
-
-# Initialize Pyrebase
-firebase = pyrebase.initialize_app(firebase_config)
-pyrebase_auth = firebase.auth()
-
-# Initialize Firebase Admin SDK
-app = initialize_firebase()
-
-# Initialize Firestore
-db = firestore.client()
+# Full-text search over grievance titles and descriptions (see app/models/search_index.py).
+# The in-memory backend gets an in-memory index to match.
+search_index = SearchIndex(os.getenv('SEARCH_INDEX_PATH', ':memory:' if DATA_BACKEND == 'memory' else 'search_index.sqlite3'))
 
-# Initialize storage only after other services
-try:
-    storage = firebase.storage()
-    print("Firebase Storage initialized successfully")
-except Exception as e:
-    print(f"Warning: Error initializing Firebase Storage: {str(e)}")
-    # Use the dummy storage object
-    storage = DummyStorage()
+# Near-duplicate detection for new grievances (see app/models/duplicate_index.py).
+# Only grievances from the last DUPLICATE_WINDOW_DAYS days are matched against.
+duplicate_index = DuplicateIndex(os.getenv('DUPLICATE_INDEX_PATH', ':memory:' if DATA_BACKEND == 'memory' else 'duplicate_index.sqlite3'))
+DUPLICATE_WINDOW_DAYS = int(os.getenv('DUPLICATE_WINDOW_DAYS', 30))
 
 # User Authentication Functions
 def create_user(email, password, display_name, role='student'):
@@ -96,7 +58,8 @@ def create_user(email, password, display_name, role='student'):
             'email': email,
             'displayName': display_name,
             'role': role,
-            'createdAt': firestore.SERVER_TIMESTAMP
+            'createdAt': firestore.SERVER_TIMESTAMP,
+            'updatedAt': firestore.SERVER_TIMESTAMP
         })
         
         return user.uid
@@ -113,17 +76,110 @@ def login_user(email, password):
         print(f"Login error: {e}")
         raise e
 
+def _user_memo():
+    """Per-request memo of user documents keyed by ID, or None outside a request
+    
+    Several helpers may need the same user while rendering one page, so the
+    first read is kept on flask.g and reused until the request ends.
+    """
+    if not has_app_context():
+        return None
+    if 'user_memo' not in g:
+        g.user_memo = {}
+    return g.user_memo
+
+def _forget_user(uid):
+    """Drop a user from the per-request memo and the profile cache after it has been changed"""
+    memo = _user_memo()
+    if memo is not None:
+        memo.pop(uid, None)
+    user_profile_cache.invalidate(uid)
+
 def get_user_by_id(uid):
     """Get user data from Firestore by user ID"""
+    memo = _user_memo()
+    if memo is not None and uid in memo:
+        return memo[uid]
+    
     try:
         user_doc = db.collection('users').document(uid).get()
+        user_data = None
         if user_doc.exists:
-            return user_doc.to_dict()
-        return None
+            user_data = user_doc.to_dict()
+            user_data['id'] = user_doc.id
+        
+        if memo is not None:
+            memo[uid] = user_data
+        return user_data
     except Exception as e:
         print(f"Error getting user: {e}")
         return None
 
+# Profile of the logged-in user, looked up on every request. Kept per process for a
+# short time; changes made through update_user/delete_user invalidate it here, and
+# other workers pick them up within USER_PROFILE_CACHE_TTL seconds.
+user_profile_cache = TTLCache(maxsize=1024, ttl=int(os.getenv('USER_PROFILE_CACHE_TTL', 60)))
+
+def get_user_profile(uid):
+    """User data for the logged-in user, served from the profile cache when possible"""
+    user_data = user_profile_cache.get(uid)
+    if user_data is None:
+        user_data = get_user_by_id(uid)
+        # Missing users and failed reads are not cached
+        if user_data is not None:
+            user_profile_cache.set(uid, user_data)
+    return user_data
+
+def get_users_by_ids(user_ids):
+    """Get many users with a single batched read
+    
+    Args:
+        user_ids: Iterable of user IDs; duplicates and empty values are ignored
+    
+    Returns:
+        Dictionary mapping each found user ID to its user data
+    """
+    memo = _user_memo()
+    wanted = {uid for uid in user_ids if uid}
+    result = {}
+    
+    if memo is not None:
+        for uid in list(wanted):
+            if uid in memo:
+                if memo[uid] is not None:
+                    result[uid] = memo[uid]
+                wanted.discard(uid)
+    
+    if not wanted:
+        return result
+    
+    try:
+        refs = [db.collection('users').document(uid) for uid in wanted]
+        for user_doc in db.get_all(refs):
+            user_data = None
+            if user_doc.exists:
+                user_data = user_doc.to_dict()
+                user_data['id'] = user_doc.id
+                result[user_doc.id] = user_data
+            if memo is not None:
+                memo[user_doc.id] = user_data
+        return result
+    except Exception as e:
+        print(f"Error getting users: {e}")
+        return result
+
+def attach_student_info(grievances):
+    """Add studentName and studentEmail to each grievance using one batched user read"""
+    students = get_users_by_ids(grievance.get('studentId') for grievance in grievances)
+    
+    for grievance in grievances:
+        student = students.get(grievance.get('studentId'))
+        if student:
+            grievance['studentName'] = student.get('displayName') or student.get('name')
+            grievance['studentEmail'] = student.get('email')
+    
+    return grievances
+
 # Grievance Management Functions
 def create_grievance(student_id, title, description, department, attachments=None):
     """Create a new grievance in Firestore"""
@@ -135,8 +191,7 @@ def create_grievance(student_id, title, description, department, attachments=Non
         # Create grievance document with a new ID
         grievance_ref = db.collection('grievances').document()
         
-        # Get current timestamp and format as ISO string for consistent storage
-        current_time = datetime.now().isoformat()
+        current_time = utc_now()
         
         # Create the initial status
         initial_status = {
@@ -154,12 +209,50 @@ def create_grievance(student_id, title, description, department, attachments=Non
             'status': 'pending',
             'createdAt': current_time,
             'updatedAt': current_time,
-            'attachments': attachments if attachments else [],
-            'statusHistory': [initial_status]
+            'attachmentCount': len(attachments or []),
+            'version': 1
         }
         
-        # Create the document
-        grievance_ref.set(grievance_data)
+        # Tag likely duplicates of a recent grievance with that grievance's cluster
+        signature, duplicate = None, None
+        try:
+            signature = grievance_signature(title, description)
+            duplicate = duplicate_index.find(signature, since=current_time - timedelta(days=DUPLICATE_WINDOW_DAYS))
+        except Exception as e:
+            print(f"Error checking grievance for duplicates: {e}")
+        if duplicate:
+            grievance_data['duplicateClusterId'] = duplicate['clusterId'] or duplicate['id']
+            grievance_data['duplicateOf'] = duplicate['id']
+        
+        # Create the document and bump the aggregate counters in one commit
+        batch = db.batch()
+        batch.set(grievance_ref, grievance_data)
+        batch.set(_history_ref(grievance_ref.id).document(), initial_status)
+        for attachment in attachments or []:
+            batch.set(_attachments_ref(grievance_ref.id).document(), attachment)
+        batch.set(_stats_ref(), {
+            'total': firestore.Increment(1),
+            'byStatus': {'pending': firestore.Increment(1)},
+            'byDepartment': {department: firestore.Increment(1)}
+        }, merge=True)
+        month = _month_key(current_time)
+        batch.set(_rollup_ref(month), {
+            'month': month,
+            'total': firestore.Increment(1),
+            'byStatus': {'pending': firestore.Increment(1)},
+            'byDepartment': {department: firestore.Increment(1)},
+            'byDepartmentStatus': {department: {'pending': firestore.Increment(1)}}
+        }, merge=True)
+        batch.commit()
+        _grievances_changed()
+        
+        try:
+            search_index.add(grievance_ref.id, grievance_data)
+        except Exception as e:
+            print(f"Error indexing grievance {grievance_ref.id} for search: {e}")
+        
+        if signature is not None:
+            _record_duplicate(grievance_ref.id, signature, duplicate, current_time)
         
         return grievance_ref.id
     except ValueError as ve:
@@ -169,41 +262,80 @@ def create_grievance(student_id, title, description, department, attachments=Non
         print(f"Error creating grievance: {e}")
         raise
 
-# Helper function to format timestamps for display
+def _record_duplicate(grievance_id, signature, duplicate, created_at):
+    """Add a new grievance to the duplicate index and start a cluster if it matched an unclustered one"""
+    try:
+        cluster_id = None
+        if duplicate:
+            cluster_id = duplicate['clusterId'] or duplicate['id']
+            if not duplicate['clusterId']:
+                # The matched grievance starts the cluster and gives it its ID
+                db.collection('grievances').document(duplicate['id']).update({
+                    'duplicateClusterId': cluster_id,
+                    'version': firestore.Increment(1)
+                })
+                _grievances_changed()
+                duplicate_index.set_cluster(duplicate['id'], cluster_id)
+        duplicate_index.add(grievance_id, signature, cluster_id, created_at)
+    except Exception as e:
+        print(f"Error recording grievance {grievance_id} for duplicate detection: {e}")
+
+# Named field projections for grievance reads. List views only fetch the
+# fields they render instead of whole documents with descriptions and
+# status histories. None means the full document.
+GRIEVANCE_PROJECTIONS = {
+    'list_row': ['studentId', 'studentName', 'title', 'department', 'status', 'createdAt', 'updatedAt', 'duplicateClusterId'],
+    'student_row': ['title', 'department', 'status', 'createdAt', 'updatedAt', 'attachmentCount'],
+    'stats': ['status', 'department', 'createdAt'],
+    'export': ['studentId', 'title', 'description', 'department', 'status', 'createdAt', 'updatedAt'],
+    'duplicates': ['title', 'description', 'createdAt', 'duplicateClusterId'],
+    'detail': None
+}
+
+def _project(query, projection):
+    """Restrict a grievance query to the fields of a named projection"""
+    fields = GRIEVANCE_PROJECTIONS[projection]
+    return query.select(fields) if fields else query
+
+# Timestamps are stored as native Firestore timestamps. They are written
+# from the client rather than as SERVER_TIMESTAMP because status history
+# entries live inside an array, where sentinels are not allowed, and the
+# search and duplicate indexes and the rollup month need the value.
+def utc_now():
+    """Current time as a timezone-aware UTC datetime"""
+    return datetime.now(timezone.utc)
+
 def format_timestamp(timestamp):
-    """Format timestamp for display, converting ISO strings to datetime objects if needed"""
+    """Convert a stored timestamp to a UTC datetime
+    
+    Grievances written before timestamps were stored natively hold ISO
+    strings in the server's local time (see migrate_timestamps.py). Strings
+    that are not timestamps are returned unchanged.
+    """
     if not timestamp:
         return None
     
     if isinstance(timestamp, str):
         try:
-            return datetime.fromisoformat(timestamp)
+            timestamp = datetime.fromisoformat(timestamp)
         except ValueError:
             return timestamp
     
+    if isinstance(timestamp, datetime):
+        # Naive datetimes are taken as local time
+        return timestamp.astimezone(timezone.utc)
     return timestamp
 
-def get_student_grievances(student_id):
+def get_student_grievances(student_id, projection='student_row'):
     """Get all grievances for a specific student"""
     try:
-        grievances_ref = db.collection('grievances').where('studentId', '==', student_id)
+        grievances_ref = _project(db.collection('grievances').where('studentId', '==', student_id), projection)
         grievances = grievances_ref.get()
         
         result = []
         for grievance in grievances:
             grievance_data = grievance.to_dict()
             grievance_data['id'] = grievance.id
-            
-            # Format timestamps
-            grievance_data['createdAt'] = format_timestamp(grievance_data.get('createdAt'))
-            grievance_data['updatedAt'] = format_timestamp(grievance_data.get('updatedAt'))
-            
-            # Format timestamps in status history
-            if 'statusHistory' in grievance_data and grievance_data['statusHistory']:
-                for status_entry in grievance_data['statusHistory']:
-                    if 'timestamp' in status_entry:
-                        status_entry['timestamp'] = format_timestamp(status_entry['timestamp'])
-            
             result.append(grievance_data)
             
         return result
@@ -211,21 +343,16 @@ def get_student_grievances(student_id):
         print(f"Error getting student grievances: {e}")
         return []
 
-def get_all_grievances():
+def get_all_grievances(projection='list_row'):
     """Get all grievances from the database"""
     try:
-        grievances_ref = db.collection('grievances')
+        grievances_ref = _project(db.collection('grievances'), projection)
         grievances = grievances_ref.get()
         
         result = []
         for grievance in grievances:
             grievance_data = grievance.to_dict()
             grievance_data['id'] = grievance.id
-            
-            # Format timestamps
-            grievance_data['createdAt'] = format_timestamp(grievance_data.get('createdAt'))
-            grievance_data['updatedAt'] = format_timestamp(grievance_data.get('updatedAt'))
-            
             result.append(grievance_data)
             
         return result
@@ -233,22 +360,16 @@ def get_all_grievances():
         print(f"Error getting grievances: {e}")
         return []
 
-def get_open_grievances():
-    """Get all open (non-resolved, non-closed) grievances"""
+def get_open_grievances(projection='list_row'):
+    """Get all open grievances, those with one of OPEN_STATUSES"""
     try:
-        # Get grievances that are not resolved or closed
-        grievances_ref = db.collection('grievances').where('status', 'not-in', ['resolved', 'closed'])
+        grievances_ref = _project(db.collection('grievances').where('status', 'in', OPEN_STATUSES), projection)
         grievances = grievances_ref.get()
         
         result = []
         for grievance in grievances:
             grievance_data = grievance.to_dict()
             grievance_data['id'] = grievance.id
-            
-            # Format timestamps
-            grievance_data['createdAt'] = format_timestamp(grievance_data.get('createdAt'))
-            grievance_data['updatedAt'] = format_timestamp(grievance_data.get('updatedAt'))
-            
             result.append(grievance_data)
             
         return result
@@ -256,22 +377,16 @@ def get_open_grievances():
         print(f"Error getting open grievances: {e}")
         return []
 
-def get_resolved_grievances():
+def get_resolved_grievances(projection='list_row'):
     """Get all resolved or closed grievances"""
     try:
-        # Get grievances that are resolved or closed
-        grievances_ref = db.collection('grievances').where('status', 'in', ['resolved', 'closed'])
+        grievances_ref = _project(db.collection('grievances').where('status', 'in', RESOLVED_STATUSES), projection)
         grievances = grievances_ref.get()
         
         result = []
         for grievance in grievances:
             grievance_data = grievance.to_dict()
             grievance_data['id'] = grievance.id
-            
-            # Format timestamps
-            grievance_data['createdAt'] = format_timestamp(grievance_data.get('createdAt'))
-            grievance_data['updatedAt'] = format_timestamp(grievance_data.get('updatedAt'))
-            
             result.append(grievance_data)
             
         return result
@@ -279,20 +394,16 @@ def get_resolved_grievances():
         print(f"Error getting resolved grievances: {e}")
         return []
 
-def get_department_grievances(department):
+def get_department_grievances(department, projection='list_row'):
     """Get all grievances for a specific department"""
     try:
-        grievances = db.collection('grievances').where('department', '==', department).order_by('createdAt', direction=firestore.Query.DESCENDING).get()
+        query = db.collection('grievances').where('department', '==', department).order_by('createdAt', direction=firestore.Query.DESCENDING)
+        grievances = _project(query, projection).get()
         
         result = []
         for doc in grievances:
             grievance_data = doc.to_dict()
             grievance_data['id'] = doc.id
-            
-            # Format timestamps
-            grievance_data['createdAt'] = format_timestamp(grievance_data.get('createdAt'))
-            grievance_data['updatedAt'] = format_timestamp(grievance_data.get('updatedAt'))
-            
             result.append(grievance_data)
             
         return result
@@ -300,13 +411,300 @@ def get_department_grievances(department):
         print(f"Error getting department grievances: {e}")
         return []
 
+# Paginated Grievance Listing Functions
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# Status options for grievances
+STATUS_OPTIONS = {
+    'pending': 'Pending',
+    'in_progress': 'In Progress',
+    'assigned': 'Assigned to Department',
+    'under_review': 'Under Review',
+    'resolved': 'Resolved',
+    'closed': 'Closed'
+}
+RESOLVED_STATUSES = ['resolved', 'closed']
+# Open lists filter with 'in' so they can be ordered by createdAt; a status
+# outside STATUS_OPTIONS is in neither list (recompute_grievance_stats warns)
+OPEN_STATUSES = [status for status in STATUS_OPTIONS if status not in RESOLVED_STATUSES]
+
+def _grievance_from_snapshot(doc):
+    """Convert a grievance snapshot into the dict shape used by the templates"""
+    grievance_data = doc.to_dict()
+    grievance_data['id'] = doc.id
+    return grievance_data
+
+def _encode_cursor(direction, doc, field='createdAt'):
+    """Build an opaque page cursor pointing just after/before a snapshot ordered by field"""
+    value = doc.to_dict().get(field)
+    if isinstance(value, datetime):
+        value = {'ts': value.isoformat()}
+    payload = json.dumps([direction, value, doc.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor, field='createdAt'):
+    """Decode a page cursor into (direction, cursor values), or None if it is invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if direction not in ('after', 'before') or not isinstance(doc_id, str):
+            return None
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value['ts'])
+        return direction, {field: value, '__name__': doc_id}
+    except (ValueError, TypeError, KeyError):
+        return None
+
+def _paginate_grievances(query, page_size=DEFAULT_PAGE_SIZE, cursor=None, projection='list_row'):
+    """Run a grievance query one page at a time
+    
+    Results are ordered newest first, with the document ID as a tie-breaker so
+    the ordering is stable. Cursors are opaque strings taken from a previous
+    page's 'next_cursor' or 'prev_cursor'.
+    
+    Returns:
+        Dictionary with 'items', 'next_cursor' and 'prev_cursor' keys
+    """
+    page_size = max(1, min(int(page_size or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    query = _project(query, projection)
+    # '__name__' is the document ID field path
+    query = query.order_by('createdAt', direction=firestore.Query.DESCENDING) \
+                 .order_by('__name__', direction=firestore.Query.DESCENDING)
+    
+    position = _decode_cursor(cursor) if cursor else None
+    
+    if position and position[0] == 'before':
+        # Walking backwards: take the last page_size + 1 rows before the cursor
+        docs = list(query.end_before(position[1]).limit_to_last(page_size + 1).get())
+        has_prev = len(docs) > page_size
+        docs = docs[-page_size:]
+        has_next = True
+    else:
+        if position:
+            query = query.start_after(position[1])
+        docs = list(query.limit(page_size + 1).stream())
+        has_next = len(docs) > page_size
+        docs = docs[:page_size]
+        has_prev = position is not None
+    
+    return {
+        'items': [_grievance_from_snapshot(doc) for doc in docs],
+        'next_cursor': _encode_cursor('after', docs[-1]) if docs and has_next else None,
+        'prev_cursor': _encode_cursor('before', docs[0]) if docs and has_prev else None
+    }
+
+def _timestamp_bound(value):
+    """Convert a datetime into a UTC timestamp for createdAt range filters; naive datetimes are local time"""
+    return value.astimezone(timezone.utc)
+
+def iter_grievances(department=None, statuses=None, start=None, end=None, projection='export', page_size=500,
+                    oldest_first=False):
+    """Yield grievances matching the filters, newest first (or oldest first)
+    
+    Reads one page at a time with cursor queries, so memory use stays flat
+    however many grievances match.
+    
+    Args:
+        department: Only grievances for this department
+        statuses: Only grievances with one of these statuses
+        start: Only grievances created at or after this datetime
+        end: Only grievances created before this datetime
+        projection: Named projection from GRIEVANCE_PROJECTIONS (must include createdAt)
+        page_size: Documents read per query
+        oldest_first: Yield the oldest grievances first instead
+    """
+    query = db.collection('grievances')
+    if department:
+        query = query.where('department', '==', department)
+    if statuses:
+        statuses = list(statuses)
+        query = query.where('status', '==', statuses[0]) if len(statuses) == 1 else query.where('status', 'in', statuses)
+    if start:
+        query = query.where('createdAt', '>=', _timestamp_bound(start))
+    if end:
+        query = query.where('createdAt', '<', _timestamp_bound(end))
+    
+    direction = firestore.Query.ASCENDING if oldest_first else firestore.Query.DESCENDING
+    query = _project(query, projection) \
+        .order_by('createdAt', direction=direction) \
+        .order_by('__name__', direction=direction) \
+        .limit(page_size)
+    
+    last_doc = None
+    while True:
+        page_query = query.start_after(last_doc) if last_doc else query
+        docs = list(page_query.stream())
+        
+        for doc in docs:
+            yield _grievance_from_snapshot(doc)
+        
+        if len(docs) < page_size:
+            break
+        last_doc = docs[-1]
+
+def search_grievances(text, statuses=None, department=None, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """Ranked full-text search over grievance titles and descriptions
+    
+    Answered from the local search index, not Firestore. Returns a dictionary
+    with 'items', 'total', 'page' and 'page_size'; see SearchIndex.search.
+    """
+    page_size = max(1, min(int(page_size or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    try:
+        return search_index.search(text, statuses=statuses, department=department, page=page, page_size=page_size)
+    except Exception as e:
+        print(f"Error searching grievances: {e}")
+        return {'items': [], 'total': 0, 'page': page, 'page_size': page_size, 'has_next': False}
+
+def rebuild_search_index():
+    """Re-index every grievance in Firestore for full-text search
+    
+    Returns:
+        Tuple of (indexed, removed) counts
+    """
+    return search_index.rebuild(iter_grievances(projection='export', oldest_first=True))
+
+def get_all_grievances_page(page_size=DEFAULT_PAGE_SIZE, cursor=None, projection='list_row'):
+    """Get one page of all grievances, newest first"""
+    try:
+        return _paginate_grievances(db.collection('grievances'), page_size, cursor, projection)
+    except Exception as e:
+        print(f"Error getting grievances page: {e}")
+        return {'items': [], 'next_cursor': None, 'prev_cursor': None}
+
+def get_open_grievances_page(page_size=DEFAULT_PAGE_SIZE, cursor=None, projection='list_row'):
+    """Get one page of open grievances (OPEN_STATUSES), newest first"""
+    try:
+        query = db.collection('grievances').where('status', 'in', OPEN_STATUSES)
+        return _paginate_grievances(query, page_size, cursor, projection)
+    except Exception as e:
+        print(f"Error getting open grievances page: {e}")
+        return {'items': [], 'next_cursor': None, 'prev_cursor': None}
+
+def get_resolved_grievances_page(page_size=DEFAULT_PAGE_SIZE, cursor=None, projection='list_row'):
+    """Get one page of resolved or closed grievances, newest first"""
+    try:
+        query = db.collection('grievances').where('status', 'in', RESOLVED_STATUSES)
+        return _paginate_grievances(query, page_size, cursor, projection)
+    except Exception as e:
+        print(f"Error getting resolved grievances page: {e}")
+        return {'items': [], 'next_cursor': None, 'prev_cursor': None}
+
+def get_department_grievances_page(department, page_size=DEFAULT_PAGE_SIZE, cursor=None, projection='list_row'):
+    """Get one page of grievances for a specific department, newest first"""
+    try:
+        query = db.collection('grievances').where('department', '==', department)
+        return _paginate_grievances(query, page_size, cursor, projection)
+    except Exception as e:
+        print(f"Error getting department grievances page: {e}")
+        return {'items': [], 'next_cursor': None, 'prev_cursor': None}
+
+# Duplicate Cluster Functions
+def _cluster_query(cluster_id):
+    return db.collection('grievances').where('duplicateClusterId', '==', cluster_id)
+
+def get_duplicate_cluster_page(cluster_id, page_size=DEFAULT_PAGE_SIZE, cursor=None, projection='list_row'):
+    """Get one page of the grievances in a duplicate cluster"""
+    try:
+        return _paginate_grievances(_cluster_query(cluster_id), page_size, cursor, projection)
+    except Exception as e:
+        print(f"Error getting duplicate cluster page: {e}")
+        return {'items': [], 'next_cursor': None, 'prev_cursor': None}
+
+def get_duplicate_cluster_ids(cluster_id):
+    """IDs of every grievance in a duplicate cluster"""
+    try:
+        return [doc.id for doc in _cluster_query(cluster_id).select([]).stream()]
+    except Exception as e:
+        print(f"Error getting duplicate cluster: {e}")
+        return []
+
+def get_duplicate_cluster_size(cluster_id):
+    """Number of grievances in a duplicate cluster, from the local duplicate index"""
+    try:
+        return duplicate_index.cluster_size(cluster_id)
+    except Exception as e:
+        print(f"Error getting duplicate cluster size: {e}")
+        return 0
+
+def rebuild_duplicate_index():
+    """Re-index every grievance in Firestore for duplicate detection
+    
+    Existing clusters are kept as stored on the grievances; nothing is re-clustered.
+    
+    Returns:
+        Tuple of (indexed, removed) counts
+    """
+    return duplicate_index.rebuild(iter_grievances(projection='duplicates', oldest_first=True))
+
+@firestore.transactional
+def _update_status_in_transaction(transaction, grievance_ref, new_status, status_update):
+    """Apply a status change and move the grievance between status counters"""
+    snapshot = grievance_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        raise ValueError(f"Grievance {grievance_ref.id} not found")
+    
+    data = snapshot.to_dict()
+    old_status = data.get('status', 'pending')
+    department = data.get('department', 'Unknown')
+    
+    transaction.update(grievance_ref, {
+        'status': new_status,
+        'updatedAt': status_update['timestamp'],
+        'version': firestore.Increment(1)
+    })
+    transaction.set(_history_ref(grievance_ref.id).document(), status_update)
+    
+    change = (old_status, new_status, department, _month_key(data.get('createdAt')))
+    for counter_ref, counter_data in _status_counter_writes([change]):
+        transaction.set(counter_ref, counter_data, merge=True)
+
+def _status_counter_writes(changes):
+    """Build the counter updates for a set of status changes
+    
+    Args:
+        changes: List of (old_status, new_status, department, month) tuples
+    
+    Returns:
+        List of (document reference, data) pairs to write with merge=True
+    """
+    by_status = {}
+    rollups = {}
+    
+    for old_status, new_status, department, month in changes:
+        if old_status == new_status:
+            continue
+        
+        by_status[old_status] = by_status.get(old_status, 0) - 1
+        by_status[new_status] = by_status.get(new_status, 0) + 1
+        
+        # Rollups are keyed by the month the grievance was submitted
+        rollup = rollups.setdefault(month, {'byStatus': {}, 'byDepartmentStatus': {}})
+        rollup['byStatus'][old_status] = rollup['byStatus'].get(old_status, 0) - 1
+        rollup['byStatus'][new_status] = rollup['byStatus'].get(new_status, 0) + 1
+        dept_status = rollup['byDepartmentStatus'].setdefault(department, {})
+        dept_status[old_status] = dept_status.get(old_status, 0) - 1
+        dept_status[new_status] = dept_status.get(new_status, 0) + 1
+    
+    def increments(counts):
+        return {key: firestore.Increment(count) for key, count in counts.items() if count}
+    
+    writes = []
+    if increments(by_status):
+        writes.append((_stats_ref(), {'byStatus': increments(by_status)}))
+    for month, rollup in rollups.items():
+        writes.append((_rollup_ref(month), {
+            'byStatus': increments(rollup['byStatus']),
+            'byDepartmentStatus': {dept: increments(counts) for dept, counts in rollup['byDepartmentStatus'].items()}
+        }))
+    return writes
+
 def update_grievance_status(grievance_id, new_status, note=None):
     """Update the status of a grievance"""
     try:
         grievance_ref = db.collection('grievances').document(grievance_id)
         
-        # Get current timestamp
-        current_time = datetime.now().isoformat()
+        current_time = utc_now()
         
         # Add status change to history
         status_update = {
@@ -315,120 +713,311 @@ def update_grievance_status(grievance_id, new_status, note=None):
             'note': note if note else f'Status updated to {new_status}'
         }
         
-        grievance_ref.update({
-            'status': new_status,
-            'updatedAt': current_time,
-            'statusHistory': firestore.ArrayUnion([status_update])
-        })
+        _update_status_in_transaction(db.transaction(), grievance_ref, new_status, status_update)
+        _grievances_changed()
+        
+        try:
+            search_index.update_status([grievance_id], new_status, current_time)
+        except Exception as e:
+            print(f"Error updating search index for grievance {grievance_id}: {e}")
         
         return True
     except Exception as e:
         print(f"Error updating grievance status: {e}")
         return False
 
-def upload_attachment(file, grievance_id):
-    """Upload a file attachment to Firebase Storage"""
+# Firestore allows at most 500 writes in one batch
+BATCH_WRITE_LIMIT = 500
+
+def bulk_update_grievance_status(grievance_ids, new_status, note=None):
+    """Update the status of many grievances using batched writes
+    
+    Applies the same changes as update_grievance_status to every grievance,
+    committing up to 500 writes at a time. Each batch carries the counter
+    updates for the grievances in it. The current statuses are read up front
+    rather than inside a transaction, so a concurrent single update can make
+    the counters drift; rebuild_stats.py repairs that.
+    
+    Returns:
+        Tuple of (updated, failed_ids). updated is a list of dicts with
+        'id', 'title', 'studentId' and 'previousStatus' for each changed grievance.
+    """
+    ids = list(dict.fromkeys(gid for gid in grievance_ids if gid))
+    updated = []
+    
+    current_time = utc_now()
+    status_update = {
+        'status': new_status,
+        'timestamp': current_time,
+        'note': note if note else f'Status updated to {new_status}'
+    }
+    
     try:
-        # Ensure the file has a secure filename
-        filename = secure_filename(file.filename)
-        if not filename:
-            raise ValueError("Invalid filename. Please use only letters, numbers, and common punctuation.")
-            
-        # Check file extension
-        allowed_extensions = {'pdf', 'doc', 'docx', 'jpg', 'jpeg', 'png'}
-        if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
-            raise ValueError(f"Invalid file format. Allowed formats: {', '.join(allowed_extensions)}")
-            
-        # Generate a unique filename to prevent collisions
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        file_path = f"attachments/{grievance_id}/{unique_filename}"
-        
-        # Read file content and get size
-        file_content = file.read()
-        file_size = len(file_content)
-        file.seek(0)  # Reset file pointer
-        
-        # Check file size (5MB limit)
-        if file_size > 5 * 1024 * 1024:
-            raise ValueError("File size exceeds 5MB limit. Please compress your file or choose a smaller one.")
-        
-        # Check if file is empty
-        if file_size == 0:
-            raise ValueError("File is empty. Please choose a valid file.")
-
-        # Check if storage is properly configured
-        if isinstance(storage, DummyStorage):
-            # For development purposes, we'll store a reference in Firestore but no actual file
-            print("Using development mode for file storage")
-            file_url = f"dev-storage://attachments/{grievance_id}/{unique_filename}"
-            
-            # Add a note about storage being in development mode
-            current_time = datetime.now().isoformat()
-            grievance_ref = db.collection('grievances').document(grievance_id)
-            attachment_data = {
-                'name': filename,
-                'url': file_url,
-                'uploadedAt': current_time,
-                'size': file_size,
-                'type': file.content_type or 'application/octet-stream',
-                'extension': filename.rsplit('.', 1)[1].lower(),
-                'note': 'File storage is in development mode. Actual file is not stored.'
-            }
-            
-            grievance_ref.update({
-                'attachments': firestore.ArrayUnion([attachment_data]),
-                'updatedAt': current_time
-            })
-            
-            print(f"File reference added to Firestore in development mode: {file_url}")
-            return file_url
+        refs = [db.collection('grievances').document(gid) for gid in ids]
+        snapshots = db.get_all(refs, field_paths=['studentId', 'title', 'department', 'status', 'createdAt'])
+        
+        pending = []
+        for snapshot in snapshots:
+            if not snapshot.exists:
+                continue
+            data = snapshot.to_dict()
+            old_status = data.get('status', 'pending')
+            pending.append((snapshot.reference, {
+                'id': snapshot.id,
+                'title': data.get('title', 'Untitled Grievance'),
+                'studentId': data.get('studentId'),
+                'previousStatus': old_status
+            }, (old_status, new_status, data.get('department', 'Unknown'), _month_key(data.get('createdAt')))))
+        
+        def commit(chunk):
+            batch = db.batch()
+            for grievance_ref, info, change in chunk:
+                batch.update(grievance_ref, {
+                    'status': new_status,
+                    'updatedAt': current_time,
+                    'version': firestore.Increment(1)
+                })
+                batch.set(_history_ref(grievance_ref.id).document(), status_update)
+            for counter_ref, counter_data in _status_counter_writes([change for _, _, change in chunk]):
+                batch.set(counter_ref, counter_data, merge=True)
+            batch.commit()
+            _grievances_changed()
+            updated.extend(info for _, info, _ in chunk)
+        
+        chunk = []
+        months = set()
+        for item in pending:
+            month = item[2][3]
+            # Two writes per grievance (update and history entry) plus one stats
+            # write and one write per rollup month
+            if 2 * (len(chunk) + 1) + 1 + len(months | {month}) > BATCH_WRITE_LIMIT:
+                commit(chunk)
+                chunk, months = [], set()
+            chunk.append(item)
+            months.add(month)
+        if chunk:
+            commit(chunk)
+    except Exception as e:
+        print(f"Error bulk updating grievance status: {e}")
+    
+    updated_ids = {info['id'] for info in updated}
+    try:
+        search_index.update_status(updated_ids, new_status, current_time)
+    except Exception as e:
+        print(f"Error updating search index after bulk status update: {e}")
+    return updated, [gid for gid in ids if gid not in updated_ids]
+
+# Attachments of one submission are uploaded concurrently by up to this many threads
+ATTACHMENT_UPLOAD_WORKERS = int(os.getenv('ATTACHMENT_UPLOAD_WORKERS', 4))
+
+# Thumbnails and PDF previews are made in the background after an upload is saved
+preview_queue = PreviewQueue(workers=int(os.getenv('PREVIEW_WORKERS', 1)))
+
+def _blob_ref(digest):
+    """Reference-count document for the stored file with this SHA-256"""
+    return db.collection('attachment_blobs').document(digest)
+
+def attachment_blob_path(digest):
+    """Storage path of a content-addressed attachment"""
+    return f"attachments/sha256/{digest}"
+
+def _store_attachment(file, grievance_id):
+    """Validate a file and make sure its content is in storage
+
+    Files are stored once per SHA-256 of their content. If identical bytes
+    are already stored and referenced, the upload is skipped entirely.
+    Returns (attachment metadata, preview source), where the preview source
+    is a temporary copy of the file to make a preview from, or None.
+    """
+    # Ensure the file has a secure filename
+    filename = secure_filename(file.filename)
+    if not filename:
+        raise ValueError("Invalid filename. Please use only letters, numbers, and common punctuation.")
         
-        # Upload to Firebase Storage with better error handling
+    # Check file extension
+    allowed_extensions = list(ATTACHMENT_TYPES)
+    if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
+        raise ValueError(f"Invalid file format. Allowed formats: {', '.join(allowed_extensions)}")
+        
+    extension = filename.rsplit('.', 1)[1].lower()
+    
+    # Checks the size from the headers and the type from the first bytes;
+    # hashing reads the rest and enforces the full size limit
+    stream = AttachmentStream(file, extension)
+    digest, file_size = stream.digest()
+    file_path = attachment_blob_path(digest)
+    
+    attachment_data = {
+        'name': filename,
+        'uploadedAt': utc_now(),
+        'size': file_size,
+        'type': stream.content_type,
+        'extension': extension,
+        'sha256': digest
+    }
+
+    blob = _blob_ref(digest).get()
+    blob_data = blob.to_dict() if blob.exists else {}
+    stored = (blob_data.get('refCount') or 0) > 0
+
+    # Reuse the preview of identical content, or keep a copy to make one from
+    preview_source = None
+    if stored and blob_data.get('previewUrl'):
+        attachment_data['previewUrl'] = blob_data['previewUrl']
+    elif can_preview(stream.content_type):
+        preview_source = _spool_preview_source(stream)
+
+    # Check if storage is properly configured
+    if isinstance(get_clients().storage, DummyStorage):
+        # For development purposes, we'll store a reference in Firestore but no actual file
+        print("Using development mode for file storage")
+        attachment_data['url'] = f"dev-storage://{file_path}"
+        attachment_data['note'] = 'File storage is in development mode. Actual file is not stored.'
+        return attachment_data, preview_source
+    
+    if stored:
+        print(f"File {filename} is already stored at {file_path}, skipping upload")
+    else:
+        # Stream the file to Firebase Storage with better error handling
         try:
-            print(f"Uploading file {unique_filename} to path: {file_path}")
-            storage.child(file_path).put(file_content)
-            print(f"File upload successful")
+            print(f"Uploading file {filename} to path: {file_path}")
+            upload_stream(storage, file_path, stream, stream.content_type)
+            print(f"File upload successful ({file_size} bytes)")
         except Exception as e:
+            _discard_preview_source(preview_source)
+            if isinstance(e, ValueError):
+                # Raised by the stream when the file turns out to be too large
+                raise
             print(f"Storage upload error: {str(e)}")
             raise ValueError(f"Failed to upload file to storage: {str(e)}")
-        
-        # Get the public URL with better error handling
+    
+    attachment_data['url'] = storage_url(storage, file_path)
+    return attachment_data, preview_source
+
+def _spool_preview_source(stream):
+    """Copy an upload to a temporary file that outlives the request, for the preview worker"""
+    with tempfile.NamedTemporaryFile(prefix='attachment-', delete=False) as copy:
+        shutil.copyfileobj(stream, copy, UPLOAD_CHUNK_SIZE)
+    stream.seek(0)
+    return copy.name
+
+def _discard_preview_source(preview_source):
+    if preview_source:
         try:
-            file_url = storage.child(file_path).get_url(None)
-            print(f"Generated URL: {file_url}")
-        except Exception as e:
-            print(f"URL generation error: {str(e)}")
-            raise ValueError(f"Failed to generate file URL: {str(e)}")
-        
-        # Get current timestamp
-        current_time = datetime.now().isoformat()
+            os.remove(preview_source)
+        except OSError:
+            pass
+
+def queue_attachment_previews(grievance_id, stored):
+    """Generate previews in the background for saved (attachment, preview source) pairs
+
+    The attachments must have been saved with _save_attachments, which sets their 'id'.
+    """
+    for attachment_data, preview_source in stored:
+        if preview_source:
+            preview_queue.submit(generate_attachment_preview, grievance_id, attachment_data, preview_source)
+
+def generate_attachment_preview(grievance_id, attachment_data, preview_source):
+    """Make a WebP preview of an attachment, store it next to the file and record its URL"""
+    try:
+        preview = make_preview(preview_source, attachment_data['type'])
+        if not preview:
+            return None
         
-        # Add file URL to grievance document
-        grievance_ref = db.collection('grievances').document(grievance_id)
-        attachment_data = {
-            'name': filename,
-            'url': file_url,
-            'uploadedAt': current_time,
-            'size': file_size,
-            'type': file.content_type or 'application/octet-stream',
-            'extension': filename.rsplit('.', 1)[1].lower()
-        }
+        digest = attachment_data['sha256']
+        preview_path = f"{attachment_blob_path(digest)}.{PREVIEW_EXTENSION}"
+        if isinstance(get_clients().storage, DummyStorage):
+            preview_url = f"dev-storage://{preview_path}"
+        else:
+            upload_stream(storage, preview_path, io.BytesIO(preview), PREVIEW_CONTENT_TYPE)
+            preview_url = storage_url(storage, preview_path)
         
+        batch = db.batch()
+        batch.update(_attachments_ref(grievance_id).document(attachment_data['id']), {'previewUrl': preview_url})
+        batch.update(db.collection('grievances').document(grievance_id), {'version': firestore.Increment(1)})
+        batch.set(_blob_ref(digest), {'previewUrl': preview_url}, merge=True)
+        batch.commit()
+        _grievances_changed()
+        print(f"Preview for {attachment_data['name']} saved ({len(preview)} bytes)")
+        return preview_url
+    except Exception as e:
+        print(f"Error generating preview for {attachment_data.get('name')}: {e}")
+        return None
+    finally:
+        _discard_preview_source(preview_source)
+
+def _save_attachments(grievance_id, attachments):
+    """Add attachments to the grievance and count the references to their stored files, in one batch
+
+    Each attachment dict gets the 'id' of its document once it is saved.
+    """
+    batch = db.batch()
+    refs = []
+    for attachment in attachments:
+        attachment_ref = _attachments_ref(grievance_id).document()
+        batch.set(attachment_ref, attachment)
+        refs.append(attachment_ref)
+    batch.update(db.collection('grievances').document(grievance_id), {
+        'attachmentCount': firestore.Increment(len(attachments)),
+        'updatedAt': utc_now(),
+        'version': firestore.Increment(1)
+    })
+    
+    references = {}
+    for attachment in attachments:
+        references.setdefault(attachment['sha256'], []).append(attachment)
+    for digest, uses in references.items():
+        batch.set(_blob_ref(digest), {
+            'path': attachment_blob_path(digest),
+            'size': uses[0]['size'],
+            'type': uses[0]['type'],
+            'refCount': firestore.Increment(len(uses)),
+            'lastReferencedAt': firestore.SERVER_TIMESTAMP
+        }, merge=True)
+    
+    try:
+        batch.commit()
+    except Exception as e:
+        # Stored files may be shared with other grievances, so they are not
+        # deleted here; clean_db.py removes any that end up unreferenced
+        print(f"Firestore update error: {str(e)}")
+        raise ValueError(f"Failed to update grievance with attachment information: {str(e)}")
+    _grievances_changed()
+    
+    for attachment, attachment_ref in zip(attachments, refs):
+        attachment['id'] = attachment_ref.id
+
+def release_attachments(attachments):
+    """Drop the references that these attachments hold on their stored files
+
+    Call this when the grievances holding them are deleted. Files whose
+    count reaches zero are removed by clean_db.py.
+    """
+    counts = {}
+    for attachment in attachments or []:
+        digest = attachment.get('sha256')
+        if digest:
+            counts[digest] = counts.get(digest, 0) + 1
+    
+    digests = list(counts)
+    for start in range(0, len(digests), BATCH_WRITE_LIMIT):
+        batch = db.batch()
+        for digest in digests[start:start + BATCH_WRITE_LIMIT]:
+            batch.set(_blob_ref(digest), {'refCount': firestore.Increment(-counts[digest])}, merge=True)
+        batch.commit()
+    return counts
+
+def upload_attachment(file, grievance_id):
+    """Upload a file attachment to Firebase Storage"""
+    try:
+        attachment_data, preview_source = _store_attachment(file, grievance_id)
         try:
-            grievance_ref.update({
-                'attachments': firestore.ArrayUnion([attachment_data]),
-                'updatedAt': current_time
-            })
-        except Exception as e:
-            # If we fail to update Firestore, try to delete the uploaded file
-            try:
-                storage.delete(file_path)
-            except Exception as delete_error:
-                print(f"Failed to delete file after Firestore update error: {str(delete_error)}")
-            print(f"Firestore update error: {str(e)}")
-            raise ValueError(f"Failed to update grievance with attachment information: {str(e)}")
-        
-        return file_url
+            _save_attachments(grievance_id, [attachment_data])
+        except Exception:
+            _discard_preview_source(preview_source)
+            raise
+        queue_attachment_previews(grievance_id, [(attachment_data, preview_source)])
+        return attachment_data['url']
     except ValueError as ve:
         print(f"Validation error: {ve}")
         raise
@@ -436,75 +1025,657 @@ def upload_attachment(file, grievance_id):
         print(f"Error uploading attachment: {str(e)}")
         return None
 
+def upload_attachments(files, grievance_id):
+    """Upload several attachments in parallel and record them with a single write
+
+    Returns one (file_url, error) pair per file, in the same order. error is
+    the ValueError explaining a rejected file; both are None when the upload
+    failed unexpectedly, matching upload_attachment returning None.
+    """
+    def store(file):
+        try:
+            return _store_attachment(file, grievance_id), None
+        except ValueError as ve:
+            print(f"Validation error: {ve}")
+            return None, ve
+        except Exception as e:
+            print(f"Error uploading attachment: {str(e)}")
+            return None, None
+
+    if not files:
+        return []
+
+    workers = max(1, min(ATTACHMENT_UPLOAD_WORKERS, len(files)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='attachment-upload') as pool:
+        results = list(pool.map(store, files))
+
+    stored = [result for result, _ in results if result]
+    if stored:
+        try:
+            _save_attachments(grievance_id, [attachment_data for attachment_data, _ in stored])
+        except ValueError as ve:
+            # Nothing was recorded, so every uploaded file counts as failed
+            for _, preview_source in stored:
+                _discard_preview_source(preview_source)
+            return [(None, error or ve) for _, error in results]
+        queue_attachment_previews(grievance_id, stored)
+
+    return [(result[0]['url'] if result else None, error) for result, error in results]
+
 def get_grievance_by_id(grievance_id):
-    """Get grievance details by ID"""
+    """Get grievance details by ID
+    
+    Only the grievance document is read; its status history and attachments
+    are paged separately with get_status_history and get_grievance_attachments.
+    """
     try:
         grievance_doc = db.collection('grievances').document(grievance_id).get()
         if grievance_doc.exists:
             grievance_data = grievance_doc.to_dict()
             grievance_data['id'] = grievance_doc.id
             
-            # Format timestamps
+            # Grievances the timestamp migration has not reached yet still hold ISO strings
             grievance_data['createdAt'] = format_timestamp(grievance_data.get('createdAt'))
             grievance_data['updatedAt'] = format_timestamp(grievance_data.get('updatedAt'))
-            
-            # Ensure statusHistory exists and is properly formatted
-            if 'statusHistory' not in grievance_data or not grievance_data['statusHistory']:
-                grievance_data['statusHistory'] = []
-            
-            # Format timestamps in status history
-            if grievance_data['statusHistory']:
-                for status_entry in grievance_data['statusHistory']:
-                    if 'timestamp' in status_entry:
-                        status_entry['timestamp'] = format_timestamp(status_entry['timestamp'])
-                        
-            # Format timestamps in attachments
-            if 'attachments' in grievance_data and grievance_data['attachments']:
-                for attachment in grievance_data['attachments']:
-                    if 'uploadedAt' in attachment:
-                        attachment['uploadedAt'] = format_timestamp(attachment['uploadedAt'])
-                        
             return grievance_data
         return None
     except Exception as e:
         print(f"Error getting grievance: {e}")
         return None
 
-# Department Management Functions
-def get_all_departments():
-    """Get all departments from Firestore"""
+# Status History and Attachment Functions
+# Status changes and attachments are documents in subcollections of their
+# grievance, written once and never rewritten, so grievance documents stay
+# small and list queries do not carry them along.
+HISTORY_PAGE_SIZE = 10
+ATTACHMENT_PAGE_SIZE = 10
+
+def _history_ref(grievance_id):
+    """Subcollection holding a grievance's status changes"""
+    return db.collection('grievances').document(grievance_id).collection('status_history')
+
+def _attachments_ref(grievance_id):
+    """Subcollection holding a grievance's attachment records"""
+    return db.collection('grievances').document(grievance_id).collection('attachments')
+
+def _paginate_subcollection(query, field, direction, page_size, cursor=None):
+    """Read one page of a subcollection ordered by field, for 'show more' lists
+    
+    Returns:
+        Dictionary with 'items' and 'next_cursor' keys
+    """
+    page_size = max(1, min(int(page_size or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    query = query.order_by(field, direction=direction).order_by('__name__', direction=direction)
+    
+    position = _decode_cursor(cursor, field) if cursor else None
+    if position:
+        query = query.start_after(position[1])
+    docs = list(query.limit(page_size + 1).stream())
+    has_next = len(docs) > page_size
+    docs = docs[:page_size]
+    
+    items = []
+    for doc in docs:
+        item = {**doc.to_dict(), 'id': doc.id}
+        # Entries copied from grievances not yet migrated may hold ISO strings
+        if field in item:
+            item[field] = format_timestamp(item[field])
+        items.append(item)
+    
+    return {
+        'items': items,
+        'next_cursor': _encode_cursor('after', docs[-1], field) if docs and has_next else None
+    }
+
+def get_status_history(grievance_id, page_size=HISTORY_PAGE_SIZE, cursor=None):
+    """Get one page of a grievance's status changes, newest first"""
     try:
-        dept_collection = db.collection('departments').order_by('name').get()
-        departments = [{'id': doc.id, **doc.to_dict()} for doc in dept_collection]
+        return _paginate_subcollection(_history_ref(grievance_id), 'timestamp',
+                                       firestore.Query.DESCENDING, page_size, cursor)
+    except Exception as e:
+        print(f"Error getting status history: {e}")
+        return {'items': [], 'next_cursor': None}
+
+def get_grievance_attachments(grievance_id, page_size=ATTACHMENT_PAGE_SIZE, cursor=None):
+    """Get one page of a grievance's attachments, in upload order"""
+    try:
+        return _paginate_subcollection(_attachments_ref(grievance_id), 'uploadedAt',
+                                       firestore.Query.ASCENDING, page_size, cursor)
+    except Exception as e:
+        print(f"Error getting attachments: {e}")
+        return {'items': [], 'next_cursor': None}
+
+def get_recent_grievances(limit=10, projection='list_row'):
+    """Get the most recently submitted grievances"""
+    try:
+        query = db.collection('grievances').order_by('createdAt', direction=firestore.Query.DESCENDING).limit(limit)
+        grievances = _project(query, projection).get()
         
-        # If no departments found in the dedicated collection, return default list
-        if not departments:
-            # Use set to get unique departments from grievances
-            grievances = db.collection('grievances').get()
-            department_set = set()
-            
-            for grievance in grievances:
-                data = grievance.to_dict()
-                if 'department' in data and data['department']:
-                    department_set.add(data['department'])
-            
-            # Convert to list of dict objects
-            departments = [{'id': None, 'name': dept, 'description': ''} for dept in sorted(department_set)]
-            
-            # Add these departments to Firestore if they don't exist
-            for dept in departments:
-                if not dept['id']:  # Only add departments that don't have an ID
-                    add_department(dept['name'], dept['description'])
-            
-            # Get fresh list from database
-            dept_collection = db.collection('departments').order_by('name').get()
-            departments = [{'id': doc.id, **doc.to_dict()} for doc in dept_collection]
+        result = []
+        for doc in grievances:
+            grievance_data = doc.to_dict()
+            grievance_data['id'] = doc.id
+            result.append(grievance_data)
             
-        return departments
+        return result
+    except Exception as e:
+        print(f"Error getting recent grievances: {e}")
+        return []
+
+# Aggregate Counter Functions
+def _stats_ref():
+    """Reference to the document holding the grievance counters"""
+    return db.collection('stats').document('grievances')
+
+def get_grievance_stats():
+    """Get grievance counts by status and department from the stats document
+    
+    Returns:
+        Dictionary with 'total', 'byStatus' and 'byDepartment' keys
+    """
+    try:
+        stats_doc = _stats_ref().get()
+        data = stats_doc.to_dict() if stats_doc.exists else {}
+        if not data.get('backfilled'):
+            # Writes since the deploy may have created the document with increments
+            # alone, so only a rebuild's marker says that older grievances are counted
+            print("Grievance counters have not been backfilled; rebuilding them from all grievances")
+            return recompute_grievance_stats()
+        
+        return {
+            'total': data.get('total', 0),
+            'byStatus': data.get('byStatus', {}),
+            'byDepartment': data.get('byDepartment', {})
+        }
+    except Exception as e:
+        print(f"Error getting grievance stats: {e}")
+        return {'total': 0, 'byStatus': {}, 'byDepartment': {}}
+
+# Page Version Functions
+# Conditional GETs (see http_cache.conditional) compare these small reads
+# instead of rendering a page. They are cached briefly per process and
+# dropped on every grievance write this process makes; writes made by other
+# workers are seen once the cache entry expires.
+version_cache = TTLCache(maxsize=4096, ttl=int(os.getenv('VERSION_CACHE_TTL', 2)))
+# Range start that limits updatedAt to timestamps; ISO strings left by older
+# versions would sort before them in descending order
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _grievances_changed():
+    version_cache.invalidate()
+
+def get_grievance_version(grievance_id):
+    """Version of a grievance's detail page data, from a projected read
+    
+    Returns:
+        Dictionary with 'version', 'updatedAt', 'studentId' and
+        'duplicateClusterId', or None if the grievance does not exist
+    """
+    def load():
+        snapshot = db.collection('grievances').document(grievance_id).get(
+            field_paths=['version', 'updatedAt', 'studentId', 'duplicateClusterId'])
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        return {
+            'version': data.get('version'),
+            'updatedAt': _event_time(data.get('updatedAt')),
+            'studentId': data.get('studentId'),
+            'duplicateClusterId': data.get('duplicateClusterId')
+        }
+    
+    try:
+        return version_cache.get_or_load(('grievance', grievance_id), load)
+    except Exception as e:
+        print(f"Error getting grievance version: {e}")
+        return None
+
+def get_grievance_list_version(student_id=None):
+    """Version of the grievance lists, or of one student's grievances
+    
+    Every change to a grievance list moves its updatedAt, so the newest
+    updatedAt changes with any of them; the total covers deletions.
+    """
+    def load():
+        query = db.collection('grievances')
+        if student_id:
+            query = query.where('studentId', '==', student_id)
+        query = query.where('updatedAt', '>=', _EPOCH) \
+            .order_by('updatedAt', direction=firestore.Query.DESCENDING) \
+            .select(['updatedAt']).limit(1)
+        newest = [_event_time(doc.to_dict().get('updatedAt')) for doc in query.stream()]
+        version = {'newest': newest[0] if newest else None}
+        if not student_id:
+            version['total'] = get_grievance_stats()['total']
+        return version
+    
+    try:
+        return version_cache.get_or_load(('list', student_id), load)
+    except Exception as e:
+        print(f"Error getting grievance list version: {e}")
+        return None
+
+def get_users_version():
+    """Version of the user profiles shown next to grievances: the newest updatedAt"""
+    def load():
+        query = db.collection('users').where('updatedAt', '>=', _EPOCH) \
+            .order_by('updatedAt', direction=firestore.Query.DESCENDING) \
+            .select(['updatedAt']).limit(1)
+        newest = [_event_time(doc.to_dict().get('updatedAt')) for doc in query.stream()]
+        return newest[0] if newest else None
+    
+    try:
+        return version_cache.get_or_load(('users',), load)
+    except Exception as e:
+        print(f"Error getting users version: {e}")
+        return None
+
+def recompute_grievance_stats():
+    """Rebuild the grievance counters from scratch by scanning all grievances
+    
+    Only the status and department fields are read. The stats document is
+    overwritten, so this also repairs counters that have drifted.
+    """
+    stats = {'total': 0, 'byStatus': {}, 'byDepartment': {}}
+    
+    for doc in _project(db.collection('grievances'), 'stats').stream():
+        data = doc.to_dict()
+        status = data.get('status', 'pending')
+        department = data.get('department', 'Unknown')
+        
+        stats['total'] += 1
+        stats['byStatus'][status] = stats['byStatus'].get(status, 0) + 1
+        stats['byDepartment'][department] = stats['byDepartment'].get(department, 0) + 1
+    
+    for status, count in stats['byStatus'].items():
+        if status not in STATUS_OPTIONS:
+            print(f"Warning: {count} grievance(s) have the unknown status '{status}' and are in neither "
+                  f"the open nor the resolved lists; set them to one of {', '.join(STATUS_OPTIONS)}")
+    
+    _stats_ref().set({**stats, 'backfilled': True, 'updatedAt': firestore.SERVER_TIMESTAMP})
+    return stats
+
+# Live Update Functions
+# At most this many dashboards stream updates from one worker process; the rest retry later
+LIVE_MAX_STREAMS = int(os.getenv('LIVE_MAX_STREAMS', 8))
+# Firestore listeners are re-anchored this often so they do not keep every grievance
+# updated since the worker started; the overlap covers writes made while switching
+LIVE_WATCH_RENEW_SECONDS = int(os.getenv('LIVE_WATCH_RENEW_SECONDS', 3600))
+LIVE_WATCH_OVERLAP_SECONDS = 60
+
+def _event_time(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def _grievance_event(grievance_id, data, since):
+    """Event data for a changed grievance; 'new' marks grievances created since the feed started"""
+    created_at = format_timestamp(data.get('createdAt'))
+    return {
+        'id': grievance_id,
+        'title': data.get('title', ''),
+        'department': data.get('department', ''),
+        'status': data.get('status', 'pending'),
+        'studentId': data.get('studentId'),
+        'createdAt': _event_time(created_at),
+        'updatedAt': _event_time(data.get('updatedAt')),
+        'new': isinstance(created_at, datetime) and created_at >= since
+    }
+
+def _stats_event(data):
+    return {
+        'total': data.get('total', 0),
+        'byStatus': data.get('byStatus', {}),
+        'byDepartment': data.get('byDepartment', {})
+    }
+
+def _watch_local_store(publish):
+    """Publish every committed grievance and counter write of the in-memory store"""
+    since = utc_now()
+
+    def on_write(references):
+        for reference in references:
+            if reference.path == _stats_ref().path:
+                snapshot = reference.get()
+                if snapshot.exists:
+                    publish('stats', _stats_event(snapshot.to_dict()))
+            elif reference.path.startswith('grievances/') and reference.path.count('/') == 1:
+                snapshot = reference.get()
+                if snapshot.exists:
+                    publish('grievance', _grievance_event(snapshot.id, snapshot.to_dict(), since))
+
+    db.on_write(on_write)
+
+def _watch_firestore(publish):
+    """Publish grievance and counter changes from Firestore snapshot listeners"""
+    def on_stats(docs, changes, read_time):
+        for doc in docs:
+            if doc.exists:
+                publish('stats', _stats_event(doc.to_dict()))
+
+    def listen():
+        # Only grievances updated from now on
+        since = utc_now() - timedelta(seconds=LIVE_WATCH_OVERLAP_SECONDS)
+
+        def on_changes(docs, changes, read_time):
+            for change in changes:
+                if change.type.name != 'REMOVED':
+                    publish('grievance', _grievance_event(change.document.id, change.document.to_dict(), since))
+
+        return db.collection('grievances').where('updatedAt', '>=', since).on_snapshot(on_changes)
+
+    _stats_ref().on_snapshot(on_stats)
+    watch = listen()
+
+    def renew():
+        nonlocal watch
+        while True:
+            time.sleep(LIVE_WATCH_RENEW_SECONDS)
+            try:
+                renewed = listen()
+            except Exception as e:
+                print(f"Error renewing grievance listener: {e}")
+                continue
+            watch.unsubscribe()
+            watch = renewed
+
+    threading.Thread(target=renew, name='live-updates-renew', daemon=True).start()
+
+def watch_grievances(publish):
+    """Start this process's feed of grievance changes into publish(event, data)
+
+    Publishes 'grievance' events for created and updated grievances and
+    'stats' events with the counters whenever they change.
+    """
+    if DATA_BACKEND == 'memory':
+        _watch_local_store(publish)
+    else:
+        _watch_firestore(publish)
+
+live_updates = EventBus(watch_grievances, max_subscribers=LIVE_MAX_STREAMS)
+
+# Monthly Report Rollup Functions
+def _month_key(created_at):
+    """Get the YYYY-MM rollup key (in UTC) for a grievance's createdAt value"""
+    parsed = format_timestamp(created_at)
+    if hasattr(parsed, 'strftime'):
+        return parsed.strftime('%Y-%m')
+    return 'Unknown'
+
+# Marker document in the migrations collection written by recompute_report_rollups
+ROLLUP_BACKFILL = 'reportRollups'
+
+def _rollup_ref(month):
+    """Reference to the rollup document for one month"""
+    return db.collection('report_rollups').document(month)
+
+def get_report_rollups():
+    """Get the per-month rollup documents used by the reports page
+    
+    Returns:
+        Dictionary mapping 'YYYY-MM' to that month's rollup, which holds
+        'total', 'byStatus', 'byDepartment' and 'byDepartmentStatus' counts
+    """
+    try:
+        # Writes since the deploy may have created rollups with increments alone,
+        # so only the marker left by a rebuild says that older grievances are counted
+        if not _migration_ref(ROLLUP_BACKFILL).get().exists:
+            print("Report rollups have not been backfilled; rebuilding them from all grievances")
+            rollups = recompute_report_rollups()
+        else:
+            rollups = {doc.id: doc.to_dict() for doc in db.collection('report_rollups').stream()}
+        return dict(sorted(rollups.items()))
+    except Exception as e:
+        print(f"Error getting report rollups: {e}")
+        return {}
+
+def recompute_report_rollups():
+    """Rebuild the monthly report rollups from scratch by scanning all grievances
+    
+    Rollup documents for months that no longer have grievances are removed.
+    """
+    rollups = {}
+    
+    for doc in _project(db.collection('grievances'), 'stats').stream():
+        data = doc.to_dict()
+        status = data.get('status', 'pending')
+        department = data.get('department', 'Unknown')
+        month = _month_key(data.get('createdAt'))
+        
+        rollup = rollups.setdefault(month, {
+            'month': month, 'total': 0, 'byStatus': {}, 'byDepartment': {}, 'byDepartmentStatus': {}
+        })
+        rollup['total'] += 1
+        rollup['byStatus'][status] = rollup['byStatus'].get(status, 0) + 1
+        rollup['byDepartment'][department] = rollup['byDepartment'].get(department, 0) + 1
+        dept_status = rollup['byDepartmentStatus'].setdefault(department, {})
+        dept_status[status] = dept_status.get(status, 0) + 1
+    
+    stale = [doc.reference for doc in db.collection('report_rollups').select([]).stream() if doc.id not in rollups]
+    
+    # Firestore allows at most 500 writes per batch
+    writes = [(ref, None) for ref in stale] + [(_rollup_ref(month), data) for month, data in rollups.items()]
+    for start in range(0, len(writes), 500):
+        batch = db.batch()
+        for ref, data in writes[start:start + 500]:
+            if data is None:
+                batch.delete(ref)
+            else:
+                batch.set(ref, data)
+        batch.commit()
+    
+    _migration_ref(ROLLUP_BACKFILL).set({'done': True, 'months': len(rollups), 'updatedAt': firestore.SERVER_TIMESTAMP})
+    return rollups
+
+# Grievance Migration Functions
+# Migrations read grievances a page per transaction and end a page early
+# rather than exceed the batch write limit with the checkpoint write
+TIMESTAMP_MIGRATION_BATCH = 400
+SUBCOLLECTION_MIGRATION_BATCH = 100
+
+def _migration_ref(name):
+    """Reference to the checkpoint document of a migration"""
+    return db.collection('migrations').document(name)
+
+@firestore.transactional
+def _migrate_page(transaction, name, query, checkpoint, plan):
+    """Apply one page of a migration and advance its checkpoint in the same commit
+    
+    Reading the page in the transaction keeps a status change or upload made
+    meanwhile from being overwritten by the migration's writes.
+    """
+    docs = list(transaction.get(query))
+    writes = []
+    scanned = converted = 0
+    last_id = checkpoint.get('lastId')
+    for doc in docs:
+        doc_writes = plan(doc)
+        if scanned and len(writes) + len(doc_writes) >= BATCH_WRITE_LIMIT:
+            break
+        writes.extend(doc_writes)
+        scanned += 1
+        converted += 1 if doc_writes else 0
+        last_id = doc.id
+    
+    for method, ref, data in writes:
+        getattr(transaction, method)(ref, data)
+    
+    progress = {
+        'lastId': last_id,
+        'scanned': checkpoint.get('scanned', 0) + scanned,
+        'converted': checkpoint.get('converted', 0) + converted,
+        'done': len(docs) == 0
+    }
+    transaction.set(_migration_ref(name), {**progress, 'updatedAt': firestore.SERVER_TIMESTAMP}, merge=True)
+    return {**checkpoint, **progress}
+
+def _run_migration(name, fields, plan, batch_size, restart=False, on_progress=None):
+    """Run plan(snapshot) -> [(method, reference, data), ...] over every grievance
+    
+    Grievances are read in document ID order and the last ID migrated is
+    checkpointed in migrations/<name> with each page, so an interrupted run
+    resumes where it stopped. A finished migration is checked again from
+    the first grievance.
+    """
+    batch_size = max(1, min(int(batch_size), BATCH_WRITE_LIMIT - 1))
+    checkpoint_doc = _migration_ref(name).get()
+    checkpoint = checkpoint_doc.to_dict() if checkpoint_doc.exists and not restart else {}
+    if checkpoint.get('done'):
+        checkpoint = {}
+    
+    query = db.collection('grievances').select(fields).order_by('__name__').limit(batch_size)
+    
+    while True:
+        page_query = query.start_after({'__name__': checkpoint['lastId']}) if checkpoint.get('lastId') else query
+        checkpoint = _migrate_page(db.transaction(), name, page_query, checkpoint, plan)
+        _grievances_changed()
+        if on_progress:
+            on_progress(checkpoint)
+        if checkpoint['done']:
+            return checkpoint
+
+def _native_timestamps(data):
+    """Updates converting a grievance's ISO string timestamps to native timestamps, or {} if there are none"""
+    def convert(value):
+        converted = format_timestamp(value) if isinstance(value, str) else None
+        return converted if isinstance(converted, datetime) else None
+    
+    updates = {}
+    for field in ('createdAt', 'updatedAt'):
+        converted = convert(data.get(field))
+        if converted:
+            updates[field] = converted
+    
+    # Grievances not yet moved to subcollections keep these as arrays, whose
+    # entries cannot be updated in place, so the whole array is rewritten
+    for field, key in (('statusHistory', 'timestamp'), ('attachments', 'uploadedAt')):
+        entries = data.get(field) or []
+        changed = False
+        rewritten = []
+        for entry in entries:
+            converted = convert(entry.get(key)) if isinstance(entry, dict) else None
+            if converted:
+                entry = {**entry, key: converted}
+                changed = True
+            rewritten.append(entry)
+        if changed:
+            updates[field] = rewritten
+    return updates
+
+def _timestamp_writes(doc):
+    updates = _native_timestamps(doc.to_dict())
+    return [('update', doc.reference, {**updates, 'version': firestore.Increment(1)})] if updates else []
+
+def migrate_grievance_timestamps(batch_size=TIMESTAMP_MIGRATION_BATCH, restart=False, on_progress=None):
+    """Convert ISO string timestamps on existing grievances to native Firestore timestamps
+    
+    Checkpointed in migrations/grievanceTimestamps. Strings without a UTC
+    offset are taken as the server's local time, which is how they were written.
+    
+    Args:
+        batch_size: Grievances read and converted per transaction
+        restart: Ignore the checkpoint and scan every grievance again
+        on_progress: Called with the checkpoint dict after each page
+    
+    Returns:
+        The final checkpoint, with 'scanned' and 'converted' counts
+    """
+    return _run_migration('grievanceTimestamps', ['createdAt', 'updatedAt', 'statusHistory', 'attachments'],
+                          _timestamp_writes, batch_size, restart, on_progress)
+
+def _subcollection_writes(doc):
+    """Writes moving a grievance's statusHistory and attachments arrays into its subcollections"""
+    data = doc.to_dict()
+    if 'statusHistory' not in data and 'attachments' not in data:
+        return []
+    
+    # Entries without a usable time get the grievance's, so the ordered pages include them
+    created_at = format_timestamp(data.get('createdAt'))
+    def entry_time(value):
+        value = format_timestamp(value)
+        return value if isinstance(value, datetime) else created_at
+    
+    writes = []
+    for entry in data.get('statusHistory') or []:
+        if isinstance(entry, dict):
+            writes.append(('set', _history_ref(doc.id).document(),
+                           {**entry, 'timestamp': entry_time(entry.get('timestamp'))}))
+    attachments = [entry for entry in data.get('attachments') or [] if isinstance(entry, dict)]
+    for attachment in attachments:
+        writes.append(('set', _attachments_ref(doc.id).document(),
+                       {**attachment, 'uploadedAt': entry_time(attachment.get('uploadedAt'))}))
+    writes.append(('update', doc.reference, {
+        'statusHistory': firestore.DELETE_FIELD,
+        'attachments': firestore.DELETE_FIELD,
+        'attachmentCount': firestore.Increment(len(attachments)),
+        'version': firestore.Increment(1)
+    }))
+    return writes
+
+def migrate_grievance_subcollections(batch_size=SUBCOLLECTION_MIGRATION_BATCH, restart=False, on_progress=None):
+    """Move the statusHistory and attachments arrays of existing grievances into subcollections
+    
+    Checkpointed in migrations/grievanceSubcollections. Each grievance's
+    arrays are removed in the same commit that writes their entries, so a
+    grievance is never moved twice.
+    
+    Args:
+        batch_size: Grievances read per transaction
+        restart: Ignore the checkpoint and scan every grievance again
+        on_progress: Called with the checkpoint dict after each page
+    
+    Returns:
+        The final checkpoint, with 'scanned' and 'converted' counts
+    """
+    return _run_migration('grievanceSubcollections', ['createdAt', 'statusHistory', 'attachments'],
+                          _subcollection_writes, batch_size, restart, on_progress)
+
+# Department Management Functions
+
+# Departments change maybe once a semester, so keep them in a small per-process
+# cache. Every department write below invalidates it.
+department_cache = TTLCache(maxsize=64, ttl=int(os.getenv('DEPARTMENT_CACHE_TTL', 300)))
+
+def get_department_cache_stats():
+    """Get hit/miss counters for the department cache"""
+    return department_cache.stats()
+
+def get_all_departments():
+    """Get all departments, served from the department cache when possible"""
+    try:
+        return department_cache.get_or_load('all', _load_all_departments)
     except Exception as e:
         print(f"Error getting departments: {e}")
         return []
 
+def _load_all_departments():
+    """Get all departments from Firestore"""
+    dept_collection = db.collection('departments').order_by('name').get()
+    departments = [{'id': doc.id, **doc.to_dict()} for doc in dept_collection]
+    
+    # If no departments found in the dedicated collection, return default list
+    if not departments:
+        # Use set to get unique departments from grievances
+        grievances = db.collection('grievances').select(['department']).get()
+        department_set = set()
+        
+        for grievance in grievances:
+            data = grievance.to_dict()
+            if 'department' in data and data['department']:
+                department_set.add(data['department'])
+        
+        # Convert to list of dict objects
+        departments = [{'id': None, 'name': dept, 'description': ''} for dept in sorted(department_set)]
+        
+        # Add these departments to Firestore if they don't exist
+        for dept in departments:
+            if not dept['id']:  # Only add departments that don't have an ID
+                add_department(dept['name'], dept['description'])
+        
+        # Get fresh list from database
+        dept_collection = db.collection('departments').order_by('name').get()
+        departments = [{'id': doc.id, **doc.to_dict()} for doc in dept_collection]
+        
+    return departments
+
 def add_department(name, description=''):
     """Add a new department to Firestore"""
     try:
@@ -522,6 +1693,7 @@ def add_department(name, description=''):
         
         dept_ref = db.collection('departments').document()
         dept_ref.set(dept_data)
+        department_cache.invalidate()
         return True, dept_ref.id
     except Exception as e:
         print(f"Error adding department: {e}")
@@ -549,6 +1721,7 @@ def update_department(dept_id, name, description):
             'description': description,
             'updatedAt': firestore.SERVER_TIMESTAMP
         })
+        department_cache.invalidate()
         
         return True, "Department updated successfully"
     except Exception as e:
@@ -571,25 +1744,29 @@ def delete_department(dept_id):
         
         # Delete the department
         db.collection('departments').document(dept_id).delete()
+        department_cache.invalidate()
         return True, "Department deleted successfully"
     except Exception as e:
         print(f"Error deleting department: {e}")
         return False, str(e)
 
 def get_department_by_id(dept_id):
-    """Get a department by its ID"""
+    """Get a department by its ID, served from the department cache when possible"""
     try:
-        dept_ref = db.collection('departments').document(dept_id)
-        dept = dept_ref.get()
-        if dept.exists:
-            data = dept.to_dict()
-            data['id'] = dept_id
-            return data
-        return None
+        return department_cache.get_or_load(('id', dept_id), lambda: _load_department_by_id(dept_id))
     except Exception as e:
         print(f"Error getting department: {e}")
         return None
 
+def _load_department_by_id(dept_id):
+    """Get a department by its ID from Firestore"""
+    dept = db.collection('departments').document(dept_id).get()
+    if dept.exists:
+        data = dept.to_dict()
+        data['id'] = dept_id
+        return data
+    return None
+
 def get_all_users():
     """Get all users from the database"""
     try:
@@ -655,7 +1832,9 @@ def update_user(user_id, data):
                 print(f"Error updating display name in Auth: {e}")
 
         # Update in Firestore
-        db.collection('users').document(user_id).update(data)
+        db.collection('users').document(user_id).update({**data, 'updatedAt': firestore.SERVER_TIMESTAMP})
+        _forget_user(user_id)
+        version_cache.invalidate(('users',))
         return True
     except Exception as e:
         print(f"Error updating user: {e}")
@@ -668,8 +1847,8 @@ def delete_user(user_id):
     """
     try:
         # First check if user has any grievances
-        grievances = get_student_grievances(user_id)
-        if grievances and len(grievances) > 0:
+        grievances = db.collection('grievances').where('studentId', '==', user_id).select([]).limit(1).get()
+        if len(list(grievances)) > 0:
             return False, "Cannot delete user with existing grievances"
         
         # Delete from Auth
@@ -677,6 +1856,7 @@ def delete_user(user_id):
         
         # Delete from Firestore
         db.collection('users').document(user_id).delete()
+        _forget_user(user_id)
         
         return True, "User deleted successfully"
     except Exception as e:
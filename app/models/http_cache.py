@@ -0,0 +1,80 @@
+"""
+Conditional GET for pages that are reloaded often
+
+Students reload their grievance pages many times a day, mostly to see
+whether anything changed. A view decorated with conditional() gets a weak
+ETag built from a small version value (see get_grievance_version and
+get_grievance_list_version in firebase_utils), the logged-in user, the URL
+and the deployed templates. When the browser sends that ETag back in
+If-None-Match, the view is skipped and 304 Not Modified is returned
+without reading the rest of the page's data or rendering the template.
+
+Pages are sent with 'Cache-Control: private, no-cache', so browsers keep
+them but check with the server every time, and shared caches never store
+them.
+"""
+
+import os
+import json
+import hashlib
+from functools import wraps
+from flask import current_app, make_response, request, session
+
+_release = None
+
+def release_id():
+    """Digest of the templates and static files, so a deploy changes every ETag"""
+    global _release
+    if _release is None:
+        digest = hashlib.sha1(os.getenv('APP_RELEASE', '').encode('utf-8'))
+        for folder in (current_app.template_folder, current_app.static_folder):
+            folder = os.path.join(current_app.root_path, folder) if folder else None
+            if not folder or not os.path.isdir(folder):
+                continue
+            for root, dirs, files in os.walk(folder):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    digest.update(f"{os.path.relpath(path, folder)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+        _release = digest.hexdigest()
+    return _release
+
+def page_etag(version):
+    """ETag value for the current page, user and release at the given version"""
+    key = json.dumps([release_id(), session.get('user'), request.full_path, version],
+                     sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def conditional(version):
+    """Answer GET requests with 304 Not Modified while a page has not changed
+
+    version(**view_args) returns a JSON-serialisable value that changes
+    whenever the page would, or None to always render it. Responses other
+    than 200, and pages with flashed messages waiting to be shown, are
+    never validated.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method != 'GET' or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            page_version = version(**kwargs)
+            if page_version is None:
+                return view(*args, **kwargs)
+
+            etag = page_etag(page_version)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapped
+    return decorator
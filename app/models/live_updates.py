@@ -0,0 +1,100 @@
+"""
+Live updates for open dashboards
+
+Grievance changes and counter updates are published on an in-process
+event bus and streamed to browsers over Server-Sent Events (see the
+/events route), so a dashboard no longer has to be reloaded to see a new
+grievance or a status change.
+
+Each process runs one change feed, started when the first browser
+connects: Firestore snapshot listeners, or a write hook on the in-memory
+store (see firebase_utils.watch_grievances). Every connected browser gets
+its own bounded queue; a browser that stops reading is dropped instead of
+holding events in memory, and reconnects on its own.
+"""
+
+import os
+import json
+import queue
+import threading
+
+# Events a connection may fall behind by before it is dropped
+SUBSCRIBER_QUEUE_SIZE = 256
+
+class Subscription:
+    """One connected browser's queue of (event, data) pairs"""
+
+    def __init__(self, bus, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self._bus = bus
+        self._queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event, data):
+        try:
+            self._queue.put_nowait((event, data))
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next (event, data) pair, or None if nothing arrived within timeout seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+class EventBus:
+    """Fans events out to the subscriptions of the current process
+
+    The change feed is started by calling start_feed(publish) on the first
+    subscription in each process, so it is safe to create before a
+    pre-fork server forks its workers.
+    """
+
+    def __init__(self, start_feed=None, max_subscribers=None):
+        self.start_feed = start_feed
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._pid = None
+        self._subscribers = set()
+
+    def _ensure_feed(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._subscribers = set()
+                    if self.start_feed is not None:
+                        self.start_feed(self.publish)
+                    self._pid = os.getpid()
+
+    def subscribe(self):
+        """New Subscription, or None if max_subscribers are already connected"""
+        self._ensure_feed()
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event, data):
+        """Queue an event for every subscription; never blocks"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(event, data)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+def format_event(event, data):
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
@@ -0,0 +1,679 @@
+"""
+In-memory stand-ins for Firestore and Firebase Authentication
+
+Selected with DATA_BACKEND=memory. They implement the part of the
+google-cloud-firestore client API that the data access functions use:
+collections and subcollections, document get/set/update/delete, queries
+with where/order_by/limit/limit_to_last/select and cursors, batched writes,
+transactions, get_all, and the SERVER_TIMESTAMP, Increment, ArrayUnion,
+ArrayRemove and DELETE_FIELD transforms. This means every function in
+firebase_utils runs unchanged, without credentials or network access, for
+tests, load tests and benchmarks.
+
+Query semantics follow Firestore: documents missing a filtered or ordered
+field are excluded, values of different types order by type, ordering
+always ends with the document ID, and batches are limited to 500 writes.
+
+This is a stand-in for the Firestore client rather than a separate
+repository layer over users, grievances and departments, so there is only
+one implementation of the data access code to keep correct. Its limits:
+
+- It covers only the query, batch and transaction features the
+  application uses. Composite filters (Or/And), collection group queries,
+  aggregation queries and snapshot listeners (live updates use a write
+  hook instead) are not implemented, and unsupported filter operators
+  raise ValueError. Transactions run one at a time under a lock, so they
+  never conflict or retry as they can in Firestore.
+- Nothing is persisted: accounts, grievances and departments live in the
+  process and are lost when it exits. There is no SQLite backend.
+- Indexes are not enforced, so a query that would need a missing
+  composite index in Firestore still works here.
+"""
+
+import copy
+import heapq
+import random
+import string
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from google.cloud.firestore_v1 import transforms
+from werkzeug.security import generate_password_hash, check_password_hash
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+MAX_BATCH_WRITES = 500
+
+_OPERATORS = ('==', '!=', '<', '<=', '>', '>=', 'in', 'not-in', 'array_contains', 'array_contains_any')
+
+_ID_CHARS = string.ascii_letters + string.digits
+
+def _new_id(length=20):
+    return ''.join(random.choices(_ID_CHARS, k=length))
+
+class NotFound(Exception):
+    """Raised when updating a document that does not exist"""
+
+# Value handling
+
+def _normalize(value):
+    """Copy a value for storage, storing datetimes as UTC like Firestore does"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return copy.deepcopy(value)
+
+def _sort_key(value):
+    """Firestore cross-type ordering: null < bool < number < timestamp < string < bytes < reference < array < map"""
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, _normalize(value))
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, LocalDocumentReference):
+        return (6, value.path)
+    if isinstance(value, (list, tuple)):
+        return (8, tuple(_sort_key(v) for v in value))
+    if isinstance(value, dict):
+        return (9, tuple((k, _sort_key(v)) for k, v in sorted(value.items())))
+    return (10, repr(value))
+
+def _equal(a, b):
+    return _sort_key(a) == _sort_key(b)
+
+_MISSING = object()
+
+def _get_field(data, field_path):
+    """Read a dotted field path from a document, or _MISSING"""
+    return _get_parts(data, field_path.split('.'))
+
+def _get_parts(data, parts):
+    value = data
+    for part in parts:
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+def _apply_value(current, value):
+    """Resolve a written value against the field's current value, applying transforms"""
+    if value is transforms.SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, transforms.Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if isinstance(value, transforms.ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        for item in value.values:
+            if not any(_equal(item, existing) for existing in result):
+                result.append(_normalize(item))
+        return result
+    if isinstance(value, transforms.ArrayRemove):
+        result = list(current) if isinstance(current, list) else []
+        return [item for item in result if not any(_equal(item, removed) for removed in value.values)]
+    if isinstance(value, dict):
+        # Nested maps may contain transforms too
+        return {k: _apply_value(_MISSING, v) for k, v in value.items() if v is not transforms.DELETE_FIELD}
+    return _normalize(value)
+
+def _merge(target, updates):
+    """Deep-merge updates into target for set(..., merge=True)"""
+    for key, value in updates.items():
+        if value is transforms.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and not isinstance(value, transforms.Sentinel):
+            existing = target.get(key)
+            if not isinstance(existing, dict):
+                existing = {}
+            target[key] = _merge(existing, value)
+        else:
+            target[key] = _apply_value(target.get(key, _MISSING), value)
+    return target
+
+def _update_fields(target, updates):
+    """Apply update() semantics: keys are field paths and replace whole values"""
+    for field_path, value in updates.items():
+        parts = field_path.split('.')
+        parent = target
+        for part in parts[:-1]:
+            if not isinstance(parent.get(part), dict):
+                parent[part] = {}
+            parent = parent[part]
+        if value is transforms.DELETE_FIELD:
+            parent.pop(parts[-1], None)
+        else:
+            parent[parts[-1]] = _apply_value(parent.get(parts[-1], _MISSING), value)
+    return target
+
+# Snapshots and references
+
+class LocalDocumentSnapshot:
+    def __init__(self, reference, data, field_paths=None):
+        self.reference = reference
+        self._data = data
+        self._field_paths = field_paths
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        if self._field_paths is None:
+            return copy.deepcopy(self._data)
+        result = {}
+        for field_path in self._field_paths:
+            value = _get_field(self._data, field_path)
+            if value is not _MISSING:
+                _update_fields(result, {field_path: copy.deepcopy(value)})
+        return result
+
+    def get(self, field_path):
+        value = _get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+class LocalDocumentReference:
+    def __init__(self, client, collection_path, doc_id):
+        self._client = client
+        self._collection_path = collection_path
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection_path}/{self.id}"
+
+    @property
+    def parent(self):
+        return LocalCollectionReference(self._client, self._collection_path)
+
+    def collection(self, name):
+        return LocalCollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None):
+        with self._client._lock:
+            data = self._client._documents(self._collection_path).get(self.id)
+            return LocalDocumentSnapshot(self, copy.deepcopy(data), field_paths)
+
+    def set(self, document_data, merge=False):
+        batch = self._client.batch()
+        batch.set(self, document_data, merge=merge)
+        batch.commit()
+
+    def create(self, document_data):
+        batch = self._client.batch()
+        batch.create(self, document_data)
+        batch.commit()
+
+    def update(self, field_updates):
+        batch = self._client.batch()
+        batch.update(self, field_updates)
+        batch.commit()
+
+    def delete(self):
+        batch = self._client.batch()
+        batch.delete(self)
+        batch.commit()
+
+    def __eq__(self, other):
+        return isinstance(other, LocalDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+# Queries
+
+class LocalQuery:
+    def __init__(self, client, collection_path):
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = []
+        self._orders = []
+        self._limit = None
+        self._limit_to_last = False
+        self._projection = None
+        self._start = None
+        self._end = None
+
+    def _copy(self, **changes):
+        query = copy.copy(self)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        for key, value in changes.items():
+            setattr(query, key, value)
+        return query
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise ValueError(f"Unsupported filter operator for the in-memory store: {op_string!r}")
+        query = self._copy()
+        query._filters.append((field_path, op_string, value))
+        return query
+
+    def order_by(self, field_path, direction=ASCENDING):
+        query = self._copy()
+        query._orders.append((field_path, direction))
+        return query
+
+    def limit(self, count):
+        return self._copy(_limit=count, _limit_to_last=False)
+
+    def limit_to_last(self, count):
+        return self._copy(_limit=count, _limit_to_last=True)
+
+    def select(self, field_paths):
+        return self._copy(_projection=list(field_paths))
+
+    def start_at(self, document_fields):
+        return self._copy(_start=(document_fields, True))
+
+    def start_after(self, document_fields):
+        return self._copy(_start=(document_fields, False))
+
+    def end_at(self, document_fields):
+        return self._copy(_end=(document_fields, True))
+
+    def end_before(self, document_fields):
+        return self._copy(_end=(document_fields, False))
+
+    def _matches(self, doc_id, data):
+        for field_path, op, expected in self._filters:
+            value = doc_id if field_path == '__name__' else _get_field(data, field_path)
+            if value is _MISSING:
+                return False
+            if op == '==' and not _equal(value, expected):
+                return False
+            if op == '!=' and (value is None or _equal(value, expected)):
+                return False
+            if op in ('<', '<=', '>', '>='):
+                # Range filters only match values of the same type
+                if _sort_key(value)[0] != _sort_key(expected)[0]:
+                    return False
+                a, b = _sort_key(value), _sort_key(expected)
+                if not {'<': a < b, '<=': a <= b, '>': a > b, '>=': a >= b}[op]:
+                    return False
+            if op == 'in' and not any(_equal(value, item) for item in expected):
+                return False
+            if op == 'not-in' and (value is None or any(_equal(value, item) for item in expected)):
+                return False
+            if op == 'array_contains' and not (isinstance(value, list) and any(_equal(v, expected) for v in value)):
+                return False
+            if op == 'array_contains_any' and not (
+                    isinstance(value, list) and any(_equal(v, item) for v in value for item in expected)):
+                return False
+        return True
+
+    def _effective_orders(self):
+        """Explicit orders, then inequality fields, then the document ID"""
+        orders = list(self._orders)
+        ordered = {field for field, _ in orders}
+        last_direction = orders[-1][1] if orders else ASCENDING
+        for field_path, op, _ in self._filters:
+            if op in ('<', '<=', '>', '>=', '!=', 'not-in') and field_path not in ordered:
+                orders.append((field_path, last_direction))
+                ordered.add(field_path)
+        if '__name__' not in ordered:
+            orders.append(('__name__', last_direction))
+        return orders
+
+    def _cursor_values(self, cursor, orders):
+        document_fields, _ = cursor
+        if isinstance(document_fields, LocalDocumentSnapshot):
+            data = dict(document_fields._data or {})
+            data['__name__'] = document_fields.id
+            return [data['__name__'] if field == '__name__' else _get_field(data, field) for field, _ in orders]
+        if isinstance(document_fields, dict):
+            values = []
+            for field, _ in self._orders[:len(document_fields)]:
+                value = document_fields[field] if field in document_fields else _get_field(document_fields, field)
+                if value is _MISSING:
+                    raise ValueError(f"Cursor is missing a value for order field '{field}'")
+                values.append(value)
+            document_fields = values
+        values = list(document_fields)
+        return [v.id if isinstance(v, LocalDocumentReference) else v for v in values]
+
+    @staticmethod
+    def _compare(row_values, cursor_values, orders):
+        """Compare a row's order values with a cursor, honouring each order's direction"""
+        for value, cursor_value, (_, direction) in zip(row_values, cursor_values, orders):
+            a, b = _sort_key(value), _sort_key(cursor_value)
+            if a != b:
+                result = -1 if a < b else 1
+                return -result if direction == DESCENDING else result
+        return 0
+
+    def _run(self):
+        orders = self._effective_orders()
+
+        with self._client._lock:
+            documents = list(self._client._documents(self._collection_path).items())
+
+        fields = [None if field == '__name__' else field.split('.') for field, _ in orders]
+        rows = []
+        for doc_id, data in documents:
+            if self._filters and not self._matches(doc_id, data):
+                continue
+            values = []
+            for parts in fields:
+                value = doc_id if parts is None else _get_parts(data, parts)
+                if value is _MISSING:
+                    break
+                values.append(value)
+            else:
+                rows.append((values, doc_id, data))
+
+        directions = {direction for _, direction in orders}
+        if len(directions) == 1:
+            # Every order runs the same way: one sort on the combined key, or only
+            # the first rows of it when a plain limit() applies
+            reverse = DESCENDING in directions
+            def row_key(row):
+                return tuple(_sort_key(value) for value in row[0])
+            if self._limit is not None and not self._limit_to_last and not self._start and not self._end:
+                rows = (heapq.nlargest if reverse else heapq.nsmallest)(self._limit, rows, key=row_key)
+            else:
+                rows.sort(key=row_key, reverse=reverse)
+        else:
+            # Sort one order at a time, least significant first, so mixed directions work
+            for index in reversed(range(len(orders))):
+                rows.sort(key=lambda row: _sort_key(row[0][index]), reverse=orders[index][1] == DESCENDING)
+
+        if self._start:
+            cursor_values = self._cursor_values(self._start, orders)
+            inclusive = self._start[1]
+            rows = [row for row in rows
+                    if self._compare(row[0], cursor_values, orders) > (-1 if inclusive else 0)]
+        if self._end:
+            cursor_values = self._cursor_values(self._end, orders)
+            inclusive = self._end[1]
+            rows = [row for row in rows
+                    if self._compare(row[0], cursor_values, orders) < (1 if inclusive else 0)]
+
+        if self._limit is not None:
+            rows = rows[-self._limit:] if self._limit_to_last else rows[:self._limit]
+            if self._limit_to_last and self._limit == 0:
+                rows = []
+
+        collection = LocalCollectionReference(self._client, self._collection_path)
+        return [LocalDocumentSnapshot(collection.document(doc_id), copy.deepcopy(data), self._projection)
+                for _, doc_id, data in rows]
+
+    def get(self, transaction=None):
+        return self._run()
+
+    def stream(self, transaction=None):
+        for snapshot in self._run():
+            yield snapshot
+
+class LocalCollectionReference(LocalQuery):
+    @property
+    def id(self):
+        return self._collection_path.rsplit('/', 1)[-1]
+
+    def document(self, document_id=None):
+        return LocalDocumentReference(self._client, self._collection_path, document_id or _new_id())
+
+    def add(self, document_data, document_id=None):
+        reference = self.document(document_id)
+        reference.create(document_data)
+        return datetime.now(timezone.utc), reference
+
+    def list_documents(self):
+        with self._client._lock:
+            ids = list(self._client._documents(self._collection_path).keys())
+        return [self.document(doc_id) for doc_id in ids]
+
+# Writes
+
+class LocalWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def _add(self, write):
+        if len(self._writes) >= MAX_BATCH_WRITES:
+            raise ValueError(f"A batch can contain at most {MAX_BATCH_WRITES} writes")
+        self._writes.append(write)
+
+    def set(self, reference, document_data, merge=False):
+        self._add(('set', reference, document_data, merge))
+        return self
+
+    def create(self, reference, document_data):
+        self._add(('create', reference, document_data, False))
+        return self
+
+    def update(self, reference, field_updates):
+        self._add(('update', reference, field_updates, False))
+        return self
+
+    def delete(self, reference):
+        self._add(('delete', reference, None, False))
+        return self
+
+    def commit(self):
+        with self._client._lock:
+            # Check everything first so a failing batch changes nothing
+            for kind, reference, _, _ in self._writes:
+                exists = reference.id in self._client._documents(reference._collection_path)
+                if kind == 'update' and not exists:
+                    raise NotFound(f"No document to update: {reference.path}")
+                if kind == 'create' and exists:
+                    raise ValueError(f"Document already exists: {reference.path}")
+
+            for kind, reference, data, merge in self._writes:
+                documents = self._client._documents(reference._collection_path)
+                if kind == 'delete':
+                    documents.pop(reference.id, None)
+                elif kind == 'update':
+                    documents[reference.id] = _update_fields(documents[reference.id], data)
+                elif merge and reference.id in documents:
+                    documents[reference.id] = _merge(documents[reference.id], data)
+                else:
+                    documents[reference.id] = _merge({}, data)
+            self._client._notify([reference for _, reference, _, _ in self._writes])
+
+        results = list(self._writes)
+        self._writes = []
+        return results
+
+class LocalTransaction(LocalWriteBatch):
+    """Serializable transaction: holds the store lock from begin until commit or rollback
+
+    Provides the hooks that google.cloud.firestore.transactional calls, so
+    functions decorated with @firestore.transactional run unchanged.
+    """
+
+    _max_attempts = 1
+    _read_only = False
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._id = None
+
+    @property
+    def in_progress(self):
+        return self._id is not None
+
+    def _clean_up(self):
+        self._writes = []
+
+    def _begin(self, retry_id=None):
+        self._client._lock.acquire()
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        try:
+            return self.commit()
+        finally:
+            self._release()
+
+    def _rollback(self):
+        self._writes = []
+        self._release()
+
+    def _release(self):
+        if self._id is not None:
+            self._id = None
+            self._client._lock.release()
+
+    def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, LocalDocumentReference):
+            return iter([ref_or_query.get()])
+        return ref_or_query.stream()
+
+class LocalFirestore:
+    """Thread-safe in-memory document store with the Firestore client interface"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._listeners = []
+
+    def _documents(self, collection_path):
+        return self._collections.setdefault(collection_path, {})
+
+    def collection(self, collection_path):
+        return LocalCollectionReference(self, collection_path)
+
+    def document(self, document_path):
+        collection_path, doc_id = document_path.rsplit('/', 1)
+        return LocalDocumentReference(self, collection_path, doc_id)
+
+    def batch(self):
+        return LocalWriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return LocalTransaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for reference in references:
+            yield reference.get(field_paths=field_paths)
+
+    def collections(self):
+        with self._lock:
+            names = [path for path in self._collections if '/' not in path]
+        return [self.collection(name) for name in names]
+
+    def on_write(self, callback):
+        """Register callback(references) to be called after every committed write"""
+        self._listeners.append(callback)
+
+    def _notify(self, references):
+        for callback in list(self._listeners):
+            try:
+                callback(references)
+            except Exception as e:
+                print(f"Local store listener error: {e}")
+
+    def reset(self):
+        """Remove every document, e.g. between benchmark runs"""
+        with self._lock:
+            self._collections.clear()
+
+# Authentication
+
+class LocalAuthUser:
+    def __init__(self, uid, email, display_name):
+        self.uid = uid
+        self.email = email
+        self.display_name = display_name
+
+class UserNotFoundError(Exception):
+    """Raised when no local user matches"""
+
+class LocalAuth:
+    """Email/password accounts kept in memory
+
+    Covers the firebase_admin.auth calls (create_user, get_user,
+    get_user_by_email, update_user, delete_user) and pyrebase's
+    sign_in_with_email_and_password, so registration and login work offline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def reset(self):
+        """Remove every account"""
+        with self._lock:
+            self._users.clear()
+
+    def _find_by_email(self, email):
+        for uid, user in self._users.items():
+            if user['email'] == email:
+                return uid
+        return None
+
+    def create_user(self, email, password, display_name=None, **kwargs):
+        with self._lock:
+            if self._find_by_email(email):
+                raise ValueError(f"EMAIL_EXISTS: A user with email {email} already exists")
+            uid = _new_id(28)
+            self._users[uid] = {
+                'email': email,
+                'password': generate_password_hash(password),
+                'display_name': display_name
+            }
+            return LocalAuthUser(uid, email, display_name)
+
+    def get_user(self, uid):
+        with self._lock:
+            user = self._users.get(uid)
+            if not user:
+                raise UserNotFoundError(f"No user record found for {uid}")
+            return LocalAuthUser(uid, user['email'], user['display_name'])
+
+    def get_user_by_email(self, email):
+        with self._lock:
+            uid = self._find_by_email(email)
+            if not uid:
+                raise UserNotFoundError(f"No user record found for {email}")
+            return LocalAuthUser(uid, email, self._users[uid]['display_name'])
+
+    def update_user(self, uid, email=None, password=None, display_name=None, **kwargs):
+        with self._lock:
+            user = self._users.get(uid)
+            if not user:
+                raise UserNotFoundError(f"No user record found for {uid}")
+            if email is not None:
+                user['email'] = email
+            if password is not None:
+                user['password'] = generate_password_hash(password)
+            if display_name is not None:
+                user['display_name'] = display_name
+            return LocalAuthUser(uid, user['email'], user['display_name'])
+
+    def delete_user(self, uid):
+        with self._lock:
+            if self._users.pop(uid, None) is None:
+                raise UserNotFoundError(f"No user record found for {uid}")
+
+    def sign_in_with_email_and_password(self, email, password):
+        with self._lock:
+            uid = self._find_by_email(email)
+            if not uid or not check_password_hash(self._users[uid]['password'], password):
+                raise ValueError("INVALID_LOGIN_CREDENTIALS")
+            return {'localId': uid, 'email': email, 'idToken': uuid.uuid4().hex, 'registered': True}
@@ -0,0 +1,279 @@
+"""
+Request and Firestore metrics in the Prometheus text format
+
+Every request is timed and counted by endpoint, method and status code,
+and the requests in progress are tracked. The Firestore client used by
+firebase_utils is wrapped (see traced_client) so that each request also
+reports how many document reads and writes it caused, how many documents
+came back and roughly how many bytes were read and written. Per-request
+histograms of those numbers show which pages scan whole collections.
+
+The metrics are served on /metrics. prometheus_client is optional; without
+it nothing is recorded and /metrics is not available. Under Gunicorn the
+workers share their metrics through PROMETHEUS_MULTIPROC_DIR (set up in
+gunicorn.conf.py), so any worker can answer a scrape for all of them.
+"""
+
+import os
+import time
+from datetime import datetime
+from flask import g, has_request_context, request
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+    )
+except ImportError:
+    Counter = None
+
+# Label for work done outside a request, e.g. by preview and email threads
+BACKGROUND = '(background)'
+UNMATCHED = '(unmatched)'
+
+# Firestore stores at least this much per document besides its fields
+DOCUMENT_OVERHEAD = 32
+
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+BYTES_BUCKETS = (0, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+if Counter is not None:
+    REQUESTS = Counter('http_requests_total', 'Requests handled',
+                       ['endpoint', 'method', 'status'])
+    REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Time to handle a request',
+                                ['endpoint', 'method'])
+    IN_PROGRESS = Gauge('http_requests_in_progress', 'Requests being handled',
+                        ['endpoint', 'method'], multiprocess_mode='livesum')
+
+    FIRESTORE_READS = Counter('firestore_reads_total', 'Firestore documents read (billed reads)', ['endpoint'])
+    FIRESTORE_WRITES = Counter('firestore_writes_total', 'Firestore document writes', ['endpoint'])
+    FIRESTORE_DOCUMENTS = Counter('firestore_documents_returned_total', 'Documents returned by Firestore reads',
+                                  ['endpoint'])
+    FIRESTORE_BYTES = Counter('firestore_bytes_total', 'Estimated document bytes read and written',
+                              ['endpoint', 'direction'])
+
+    READS_PER_REQUEST = Histogram('firestore_reads_per_request', 'Firestore reads per request',
+                                  ['endpoint'], buckets=COUNT_BUCKETS)
+    WRITES_PER_REQUEST = Histogram('firestore_writes_per_request', 'Firestore writes per request',
+                                   ['endpoint'], buckets=COUNT_BUCKETS)
+    BYTES_READ_PER_REQUEST = Histogram('firestore_bytes_read_per_request', 'Estimated Firestore bytes read per request',
+                                       ['endpoint'], buckets=BYTES_BUCKETS)
+
+def metrics_enabled():
+    return Counter is not None and os.getenv('METRICS_ENABLED', '1') != '0'
+
+def value_size(value):
+    """Approximate storage size of a field value, following Firestore's size rules"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(key) + 1 + value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(item) for item in value)
+    # Timestamps, sentinels such as Increment and SERVER_TIMESTAMP, references
+    return 8
+
+def _snapshot_size(snapshot):
+    """Estimated size of the fields a snapshot returned, without copying them"""
+    data = getattr(snapshot, '_data', None)
+    if data is None:
+        return 0
+    field_paths = getattr(snapshot, '_field_paths', None)
+    if field_paths is not None:
+        # The in-memory store keeps the whole document on projected snapshots
+        fields = {path.split('.', 1)[0] for path in field_paths}
+        data = {key: value for key, value in data.items() if key in fields}
+    return value_size(data) + DOCUMENT_OVERHEAD
+
+def _usage():
+    """Firestore usage totals of the current request, or None outside requests"""
+    if has_request_context() and 'metrics_started' in g:
+        if 'firestore_usage' not in g:
+            g.firestore_usage = {'reads': 0, 'writes': 0, 'documents': 0, 'bytes_read': 0, 'bytes_written': 0}
+        return g.firestore_usage
+    return None
+
+def _record(reads=0, writes=0, documents=0, bytes_read=0, bytes_written=0):
+    usage = _usage()
+    if usage is not None:
+        usage['reads'] += reads
+        usage['writes'] += writes
+        usage['documents'] += documents
+        usage['bytes_read'] += bytes_read
+        usage['bytes_written'] += bytes_written
+    else:
+        _count_firestore(BACKGROUND, reads, writes, documents, bytes_read, bytes_written)
+
+def _count_firestore(endpoint, reads, writes, documents, bytes_read, bytes_written):
+    if reads:
+        FIRESTORE_READS.labels(endpoint).inc(reads)
+    if writes:
+        FIRESTORE_WRITES.labels(endpoint).inc(writes)
+    if documents:
+        FIRESTORE_DOCUMENTS.labels(endpoint).inc(documents)
+    if bytes_read:
+        FIRESTORE_BYTES.labels(endpoint, 'read').inc(bytes_read)
+    if bytes_written:
+        FIRESTORE_BYTES.labels(endpoint, 'write').inc(bytes_written)
+
+def _record_snapshots(snapshots, lookup=False):
+    """Count documents as they are consumed
+
+    A query is billed one read per document and at least one read; a lookup
+    by reference (get_all) is billed one read per reference, found or not.
+    """
+    looked_up = documents = size = 0
+    try:
+        for snapshot in snapshots:
+            looked_up += 1
+            if getattr(snapshot, 'exists', True):
+                documents += 1
+                size += _snapshot_size(snapshot)
+            yield snapshot
+    finally:
+        _record(reads=looked_up if lookup else max(documents, 1), documents=documents, bytes_read=size)
+
+def _unwrap(value):
+    if isinstance(value, _Traced):
+        return value._target
+    if isinstance(value, list):
+        return [_unwrap(item) for item in value]
+    return value
+
+def _call(method, args, kwargs):
+    return method(*[_unwrap(arg) for arg in args], **{key: _unwrap(arg) for key, arg in kwargs.items()})
+
+class _Traced:
+    """Stand-in for a Firestore client, reference or query that counts reads and writes"""
+
+    _WRITES = ('set', 'create', 'update', 'delete', 'add')
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value) or name.startswith('_'):
+            return value
+
+        def method(*args, **kwargs):
+            if name in ('batch', 'transaction'):
+                return _TracedWrites(_call(value, args, kwargs))
+            if name == 'stream':
+                return _record_snapshots(_call(value, args, kwargs))
+            if name == 'get_all':
+                return _record_snapshots(_call(value, args, kwargs), lookup=True)
+            if name == 'get':
+                return _traced_get(_call(value, args, kwargs))
+            if name in self._WRITES:
+                result = _call(value, args, kwargs)
+                _record(writes=1, bytes_written=value_size(args[0]) if args and name != 'delete' else 0)
+                return result
+
+            result = _call(value, args, kwargs)
+            # References and queries built from this one are traced as well
+            if hasattr(result, 'stream') or hasattr(result, 'collection'):
+                return _Traced(result)
+            return result
+        return method
+
+    def __repr__(self):
+        return f"<traced {self._target!r}>"
+
+def _traced_get(result):
+    if isinstance(result, list):
+        return list(_record_snapshots(result))
+    if hasattr(result, 'exists'):
+        _record(reads=1, documents=1 if result.exists else 0,
+                bytes_read=_snapshot_size(result) if result.exists else 0)
+        return result
+    # Transaction.get returns a generator of snapshots
+    return _record_snapshots(result)
+
+class _TracedWrites(_Traced):
+    """Stand-in for a write batch or transaction; writes are counted when they are committed"""
+
+    def __init__(self, target):
+        super().__init__(target)
+        self._pending = []
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+
+        def method(*args, **kwargs):
+            if name in ('set', 'create', 'update', 'delete'):
+                self._pending.append(value_size(args[1]) if len(args) > 1 else 0)
+                _call(value, args, kwargs)
+                return self
+            if name in ('commit', '_commit'):
+                result = _call(value, args, kwargs)
+                _record(writes=len(self._pending), bytes_written=sum(self._pending))
+                self._pending = []
+                return result
+            if name in ('_rollback', '_clean_up'):
+                self._pending = []
+            if name == 'get':
+                return _traced_get(_call(value, args, kwargs))
+            return _call(value, args, kwargs)
+        return method
+
+def traced_client(client):
+    """Wrap a Firestore client so its reads and writes are counted, if metrics are enabled"""
+    if not metrics_enabled():
+        return client
+    return _Traced(client)
+
+def install_request_metrics(app):
+    """Time and count every request of the app"""
+    if not metrics_enabled():
+        return
+
+    def labels():
+        return (request.endpoint or UNMATCHED, request.method)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        IN_PROGRESS.labels(*labels()).inc()
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        endpoint, method = labels()
+        IN_PROGRESS.labels(endpoint, method).dec()
+        REQUEST_LATENCY.labels(endpoint, method).observe(time.perf_counter() - started)
+        status = g.pop('metrics_status', 500 if exc is not None else 200)
+        REQUESTS.labels(endpoint, method, str(status)).inc()
+
+        usage = g.pop('firestore_usage', None) or {'reads': 0, 'writes': 0, 'documents': 0,
+                                                   'bytes_read': 0, 'bytes_written': 0}
+        _count_firestore(endpoint, usage['reads'], usage['writes'], usage['documents'],
+                         usage['bytes_read'], usage['bytes_written'])
+        READS_PER_REQUEST.labels(endpoint).observe(usage['reads'])
+        WRITES_PER_REQUEST.labels(endpoint).observe(usage['writes'])
+        BYTES_READ_PER_REQUEST.labels(endpoint).observe(usage['bytes_read'])
+
+def render_metrics():
+    """(body, content type) for a scrape, or None if metrics are not available"""
+    if not metrics_enabled():
+        return None
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
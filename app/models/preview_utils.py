@@ -0,0 +1,110 @@
+"""
+Thumbnails and previews for attachments
+
+Images are scaled down to a small WebP thumbnail and PDFs get a WebP image
+of their first page, so reviewing a grievance does not mean downloading
+every full-size file. Previews are generated by background threads after
+the upload has been saved; see firebase_utils.queue_attachment_previews.
+
+Pillow (images) and pypdfium2 (PDFs) are optional. Without them no previews
+are made and attachments are shown as plain links, as before.
+"""
+
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# Longest side of a preview, in pixels
+PREVIEW_SIZE = 320
+PREVIEW_QUALITY = 75
+PREVIEW_CONTENT_TYPE = 'image/webp'
+PREVIEW_EXTENSION = 'webp'
+
+IMAGE_TYPES = {'image/jpeg', 'image/png'}
+PDF_TYPES = {'application/pdf'}
+
+def can_preview(content_type):
+    """Whether a preview can be generated for this content type here"""
+    if content_type in IMAGE_TYPES:
+        return Image is not None
+    if content_type in PDF_TYPES:
+        return Image is not None and pdfium is not None
+    return False
+
+def _to_webp(image):
+    """Scale an image to fit PREVIEW_SIZE and encode it as WebP"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+
+    output = io.BytesIO()
+    image.save(output, 'WEBP', quality=PREVIEW_QUALITY, method=4)
+    return output.getvalue()
+
+def image_thumbnail(source):
+    """WebP thumbnail of an image file"""
+    with Image.open(source) as image:
+        # Let the JPEG decoder downscale while decoding instead of after
+        image.draft('RGB', (PREVIEW_SIZE, PREVIEW_SIZE))
+        return _to_webp(image)
+
+def pdf_preview(source):
+    """WebP image of the first page of a PDF file"""
+    document = pdfium.PdfDocument(source)
+    try:
+        page = document[0]
+        width, height = page.get_size()
+        # Render at roughly the preview size rather than full resolution
+        bitmap = page.render(scale=PREVIEW_SIZE / max(width, height, 1))
+        return _to_webp(bitmap.to_pil())
+    finally:
+        document.close()
+
+def make_preview(source, content_type):
+    """WebP preview bytes for a file path, or None if the type has no preview"""
+    if not can_preview(content_type):
+        return None
+    if content_type in IMAGE_TYPES:
+        return image_thumbnail(source)
+    return pdf_preview(source)
+
+class PreviewQueue:
+    """Background threads that run preview jobs off the request path
+
+    The pool is created on first use in each process, so it is safe to
+    import before a pre-fork server forks its workers.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+
+    def submit(self, job, *args):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='attachment-preview')
+                    self._pid = os.getpid()
+        return self._executor.submit(self._run, job, *args)
+
+    @staticmethod
+    def _run(job, *args):
+        try:
+            return job(*args)
+        except Exception as e:
+            print(f"Preview worker error: {e}")
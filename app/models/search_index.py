@@ -0,0 +1,345 @@
+"""
+Full-text search over grievance titles and descriptions
+
+Grievances are indexed in a local SQLite database using FTS5, an inverted
+index, so a search looks up the matching documents directly instead of
+scanning the grievances collection. Results are ranked with BM25, with
+matches in the title weighted above matches in the description.
+
+The index is kept up to date as grievances are created and their status
+changes (see firebase_utils). It only holds what search needs and can be
+rebuilt from Firestore at any time with rebuild_search_index.py, which
+indexes the oldest grievances first so rowids follow creation order.
+
+Two tables are used: grievance_docs holds one row per grievance with the
+fields used for filtering and display, and grievance_text is the FTS5
+table with the same rowid. A status change only touches grievance_docs,
+and re-indexing one grievance replaces one row in each table.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from markupsafe import Markup, escape
+
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS grievance_docs (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    student_id TEXT,
+    department TEXT,
+    status TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS grievance_docs_created_at ON grievance_docs (created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS grievance_text USING fts5(
+    title, description, tokenize = 'porter unicode61 remove_diacritics 2'
+);
+"""
+
+# BM25 column weights for (title, description)
+TITLE_WEIGHT = 5.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Ranking only considers this many of the most recently indexed matches, so
+# a query matching most of the collection still costs a bounded amount of
+# work. The total number of matches is still reported exactly.
+RANK_WINDOW = 10000
+
+# Words of description shown around the matches in each result
+SNIPPET_WORDS = 24
+
+# Snippet markers that cannot appear in grievance text, replaced by <mark> after escaping
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+
+_WORD_RE = re.compile(r'\w+')
+_TERM_RE = re.compile(r'"([^"]*)"?|(\S+)')
+
+def match_query(text):
+    """Turn what an admin typed into an FTS5 query string
+
+    Every term must match. "Quoted phrases" and hyphenated words such as
+    Wi-Fi are matched as phrases, and a term ending in * matches as a
+    prefix. Anything else that means something to FTS5 (operators, column
+    filters, brackets) is treated as plain text. Returns '' if there is
+    nothing to search for.
+    """
+    parts = []
+    for quoted, bare in _TERM_RE.findall(text or ''):
+        words = _WORD_RE.findall(quoted or bare)
+        if not words:
+            continue
+        phrase = '"' + ' '.join(words) + '"'
+        if bare.endswith('*') and len(words[-1]) >= 2:
+            phrase += '*'
+        parts.append(phrase)
+    return ' '.join(parts)
+
+def _iso(value):
+    """Timestamps are stored as UTC ISO strings of a fixed width so they sort and compare as text
+
+    Naive datetimes and ISO strings without an offset are taken as local
+    time, as grievances stored them before timestamps were native.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat(timespec='microseconds')
+    return str(value)
+
+def _highlight(snippet):
+    """Escape a snippet and wrap the matched words in <mark>"""
+    return Markup(str(escape(snippet)).replace(_MATCH_START, '<mark>').replace(_MATCH_END, '</mark>'))
+
+class SQLiteIndex:
+    """Local SQLite database holding an index derived from the grievances
+
+    One connection is opened per process on first use (again after a
+    fork), shared by its threads behind a lock. With a file path, several
+    worker processes can share the index; WAL mode lets them read while
+    another writes. ':memory:' keeps a private index in each process,
+    which suits the in-memory data backend.
+
+    Subclasses set SCHEMA, list their TABLES and keep one row per grievance
+    in DOCS_TABLE (with id and created_at columns), and implement _upsert
+    and _delete.
+    """
+
+    SCHEMA = ''
+    TABLES = ()
+    DOCS_TABLE = None
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # SQLite connections must not be used across fork(); the child opens its own
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+        return self._conn
+
+    def _connect(self):
+        if self.path != ':memory:':
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        if self.path != ':memory:':
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(self.SCHEMA)
+        return conn
+
+    def _write(self, fn, *args):
+        """Run fn(conn, *args) in one write transaction"""
+        conn = self._connection()
+        with self._lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = fn(conn, *args)
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            return result
+
+    def _after_rebuild(self, conn):
+        pass
+
+    def remove(self, grievance_ids):
+        """Drop grievances from the index"""
+        self._write(self._delete, list(grievance_ids))
+
+    def clear(self):
+        """Remove every grievance from the index"""
+        def clear(conn):
+            for table in self.TABLES:
+                conn.execute(f'DELETE FROM {table}')
+        self._write(clear)
+
+    def rebuild(self, grievances, chunk_size=500):
+        """Re-index every grievance from an iterable of grievance dicts
+
+        Grievances are written chunk by chunk, so new grievances and status
+        changes can be indexed while a rebuild runs. Entries for grievances
+        that were not seen and were created before the rebuild started are
+        removed at the end.
+
+        Returns:
+            Tuple of (indexed, removed) counts
+        """
+        started = _iso(datetime.now(timezone.utc))
+        conn = self._connection()
+        with self._lock:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS rebuild_seen (id TEXT PRIMARY KEY)')
+            conn.execute('DELETE FROM rebuild_seen')
+
+        def write_chunk(conn, chunk):
+            for grievance in chunk:
+                self._upsert(conn, grievance['id'], grievance)
+            conn.executemany('INSERT OR IGNORE INTO rebuild_seen (id) VALUES (?)', [(g['id'],) for g in chunk])
+
+        indexed = 0
+        chunk = []
+        for grievance in grievances:
+            chunk.append(grievance)
+            if len(chunk) >= chunk_size:
+                self._write(write_chunk, chunk)
+                indexed += len(chunk)
+                chunk = []
+        if chunk:
+            self._write(write_chunk, chunk)
+            indexed += len(chunk)
+
+        def remove_unseen(conn):
+            stale = [row[0] for row in conn.execute(
+                f'SELECT id FROM {self.DOCS_TABLE} WHERE id NOT IN (SELECT id FROM rebuild_seen) '
+                'AND (created_at IS NULL OR created_at < ?)', (started,))]
+            self._delete(conn, stale)
+            conn.execute('DELETE FROM rebuild_seen')
+            return len(stale)
+        removed = self._write(remove_unseen)
+
+        self._write(self._after_rebuild)
+        return indexed, removed
+
+class SearchIndex(SQLiteIndex):
+    """SQLite FTS5 index of grievance titles and descriptions"""
+
+    SCHEMA = SEARCH_SCHEMA
+    TABLES = ('grievance_text', 'grievance_docs')
+    DOCS_TABLE = 'grievance_docs'
+
+    @staticmethod
+    def _upsert(conn, grievance_id, data):
+        row = conn.execute('SELECT rowid FROM grievance_docs WHERE id = ?', (grievance_id,)).fetchone()
+        values = (data.get('studentId'), data.get('department'), data.get('status', 'pending'),
+                  _iso(data.get('createdAt')), _iso(data.get('updatedAt')))
+        if row:
+            rowid = row[0]
+            conn.execute('DELETE FROM grievance_text WHERE rowid = ?', (rowid,))
+            conn.execute('UPDATE grievance_docs SET student_id = ?, department = ?, status = ?, '
+                         'created_at = ?, updated_at = ? WHERE rowid = ?', values + (rowid,))
+        else:
+            rowid = conn.execute('INSERT INTO grievance_docs (id, student_id, department, status, created_at, updated_at) '
+                                 'VALUES (?, ?, ?, ?, ?, ?)', (grievance_id,) + values).lastrowid
+        conn.execute('INSERT INTO grievance_text (rowid, title, description) VALUES (?, ?, ?)',
+                     (rowid, data.get('title') or '', data.get('description') or ''))
+
+    @staticmethod
+    def _delete(conn, grievance_ids):
+        for grievance_id in grievance_ids:
+            row = conn.execute('SELECT rowid FROM grievance_docs WHERE id = ?', (grievance_id,)).fetchone()
+            if row:
+                conn.execute('DELETE FROM grievance_text WHERE rowid = ?', row)
+                conn.execute('DELETE FROM grievance_docs WHERE rowid = ?', row)
+
+    def add(self, grievance_id, data):
+        """Index a grievance, replacing any earlier entry for it"""
+        self._write(self._upsert, grievance_id, data)
+
+    def update_status(self, grievance_ids, status, updated_at=None):
+        """Record a status change; the indexed text stays as it is"""
+        ids = list(grievance_ids)
+        def update(conn):
+            conn.executemany('UPDATE grievance_docs SET status = ?, updated_at = ? WHERE id = ?',
+                             [(status, _iso(updated_at), gid) for gid in ids])
+        self._write(update)
+
+    def _after_rebuild(self, conn):
+        # Merge the FTS5 segments written by the rebuild into one for faster queries
+        conn.execute("INSERT INTO grievance_text (grievance_text) VALUES ('optimize')")
+
+    def search(self, text, statuses=None, department=None, page=1, page_size=25):
+        """Ranked full-text search
+
+        Args:
+            text: What the admin typed (see match_query)
+            statuses: Only grievances with one of these statuses
+            department: Only grievances for this department
+            page: 1-based page number
+            page_size: Results per page
+
+        Returns:
+            Dictionary with 'items' (dicts with id, title, snippet, studentId,
+            department, status, createdAt, updatedAt), 'total', 'page',
+            'page_size' and 'has_next'
+        """
+        page = max(1, page)
+        result = {'items': [], 'total': 0, 'page': page, 'page_size': page_size, 'has_next': False}
+        query = match_query(text)
+        if not query:
+            return result
+
+        where = ['grievance_text MATCH ?']
+        params = [query]
+        if statuses:
+            statuses = list(statuses)
+            where.append(f"d.status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if department:
+            where.append('d.department = ?')
+            params.append(department)
+
+        # The filters need grievance_docs; a plain text search only reads the FTS index
+        if len(where) > 1:
+            matches = f"FROM grievance_text JOIN grievance_docs d ON d.rowid = grievance_text.rowid WHERE {' AND '.join(where)}"
+        else:
+            matches = f'FROM grievance_text WHERE {where[0]}'
+        offset = (page - 1) * page_size
+
+        conn = self._connection()
+        with self._lock:
+            result['total'] = conn.execute(f'SELECT count(*) {matches}', params).fetchone()[0]
+            # Rank the newest matches (ties go to the newer grievance), then
+            # build snippets for just this page
+            ranked = conn.execute(
+                f"""SELECT rowid FROM (
+                        SELECT grievance_text.rowid AS rowid,
+                               bm25(grievance_text, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS score
+                        {matches}
+                        ORDER BY grievance_text.rowid DESC LIMIT {RANK_WINDOW})
+                    ORDER BY score, rowid DESC LIMIT ? OFFSET ?""",
+                params + [page_size, offset]).fetchall()
+            rowids = [row[0] for row in ranked]
+            rows = {}
+            if rowids:
+                rows = {row[0]: row[1:] for row in conn.execute(
+                    f"""SELECT grievance_text.rowid, d.id, grievance_text.title,
+                               snippet(grievance_text, 1, ?, ?, '…', {SNIPPET_WORDS}),
+                               d.student_id, d.department, d.status, d.created_at, d.updated_at
+                        FROM grievance_text JOIN grievance_docs d ON d.rowid = grievance_text.rowid
+                        WHERE grievance_text MATCH ? AND grievance_text.rowid IN ({', '.join('?' * len(rowids))})""",
+                    [_MATCH_START, _MATCH_END, query] + rowids)}
+
+        result['has_next'] = offset + page_size < min(result['total'], RANK_WINDOW)
+        result['items'] = [{
+            'id': row[0],
+            'title': row[1],
+            'snippet': _highlight(row[2]),
+            'studentId': row[3],
+            'department': row[4],
+            'status': row[5],
+            'createdAt': row[6],
+            'updatedAt': row[7]
+        } for row in (rows[rowid] for rowid in rowids if rowid in rows)]
+        return result
@@ -0,0 +1,276 @@
+"""
+Server-side sessions
+
+The session cookie only carries a signed, random session ID. The session
+data itself is kept in a key-value store shared by every worker process,
+so a login is valid in whichever worker serves the next request, and
+nothing but the ID travels with each request.
+
+Stores implement the small subset of the Redis client API the session
+interface uses: get, setex, expire and delete. SQLiteStore (the default)
+keeps sessions in a local SQLite file shared by the workers on one
+server, MemoryStore keeps them in the current process (for the in-memory
+data backend and tests), and a redis.Redis client can be used as is when
+several servers need to share sessions.
+"""
+
+import os
+import time
+import secrets
+import sqlite3
+import threading
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, BadSignature
+from werkzeug.datastructures import CallbackDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+class MemoryStore:
+    """Key-value store in a dict, private to the current process"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def setex(self, key, seconds, value):
+        with self._lock:
+            self._data[key] = (time.time() + seconds, value)
+        return True
+
+    def expire(self, key, seconds):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            self._data[key] = (time.time() + seconds, entry[1])
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+class SQLiteStore:
+    """Key-value store in a SQLite file, shared by the processes on one server
+
+    Expired entries are ignored on read and purged every PURGE_INTERVAL
+    seconds by whichever process writes next.
+    """
+
+    PURGE_INTERVAL = 300
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_purge = 0
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # SQLite connections must not be used across fork(); the child opens its own
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    directory = os.path.dirname(os.path.abspath(self.path))
+                    os.makedirs(directory, exist_ok=True)
+                    conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute('PRAGMA synchronous=NORMAL')
+                    conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)')
+                    conn.execute('CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)')
+                    self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        conn = self._connection()
+        with self._lock:
+            row = conn.execute('SELECT value FROM entries WHERE key = ? AND expires_at > ?',
+                               (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def setex(self, key, seconds, value):
+        conn = self._connection()
+        now = time.time()
+        with self._lock:
+            conn.execute('INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, value, now + seconds))
+            if now - self._last_purge > self.PURGE_INTERVAL:
+                conn.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+                self._last_purge = now
+        return True
+
+    def expire(self, key, seconds):
+        conn = self._connection()
+        with self._lock:
+            return conn.execute('UPDATE entries SET expires_at = ? WHERE key = ?',
+                                (time.time() + seconds, key)).rowcount > 0
+
+    def delete(self, *keys):
+        conn = self._connection()
+        with self._lock:
+            return sum(conn.execute('DELETE FROM entries WHERE key = ?', (key,)).rowcount for key in keys)
+
+def create_store(backend, path=None, redis_url=None):
+    """Build the session store for a SESSION_BACKEND value: 'sqlite', 'redis' or 'memory'"""
+    if backend == 'memory':
+        return MemoryStore()
+    if backend == 'sqlite':
+        return SQLiteStore(path or 'sessions.sqlite3')
+    if backend == 'redis':
+        if redis is None:
+            raise ValueError("SESSION_BACKEND=redis needs the redis package (pip install redis)")
+        if not redis_url:
+            raise ValueError("SESSION_BACKEND=redis needs SESSION_REDIS_URL")
+        return redis.Redis.from_url(redis_url)
+    raise ValueError(f"Unknown SESSION_BACKEND '{backend}', expected 'sqlite', 'redis' or 'memory'")
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its ID and whether it has been changed"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self):
+        """Move the session to a new ID, e.g. after logging in, so an ID
+        known before authentication cannot be used afterwards"""
+        self.rotate = True
+        self.modified = True
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface that keeps session data in a store
+
+    The cookie holds '<session id>.<signature>', signed with the app's
+    SECRET_KEY so that guessed or tampered IDs are rejected without a
+    store lookup. Entries expire after PERMANENT_SESSION_LIFETIME.
+    """
+
+    serializer = TaggedJSONSerializer()
+    key_prefix = 'session:'
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-side-session')
+
+    def _ttl(self, app):
+        return int(app.permanent_session_lifetime.total_seconds())
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('ascii')
+            except (BadSignature, UnicodeDecodeError):
+                sid = None
+            if sid:
+                try:
+                    data = self.store.get(self.key_prefix + sid)
+                except Exception as e:
+                    print(f"Error loading session: {e}")
+                    data = None
+                if data is not None:
+                    try:
+                        return ServerSideSession(self.serializer.loads(data), sid=sid)
+                    except ValueError:
+                        pass
+
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.rotate and not session.new:
+            self.store.delete(self.key_prefix + session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.new = True
+
+        # An emptied session (logout) is removed from the store and the browser
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(self.key_prefix + session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        if session.modified:
+            self.store.setex(self.key_prefix + session.sid, self._ttl(app), self.serializer.dumps(dict(session)))
+        elif session.permanent and app.config['SESSION_REFRESH_EACH_REQUEST']:
+            self.store.expire(self.key_prefix + session.sid, self._ttl(app))
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode('ascii'),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+        if session.accessed:
+            response.vary.add('Cookie')
+
+def load_secret_key(path):
+    """The SECRET_KEY setting, or a random key kept in a file next to the app
+
+    Every worker process and every restart must sign sessions with the same
+    key. Without SECRET_KEY, the first process creates the file and the rest
+    read it, which is enough for one server; set SECRET_KEY when running on
+    several.
+    """
+    secret_key = os.getenv('SECRET_KEY')
+    if secret_key:
+        return secret_key
+
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process may still be writing it
+        for _ in range(50):
+            with open(path, encoding='ascii') as f:
+                secret_key = f.read().strip()
+            if secret_key:
+                return secret_key
+            time.sleep(0.1)
+        raise RuntimeError(f"Secret key file {path} is empty")
+
+    secret_key = secrets.token_hex(32)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(secret_key)
+    print(f"Warning: SECRET_KEY is not set; generated one in {path}")
+    return secret_key
@@ -0,0 +1,198 @@
+"""
+Streaming validation and storage of uploaded attachments
+
+Uploads are never read into memory as a whole. AttachmentStream wraps the
+uploaded file, checks its signature (magic bytes) against the extension
+from the first chunk, counts bytes as they are read and fails as soon as
+the size limit is passed. Storage reads it one chunk at a time through a
+resumable upload, so each upload holds at most one UPLOAD_CHUNK_SIZE
+buffer, however large the file is.
+
+Files are stored by the SHA-256 of their content, so identical uploads
+share one stored copy (see firebase_utils._store_attachment).
+"""
+
+import io
+import os
+import uuid
+import hashlib
+import tempfile
+from urllib.parse import quote
+
+MAX_ATTACHMENT_SIZE = 5 * 1024 * 1024
+MAX_ATTACHMENTS = 5
+
+# Bytes read up front to identify the file type
+SNIFF_SIZE = 8 * 1024
+
+# Cloud Storage resumable uploads send chunks in multiples of 256 KB
+UPLOAD_CHUNK_SIZE = 4 * 256 * 1024
+
+# Allowed extensions with their content type and accepted file signatures
+ATTACHMENT_TYPES = {
+    'pdf': ('application/pdf', [b'%PDF-']),
+    'jpg': ('image/jpeg', [b'\xff\xd8\xff']),
+    'jpeg': ('image/jpeg', [b'\xff\xd8\xff']),
+    'png': ('image/png', [b'\x89PNG\r\n\x1a\n']),
+    'doc': ('application/msword', [b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1']),
+    'docx': ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', [b'PK\x03\x04'])
+}
+
+SIZE_LIMIT_MESSAGE = "File size exceeds 5MB limit. Please compress your file or choose a smaller one."
+
+class AttachmentStream(io.RawIOBase):
+    """Read-only file object that validates an upload while it is being read
+
+    Raises ValueError on creation if the file is empty, too large according
+    to its headers, or its first bytes do not match the extension, and from
+    read() once more than max_size bytes have been read. Whatever is
+    consuming the stream (a storage upload) is aborted by that error.
+    """
+
+    def __init__(self, file, extension, max_size=MAX_ATTACHMENT_SIZE):
+        super().__init__()
+        self.max_size = max_size
+        self._stream = file.stream
+        self._position = 0
+        self._base = _tell(self._stream)
+
+        # Reject oversized files before reading anything, when the size is known
+        if file.content_length and file.content_length > max_size:
+            raise ValueError(SIZE_LIMIT_MESSAGE)
+        declared_size = _remaining_size(self._stream)
+        if declared_size is not None and declared_size > max_size:
+            raise ValueError(SIZE_LIMIT_MESSAGE)
+
+        self._head = self._stream.read(SNIFF_SIZE)
+        if not self._head:
+            raise ValueError("File is empty. Please choose a valid file.")
+
+        self.content_type, signatures = ATTACHMENT_TYPES[extension]
+        if not any(self._head.startswith(signature) for signature in signatures):
+            raise ValueError(f"File content does not match its .{extension} extension. Please upload a valid {extension.upper()} file.")
+
+    @property
+    def size(self):
+        """Number of bytes read so far (the file size once fully read)"""
+        return self._position
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._stream.seekable()
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Used by storage clients to resend a chunk after a transient error
+        if whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("AttachmentStream only supports absolute seeks")
+        self._stream.seek(self._base + offset)
+        self._head = b''
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def read(self, size=-1):
+        """Read up to size bytes, returning fewer only at the end of the file"""
+        if size is None or size < 0:
+            # Never read past the limit, even when asked for everything
+            size = self.max_size - self._position + 1
+
+        parts = []
+        wanted = size
+        if self._head:
+            parts.append(self._head[:wanted])
+            self._head = self._head[wanted:]
+            wanted -= len(parts[0])
+        while wanted > 0:
+            data = self._stream.read(wanted)
+            if not data:
+                break
+            parts.append(data)
+            wanted -= len(data)
+
+        data = b''.join(parts)
+        self._position += len(data)
+        if self._position > self.max_size:
+            raise ValueError(SIZE_LIMIT_MESSAGE)
+        return data
+
+    def digest(self):
+        """Read the whole file and return (SHA-256 hex digest, size), leaving the stream rewound
+
+        Streams that cannot seek back are copied to a temporary file as they
+        are hashed, keeping no more than one chunk in memory.
+        """
+        sha256 = hashlib.sha256()
+        spool = None if self.seekable() else tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_SIZE)
+        while True:
+            chunk = self.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            sha256.update(chunk)
+            if spool is not None:
+                spool.write(chunk)
+
+        size = self.size
+        if spool is not None:
+            self._stream = spool
+            self._base = 0
+        self.seek(0)
+        return sha256.hexdigest(), size
+
+def _tell(stream):
+    try:
+        return stream.tell() if stream.seekable() else 0
+    except (AttributeError, OSError, ValueError):
+        return 0
+
+def _remaining_size(stream):
+    """Bytes left in a seekable stream (uploads spooled to disk), or None"""
+    try:
+        if not stream.seekable():
+            return None
+        position = stream.tell()
+        end = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+        return end - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def upload_stream(storage, path, stream, content_type):
+    """Upload a file object to storage chunk by chunk
+
+    Uses the storage bucket directly rather than pyrebase's child().put(),
+    which needs the whole file as bytes and keeps the target path on the
+    shared storage object between calls.
+    """
+    if getattr(storage, 'credentials', None):
+        blob = storage.bucket.blob(path)
+        blob.chunk_size = UPLOAD_CHUNK_SIZE
+        # Add metadata to enable file previews in console
+        blob.metadata = {"firebaseStorageDownloadTokens": str(uuid.uuid4())}
+        blob.upload_from_file(stream, content_type=content_type)
+        return
+
+    request_ref = f"{storage.storage_bucket}/o?name={quote(path, safe='')}"
+    response = storage.requests.post(request_ref, data=stream, headers={'Content-Type': content_type})
+    response.raise_for_status()
+
+def storage_url(storage, path):
+    """Download URL for a stored file"""
+    return f"{storage.storage_bucket}/o/{quote(path.lstrip('/'), safe='')}?alt=media"
+
+def delete_stored_file(storage, path):
+    """Remove a stored file"""
+    if getattr(storage, 'credentials', None):
+        storage.bucket.delete_blob(path)
+        return
+
+    response = storage.requests.delete(f"{storage.storage_bucket}/o/{quote(path, safe='')}")
+    response.raise_for_status()
@@ -1,59 +1,95 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, session, jsonify
+from flask import Blueprint, render_template, redirect, url_for, request, flash, session, jsonify, Response, stream_with_context
 from app.routes.auth_routes import login_required
 from app.models.firebase_utils import (
-    get_all_grievances, get_grievance_by_id, update_grievance_status,
-    get_department_grievances, get_user_by_id, get_all_departments,
+    get_grievance_by_id, update_grievance_status,
+    get_user_by_id, get_all_departments,
     add_department, update_department, delete_department, get_department_by_id,
     get_all_users, get_users_by_role, update_user, delete_user, reset_user_password,
-    get_student_grievances, get_open_grievances, get_resolved_grievances
+    get_student_grievances,
+    get_recent_grievances, get_grievance_stats, get_all_grievances_page,
+    get_open_grievances_page, get_resolved_grievances_page,
+    get_department_grievances_page, get_report_rollups, attach_student_info,
+    bulk_update_grievance_status, get_users_by_ids, iter_grievances, search_grievances,
+    get_duplicate_cluster_page, get_duplicate_cluster_ids, get_duplicate_cluster_size,
+    get_status_history, get_grievance_attachments, get_grievance_version, get_grievance_list_version,
+    get_users_version, get_user_profile, DEFAULT_PAGE_SIZE, STATUS_OPTIONS, OPEN_STATUSES, RESOLVED_STATUSES
 )
-from app.models.email_utils import send_grievance_status_update
+from app.models.http_cache import conditional
+from app.models.email_utils import send_grievance_status_update, send_grievance_status_digest
+from app.models.export_utils import EXPORT_FORMATS
+from datetime import datetime, timedelta
 import firebase_admin
-from firebase_admin import firestore
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
-# Status options for grievances
-STATUS_OPTIONS = {
-    'pending': 'Pending',
-    'in_progress': 'In Progress',
-    'assigned': 'Assigned to Department',
-    'under_review': 'Under Review',
-    'resolved': 'Resolved',
-    'closed': 'Closed'
-}
+def _page_args():
+    """Read the page size and cursor for a paginated listing from the query string"""
+    return request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int), request.args.get('cursor')
+
+def _page_urls(page):
+    """Build previous/next links for a page, keeping the current filters"""
+    args = {**request.view_args, **request.args.to_dict()}
+    args.pop('cursor', None)
+    
+    prev_url = url_for(request.endpoint, **args, cursor=page['prev_cursor']) if page['prev_cursor'] else None
+    next_url = url_for(request.endpoint, **args, cursor=page['next_cursor']) if page['next_cursor'] else None
+    return prev_url, next_url
+
+def _status_filter(status):
+    """Statuses for a status filter value: 'all', 'open', 'resolved' or a single status
+    
+    Returns None for 'all' and raises ValueError for an unknown status.
+    """
+    if status == 'all':
+        return None
+    if status == 'open':
+        return OPEN_STATUSES
+    if status == 'resolved':
+        return RESOLVED_STATUSES
+    if status in STATUS_OPTIONS:
+        return [status]
+    raise ValueError(f"Unknown status '{status}'")
+
+def _list_version(**view_args):
+    """Version of the grievance list pages, which change whenever any grievance or student profile does"""
+    grievances = get_grievance_list_version()
+    if grievances is None:
+        return None
+    return [grievances, get_users_version()]
+
+def _grievance_page_version(grievance_id):
+    """Version of a grievance page: the grievance, its student's profile and the size of its duplicate cluster"""
+    version = get_grievance_version(grievance_id)
+    if version is None:
+        return None
+    student_id = version['studentId']
+    cluster_id = version['duplicateClusterId']
+    return [version,
+            get_user_profile(student_id) if student_id else None,
+            get_duplicate_cluster_size(cluster_id) if cluster_id else 0]
 
 @admin_bp.route('/dashboard')
 @login_required(role='admin')
+@conditional(_list_version)
 def dashboard():
-    grievances = get_all_grievances()
+    stats = get_grievance_stats()
+    recent_grievances = attach_student_info(get_recent_grievances(10))
     
-    # Count grievances by status and department
+    # Always show every known status, even when its counter is zero
     status_counts = {status: 0 for status in STATUS_OPTIONS.keys()}
-    department_counts = {}
-    
-    for grievance in grievances:
-        status = grievance.get('status', 'pending')
-        department = grievance.get('department', 'Unknown')
-        
-        if status in status_counts:
-            status_counts[status] += 1
-        else:
-            status_counts[status] = 1
-            
-        if department in department_counts:
-            department_counts[department] += 1
-        else:
-            department_counts[department] = 1
+    status_counts.update(stats['byStatus'])
+    department_counts = {dept: count for dept, count in stats['byDepartment'].items() if count}
     
     return render_template('admin/dashboard.html', 
-                          grievances=grievances, 
+                          grievances=recent_grievances, 
+                          total_grievances=stats['total'],
                           status_counts=status_counts,
                           department_counts=department_counts,
                           status_options=STATUS_OPTIONS)
 
 @admin_bp.route('/grievance/<grievance_id>')
 @login_required(role='admin')
+@conditional(_grievance_page_version)
 def grievance_detail(grievance_id):
     grievance = get_grievance_by_id(grievance_id)
     
@@ -65,9 +101,16 @@ def grievance_detail(grievance_id):
     student_id = grievance.get('studentId')
     student = get_user_by_id(student_id) if student_id else None
     
+    cluster_id = grievance.get('duplicateClusterId')
+    cluster_size = get_duplicate_cluster_size(cluster_id) if cluster_id else 0
+    
     return render_template('admin/grievance_detail.html', 
                           grievance=grievance, 
+                          grievance_id=grievance_id,
+                          history=get_status_history(grievance_id),
+                          attachments=get_grievance_attachments(grievance_id),
                           student=student,
+                          cluster_size=cluster_size,
                           status_options=STATUS_OPTIONS)
 
 @admin_bp.route('/update-status/<grievance_id>', methods=['POST'])
@@ -102,62 +145,174 @@ def update_status(grievance_id):
     
     return redirect(url_for('admin.grievance_detail', grievance_id=grievance_id))
 
+@admin_bp.route('/grievances/bulk-status', methods=['POST'])
+@login_required(role='admin')
+def bulk_update_status():
+    """Change the status of several grievances at once, or of a whole duplicate cluster"""
+    grievance_ids = request.form.getlist('grievance_ids')
+    cluster_id = request.form.get('cluster_id')
+    new_status = request.form.get('status')
+    note = request.form.get('note', '')
+    
+    # Only follow local redirect targets
+    next_url = request.form.get('next', '')
+    if not next_url.startswith('/') or next_url.startswith('//'):
+        next_url = url_for('admin.all_grievances')
+    
+    if not new_status or new_status not in STATUS_OPTIONS:
+        flash('Invalid status.', 'danger')
+        return redirect(next_url)
+    
+    if cluster_id:
+        grievance_ids = get_duplicate_cluster_ids(cluster_id)
+    
+    if not grievance_ids:
+        flash('Select at least one grievance to update.', 'warning')
+        return redirect(next_url)
+    
+    updated, failed_ids = bulk_update_grievance_status(grievance_ids, new_status, note)
+    
+    # Send one email per student covering all of their updated grievances
+    by_student = {}
+    for grievance in updated:
+        if grievance['previousStatus'] != new_status:
+            by_student.setdefault(grievance.get('studentId'), []).append(grievance)
+    
+    students = get_users_by_ids(by_student.keys())
+    for student_id, student_grievances in by_student.items():
+        student = students.get(student_id)
+        if not student or not student.get('email'):
+            continue
+        if len(student_grievances) == 1:
+            grievance = student_grievances[0]
+            send_grievance_status_update(student['email'], grievance['id'], STATUS_OPTIONS[new_status], grievance['title'])
+        else:
+            send_grievance_status_digest(student['email'], student_grievances, STATUS_OPTIONS[new_status])
+    
+    if updated:
+        flash(f'Updated {len(updated)} grievance(s) to {STATUS_OPTIONS[new_status]}.', 'success')
+    if failed_ids:
+        flash(f'Failed to update {len(failed_ids)} grievance(s).', 'danger')
+    
+    return redirect(next_url)
+
+@admin_bp.route('/grievances/export')
+@login_required(role='admin')
+def export_grievances():
+    """Stream grievances as CSV or JSON Lines, filtered by department, status and date range"""
+    export_format = request.args.get('format', 'csv')
+    department = request.args.get('department') or None
+    status = request.args.get('status', 'all')
+    
+    if export_format not in EXPORT_FORMATS:
+        flash('Invalid export format.', 'danger')
+        return redirect(url_for('admin.all_grievances'))
+    
+    # Status may be a single status or one of the open/resolved groups
+    try:
+        statuses = _status_filter(status)
+    except ValueError:
+        flash('Invalid status.', 'danger')
+        return redirect(url_for('admin.all_grievances'))
+    
+    # Dates are YYYY-MM-DD; the end date is inclusive
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('end') else None
+    except ValueError:
+        flash('Invalid date. Use the format YYYY-MM-DD.', 'danger')
+        return redirect(url_for('admin.all_grievances'))
+    
+    serializer, mimetype = EXPORT_FORMATS[export_format]
+    rows = iter_grievances(department=department, statuses=statuses, start=start, end=end)
+    filename = f"grievances-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    
+    return Response(
+        stream_with_context(serializer(rows)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@admin_bp.route('/search')
+@login_required(role='admin')
+def search():
+    """Ranked full-text search over grievance titles and descriptions"""
+    query = request.args.get('q', '').strip()
+    department = request.args.get('department') or None
+    status = request.args.get('status', 'all')
+    page_number = max(1, request.args.get('page', 1, type=int))
+    
+    try:
+        statuses = _status_filter(status)
+    except ValueError:
+        flash('Invalid status.', 'danger')
+        return redirect(url_for('admin.search', q=query))
+    
+    results = None
+    prev_url = next_url = None
+    if query:
+        results = search_grievances(query, statuses=statuses, department=department, page=page_number,
+                                    page_size=request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int))
+        attach_student_info(results['items'])
+        
+        args = request.args.to_dict()
+        if page_number > 1:
+            prev_url = url_for('admin.search', **{**args, 'page': page_number - 1})
+        if results['has_next']:
+            next_url = url_for('admin.search', **{**args, 'page': page_number + 1})
+    
+    return render_template(
+        'admin/search.html',
+        query=query,
+        results=results,
+        department=department,
+        status=status,
+        departments=get_all_departments(),
+        status_options=STATUS_OPTIONS,
+        prev_url=prev_url,
+        next_url=next_url
+    )
+
 @admin_bp.route('/department-grievances')
 @login_required(role='admin')
+@conditional(_list_version)
 def list_department_grievances():
     department = request.args.get('department')
     
     if not department:
         return redirect(url_for('admin.dashboard'))
     
-    grievances = get_department_grievances(department)
+    page = get_department_grievances_page(department, *_page_args())
+    prev_url, next_url = _page_urls(page)
     
     return render_template('admin/department_grievances.html', 
-                          grievances=grievances, 
+                          grievances=attach_student_info(page['items']), 
                           department=department,
-                          status_options=STATUS_OPTIONS)
+                          status_options=STATUS_OPTIONS,
+                          prev_url=prev_url,
+                          next_url=next_url)
 
 @admin_bp.route('/reports')
 @login_required(role='admin')
+@conditional(_list_version)
 def reports():
-    # Get all grievances
-    grievances = get_all_grievances()
+    # Counts come from the monthly rollup documents, one small read per month
+    rollups = get_report_rollups()
     
-    # Create reports data
     status_counts = {status: 0 for status in STATUS_OPTIONS.keys()}
     department_counts = {}
     monthly_counts = {}
     
-    db = firestore.client()
-    
-    for grievance in grievances:
-        # Count by status
-        status = grievance.get('status', 'pending')
-        if status in status_counts:
-            status_counts[status] += 1
-        else:
-            status_counts[status] = 1
+    for month, rollup in rollups.items():
+        monthly_counts[month] = rollup.get('total', 0)
         
-        # Count by department
-        department = grievance.get('department', 'Unknown')
-        if department in department_counts:
-            department_counts[department] += 1
-        else:
-            department_counts[department] = 1
+        for status, count in rollup.get('byStatus', {}).items():
+            status_counts[status] = status_counts.get(status, 0) + count
         
-        # Count by month (if createdAt is available)
-        if 'createdAt' in grievance and grievance['createdAt']:
-            created_at = grievance['createdAt']
-            if isinstance(created_at, firestore.SERVER_TIMESTAMP):
-                # Handle server timestamp
-                continue
-                
-            # Format: YYYY-MM
-            month_key = created_at.strftime('%Y-%m') if hasattr(created_at, 'strftime') else 'Unknown'
-            if month_key in monthly_counts:
-                monthly_counts[month_key] += 1
-            else:
-                monthly_counts[month_key] = 1
+        for department, count in rollup.get('byDepartment', {}).items():
+            department_counts[department] = department_counts.get(department, 0) + count
+    
+    department_counts = {dept: count for dept, count in department_counts.items() if count}
     
     return render_template('admin/reports.html', 
                           status_counts=status_counts,
@@ -239,18 +394,21 @@ def delete_dept(dept_id):
 
 @admin_bp.route('/department-grievances/<department>')
 @login_required(role='admin')
+@conditional(_list_version)
 def view_department_grievances(department):
     """View grievances for a specific department"""
-    grievances = get_all_grievances()
-    # Filter grievances by department
-    dept_grievances = [g for g in grievances if g.get('department') == department]
+    page = get_department_grievances_page(department, *_page_args())
+    prev_url, next_url = _page_urls(page)
     
     return render_template(
         'admin/grievances.html', 
-        grievances=dept_grievances,
+        grievances=attach_student_info(page['items']),
         title=f"{department} Grievances",
+        status_options=STATUS_OPTIONS,
         filter_type="department",
-        filter_value=department
+        filter_value=department,
+        prev_url=prev_url,
+        next_url=next_url
     )
 
 # User Management Routes
@@ -291,11 +449,7 @@ def student_users():
 @login_required(role='admin')
 def edit_user(user_id):
     """Edit a user's information"""
-    # Get all users
-    all_users = get_all_users()
-    
-    # Find the specific user
-    user = next((u for u in all_users if u.get('id') == user_id), None)
+    user = get_user_by_id(user_id)
     
     if not user:
         flash('User not found', 'danger')
@@ -356,62 +510,95 @@ def delete_user_route(user_id):
 @login_required(role='admin')
 def student_grievances(student_id):
     """View grievances for a specific student"""
-    # Get all users
-    all_users = get_all_users()
-    
-    # Find the specific student
-    student = next((u for u in all_users if u.get('id') == student_id), None)
+    student = get_user_by_id(student_id)
     
     if not student:
         flash('Student not found', 'danger')
         return redirect(url_for('admin.users'))
     
     # Get student's grievances
-    grievances = get_student_grievances(student_id)
+    grievances = get_student_grievances(student_id, projection='list_row')
+    for grievance in grievances:
+        grievance['studentName'] = student.get('displayName') or student.get('name')
+        grievance['studentEmail'] = student.get('email')
     
     return render_template(
         'admin/grievances.html', 
         grievances=grievances,
-        title=f"Grievances from {student.get('name')}",
+        title=f"Grievances from {student.get('displayName') or student.get('name')}",
+        status_options=STATUS_OPTIONS,
         filter_type="student",
         filter_value=student_id
     )
 
+@admin_bp.route('/duplicates/<cluster_id>')
+@login_required(role='admin')
+def duplicate_cluster(cluster_id):
+    """View the grievances detected as near-duplicates of each other"""
+    page = get_duplicate_cluster_page(cluster_id, *_page_args())
+    prev_url, next_url = _page_urls(page)
+    return render_template(
+        'admin/grievances.html',
+        grievances=attach_student_info(page['items']),
+        title=f"Duplicate Cluster #{cluster_id[:8]}",
+        status_options=STATUS_OPTIONS,
+        filter_type="cluster",
+        filter_value=cluster_id,
+        cluster_size=get_duplicate_cluster_size(cluster_id),
+        prev_url=prev_url,
+        next_url=next_url
+    )
+
 @admin_bp.route('/grievances/open')
 @login_required(role='admin')
+@conditional(_list_version)
 def open_grievances():
     """View all open grievances"""
-    grievances = get_open_grievances()
+    page = get_open_grievances_page(*_page_args())
+    prev_url, next_url = _page_urls(page)
     return render_template(
         'admin/grievances.html',
-        grievances=grievances,
+        grievances=attach_student_info(page['items']),
         title="Open Grievances",
+        status_options=STATUS_OPTIONS,
         filter_type="status",
-        filter_value="open"
+        filter_value="open",
+        prev_url=prev_url,
+        next_url=next_url
     )
 
 @admin_bp.route('/grievances/resolved')
 @login_required(role='admin')
+@conditional(_list_version)
 def resolved_grievances():
     """View all resolved grievances"""
-    grievances = get_resolved_grievances()
+    page = get_resolved_grievances_page(*_page_args())
+    prev_url, next_url = _page_urls(page)
     return render_template(
         'admin/grievances.html',
-        grievances=grievances,
+        grievances=attach_student_info(page['items']),
         title="Resolved Grievances",
+        status_options=STATUS_OPTIONS,
         filter_type="status",
-        filter_value="resolved"
+        filter_value="resolved",
+        prev_url=prev_url,
+        next_url=next_url
     )
 
 @admin_bp.route('/grievances/all')
 @login_required(role='admin')
+@conditional(_list_version)
 def all_grievances():
     """View all grievances in the system"""
-    grievances = get_all_grievances()
+    page = get_all_grievances_page(*_page_args())
+    prev_url, next_url = _page_urls(page)
     return render_template(
         'admin/grievances.html',
-        grievances=grievances,
+        grievances=attach_student_info(page['items']),
         title="All Grievances",
+        status_options=STATUS_OPTIONS,
         filter_type="all",
-        filter_value="all"
+        filter_value="all",
+        prev_url=prev_url,
+        next_url=next_url
     ) 
\ No newline at end of file
@@ -1,9 +1,24 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, session
-from app.models.firebase_utils import create_user, login_user, get_user_by_id
+from flask import Blueprint, render_template, redirect, url_for, request, flash, session, g
+from app.models.firebase_utils import create_user, login_user, get_user_profile
 import functools
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+def current_user():
+    """Profile of the logged-in user, or an empty dict when nobody is logged in
+    
+    The session only holds the user ID; the profile comes from the
+    per-process profile cache and is looked up once per request.
+    """
+    if 'current_user' not in g:
+        user_id = session.get('user')
+        g.current_user = (get_user_profile(user_id) if user_id else None) or {}
+    return g.current_user
+
+@auth_bp.app_context_processor
+def inject_current_user():
+    return {'current_user': current_user()}
+
 # Decorator for requiring authentication
 def login_required(role=None):
     def decorator(view):
@@ -13,11 +28,12 @@ def login_required(role=None):
                 return redirect(url_for('auth.login'))
             
             # If role is specified, check if the user has the required role
-            if role and session.get('user_data', {}).get('role') != role:
+            user_role = current_user().get('role')
+            if role and user_role != role:
                 flash('You do not have permission to access this page.', 'danger')
-                if session.get('user_data', {}).get('role') == 'student':
+                if user_role == 'student':
                     return redirect(url_for('student.dashboard'))
-                elif session.get('user_data', {}).get('role') == 'admin':
+                elif user_role == 'admin':
                     return redirect(url_for('admin.dashboard'))
                 else:
                     return redirect(url_for('auth.login'))
@@ -37,17 +53,20 @@ def login():
             user = login_user(email, password)
             user_id = user['localId']
             
-            # Get user data from Firestore
-            user_data = get_user_by_id(user_id)
+            # Get user data from Firestore (this also fills the profile cache)
+            user_data = get_user_profile(user_id)
             
             if not user_data:
                 flash('User data not found. Please contact support.', 'danger')
                 return redirect(url_for('auth.login'))
             
-            # Store user info in session
+            # Start a fresh session under a new ID holding just the user's identity
+            session.clear()
+            session.regenerate()
             session['user'] = user_id
-            session['user_data'] = user_data
             session['email'] = email
+            # Expire after PERMANENT_SESSION_LIFETIME without activity; each request renews it
+            session.permanent = True
             
             flash('Login successful!', 'success')
             
@@ -102,11 +121,11 @@ def register():
 def logout():
     # Clear session
     session.clear()
+    session.regenerate()
     flash('You have been logged out.', 'info')
     return redirect(url_for('auth.login'))
 
 @auth_bp.route('/profile')
 @login_required()
 def profile():
-    user_data = session.get('user_data', {})
-    return render_template('auth/profile.html', user=user_data) 
\ No newline at end of file
+    return render_template('auth/profile.html', user=current_user()) 
\ No newline at end of file
@@ -1,8 +1,111 @@
-from flask import Blueprint, redirect, url_for
+import os
+import hmac
+import time
+from flask import Blueprint, Response, abort, redirect, render_template, request, url_for, session
+from app.routes.auth_routes import login_required, current_user
+from app.models.firebase_utils import (
+    live_updates, get_grievance_by_id, get_status_history, get_grievance_attachments
+)
+from app.models.live_updates import format_event
+from app.models.metrics import render_metrics
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def index():
     # Redirect to the login page when someone visits the root URL
-    return redirect(url_for('auth.login')) 
\ No newline at end of file
+    return redirect(url_for('auth.login')) 
+
+# A stream ends after this long and the browser reconnects, so no connection
+# holds a worker thread indefinitely
+LIVE_STREAM_SECONDS = int(os.getenv('LIVE_STREAM_SECONDS', 300))
+LIVE_KEEPALIVE_SECONDS = 15
+# Milliseconds the browser waits before reconnecting
+LIVE_RETRY_MS = 5000
+
+@main_bp.route('/events')
+@login_required()
+def events():
+    """Server-Sent Events stream of grievance changes for the dashboards
+    
+    Admins receive every grievance change and the counters; students only
+    receive changes to their own grievances.
+    """
+    user_id = session.get('user')
+    is_admin = current_user().get('role') == 'admin'
+    
+    subscription = live_updates.subscribe()
+    if subscription is None:
+        return Response('Too many live connections, try again later.\n', status=503,
+                        headers={'Retry-After': str(LIVE_RETRY_MS // 1000)}, mimetype='text/plain')
+    
+    def stream():
+        try:
+            yield f"retry: {LIVE_RETRY_MS}\n\n"
+            deadline = time.monotonic() + LIVE_STREAM_SECONDS
+            while not subscription.overflowed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                item = subscription.get(timeout=min(LIVE_KEEPALIVE_SECONDS, remaining))
+                if item is None:
+                    # Comment line: keeps proxies from timing out and detects closed connections
+                    yield ": keepalive\n\n"
+                    continue
+                
+                event, data = item
+                if event == 'grievance':
+                    if not is_admin and data.get('studentId') != user_id:
+                        continue
+                    data = {key: value for key, value in data.items() if key != 'studentId'}
+                elif not is_admin:
+                    continue
+                yield format_event(event, data)
+        finally:
+            subscription.close()
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def _check_grievance_access(grievance_id):
+    """404 unless the grievance exists and the user is an admin or the student who submitted it"""
+    grievance = get_grievance_by_id(grievance_id)
+    if not grievance:
+        abort(404)
+    if current_user().get('role') != 'admin' and grievance.get('studentId') != session.get('user'):
+        abort(404)
+
+@main_bp.route('/grievance/<grievance_id>/history')
+@login_required()
+def grievance_history(grievance_id):
+    """Next page of a grievance's status timeline, loaded by the detail pages' 'Show older updates' link"""
+    _check_grievance_access(grievance_id)
+    history = get_status_history(grievance_id, cursor=request.args.get('cursor'))
+    return render_template('shared/status_history.html', grievance_id=grievance_id, history=history)
+
+@main_bp.route('/grievance/<grievance_id>/attachments')
+@login_required()
+def grievance_attachments(grievance_id):
+    """Next page of a grievance's attachments, loaded by the detail pages' 'Show more attachments' link"""
+    _check_grievance_access(grievance_id)
+    attachments = get_grievance_attachments(grievance_id, cursor=request.args.get('cursor'))
+    return render_template('shared/attachments.html', grievance_id=grievance_id, attachments=attachments)
+
+@main_bp.route('/metrics')
+def metrics():
+    """Prometheus metrics, for scrapers sending 'Authorization: Bearer <METRICS_TOKEN>' and for admins
+    
+    Without METRICS_TOKEN only logged-in admins can see them.
+    """
+    token = os.getenv('METRICS_TOKEN')
+    authorized = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized and current_user().get('role') != 'admin':
+        abort(401)
+    
+    rendered = render_metrics()
+    if rendered is None:
+        abort(404)
+    body, content_type = rendered
+    return Response(body, content_type=content_type, headers={'Cache-Control': 'no-store'})
@@ -2,8 +2,10 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash,
 from app.routes.auth_routes import login_required
 from app.models.firebase_utils import (
     create_grievance, get_student_grievances, get_grievance_by_id, 
-    upload_attachment, get_all_departments
+    upload_attachment, upload_attachments, get_all_departments,
+    get_status_history, get_grievance_attachments, get_grievance_version, get_grievance_list_version
 )
+from app.models.http_cache import conditional
 from app.models.email_utils import send_new_grievance_notification
 from werkzeug.utils import secure_filename
 import os
@@ -32,6 +34,26 @@ DEFAULT_DEPARTMENTS = [
     'Student Representative Council (SRC)'
 ]
 
+def upload_outcome(file, file_url, error=None):
+    """
+    Turn the result of uploading one file into the tuple shown to the student.
+    Returns a tuple of (success, message, message_category, file_url)
+    """
+    if isinstance(error, ValueError):
+        error_message = str(error)
+        print(f"Validation error during upload: {error_message}")
+        return False, f'Validation error: {error_message}', 'warning', None
+    if error:
+        error_message = str(error)
+        print(f"Unexpected error during upload: {error_message}")
+        return False, f'An error occurred while uploading the file: {error_message}', 'danger', None
+    if file_url:
+        print(f"Upload successful, URL: {file_url}")
+        return True, f'Successfully uploaded {file.filename}', 'success', file_url
+    
+    print("Upload failed: no URL was returned")
+    return False, 'Failed to upload attachment. Please try again.', 'danger', None
+
 def handle_file_upload(file, grievance_id):
     """
     Utility function to handle file upload validation and processing.
@@ -43,28 +65,30 @@ def handle_file_upload(file, grievance_id):
     print(f"Attempting to upload file: {file.filename} for grievance: {grievance_id}")
         
     try:
-        # Add more detailed logging
-        print(f"File details - Name: {file.filename}, Size: {len(file.read())} bytes")
-        file.seek(0)  # Reset file pointer after reading
+        # Log what the client declared; the real size is counted while streaming
+        print(f"File details - Name: {file.filename}, Type: {file.mimetype or 'unknown'}, Declared size: {file.content_length or 'unknown'}")
         
-        file_url = upload_attachment(file, grievance_id)
-        if file_url:
-            print(f"Upload successful, URL: {file_url}")
-            return True, f'Successfully uploaded {file.filename}', 'success', file_url
-        
-        print("Upload failed: upload_attachment returned None")
-        return False, 'Failed to upload attachment. Please try again.', 'danger', None
-    except ValueError as ve:
-        error_message = str(ve)
-        print(f"Validation error during upload: {error_message}")
-        return False, f'Validation error: {error_message}', 'warning', None
+        return upload_outcome(file, upload_attachment(file, grievance_id))
     except Exception as e:
-        error_message = str(e)
-        print(f"Unexpected error during upload: {error_message}")
-        return False, f'An error occurred while uploading the file: {error_message}', 'danger', None
+        return upload_outcome(file, None, e)
+
+def handle_file_uploads(files, grievance_id):
+    """
+    Upload several files at once (in parallel, recorded with one write).
+    Returns one (success, message, message_category, file_url) tuple per file.
+    """
+    print(f"Attempting to upload {len(files)} file(s) for grievance: {grievance_id}")
+    
+    try:
+        results = upload_attachments(files, grievance_id)
+    except Exception as e:
+        return [upload_outcome(file, None, e) for file in files]
+    
+    return [upload_outcome(file, file_url, error) for file, (file_url, error) in zip(files, results)]
 
 @student_bp.route('/dashboard')
 @login_required(role='student')
+@conditional(lambda: get_grievance_list_version(session.get('user')))
 def dashboard():
     user_id = session.get('user')
     grievances = get_student_grievances(user_id)
@@ -163,15 +187,13 @@ def new_grievance():
                     flash('You can upload a maximum of 5 files per grievance.', 'warning')
                     valid_files = valid_files[:5]  # Only process the first 5 files
                 
-                for file in valid_files:
-                    try:
-                        success, message, category, file_url = handle_file_upload(file, grievance_id)
-                        if success:
-                            uploaded_files.append(file.filename)
-                        else:
-                            failed_files.append((file.filename, message))
-                    except Exception as e:
-                        failed_files.append((file.filename, str(e)))
+                # Upload all files concurrently; their metadata is saved in one write
+                outcomes = handle_file_uploads(valid_files, grievance_id)
+                for file, (success, message, category, file_url) in zip(valid_files, outcomes):
+                    if success:
+                        uploaded_files.append(file.filename)
+                    else:
+                        failed_files.append((file.filename, message))
                 
                 # Provide detailed feedback about uploads
                 if uploaded_files:
@@ -228,6 +250,7 @@ def new_grievance():
 
 @student_bp.route('/grievance/<grievance_id>')
 @login_required(role='student')
+@conditional(get_grievance_version)
 def grievance_detail(grievance_id):
     user_id = session.get('user')
     grievance = get_grievance_by_id(grievance_id)
@@ -237,7 +260,9 @@ def grievance_detail(grievance_id):
         flash('Grievance not found.', 'danger')
         return redirect(url_for('student.dashboard'))
     
-    return render_template('student/grievance_detail.html', grievance=grievance)
+    return render_template('student/grievance_detail.html', grievance=grievance, grievance_id=grievance_id,
+                           history=get_status_history(grievance_id),
+                           attachments=get_grievance_attachments(grievance_id))
 
 @student_bp.route('/add-attachment/<grievance_id>', methods=['POST'])
 @login_required(role='student')
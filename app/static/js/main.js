@@ -31,6 +31,155 @@ function formatStatusBadge(status) {
     return `<span class="${statusInfo.class}">${statusInfo.text}</span>`;
 }
 
+// Helper to escape text before inserting it as HTML
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
+// Same format the templates use for timestamps: YYYY-MM-DD HH:MM
+function formatTimestamp(value) {
+    return value ? String(value).slice(0, 16).replace('T', ' ') : 'N/A';
+}
+
+// Same label the templates use for a status, e.g. in_progress -> In Progress
+function formatStatusLabel(status) {
+    return String(status).split('_').map(word => word.charAt(0).toUpperCase() + word.slice(1)).join(' ');
+}
+
+// Live updates: pages with data-live-updates="<events url>" are patched from the
+// Server-Sent Events stream instead of being reloaded
+function setStatCounts(root, countFor) {
+    root.querySelectorAll('[data-stat]').forEach(function(element) {
+        const keys = element.dataset.stat.split(' ');
+        element.textContent = keys.reduce((sum, key) => sum + countFor(key), 0);
+    });
+}
+
+function countRows(root) {
+    const rows = root.querySelectorAll('[data-live-rows] [data-grievance-id]');
+    setStatCounts(root, function(key) {
+        if (key === 'total') return rows.length;
+        return [].filter.call(rows, row => row.dataset.status === key).length;
+    });
+}
+
+function applyStats(root, stats) {
+    setStatCounts(root, key => key === 'total' ? stats.total : (stats.byStatus[key] || 0));
+}
+
+function addGrievanceRow(root, grievance) {
+    const rows = root.querySelector('[data-live-rows]');
+    const template = root.querySelector('template[data-live-row]');
+    if (!rows || !template) {
+        // The page was showing its empty state; render it again with the new grievance
+        window.location.reload();
+        return;
+    }
+
+    const values = {
+        '__ID__': escapeHtml(grievance.id),
+        '__SHORT_ID__': escapeHtml(grievance.id.slice(0, 8)),
+        '__TITLE__': escapeHtml(grievance.title),
+        '__DEPARTMENT_PATH__': escapeHtml(encodeURIComponent(grievance.department)),
+        '__DEPARTMENT__': escapeHtml(grievance.department),
+        '__STATUS_LABEL__': escapeHtml(formatStatusLabel(grievance.status)),
+        '__STATUS__': escapeHtml(grievance.status),
+        '__CREATED_AT__': escapeHtml(formatTimestamp(grievance.createdAt)),
+        '__UPDATED_AT__': escapeHtml(formatTimestamp(grievance.updatedAt))
+    };
+    const html = template.innerHTML.replace(/__[A-Z_]+__/g, placeholder => values[placeholder] ?? placeholder);
+    rows.insertAdjacentHTML('afterbegin', html);
+    rows.firstElementChild.classList.add('live-updated');
+
+    // Pages that show only the most recent grievances keep the same number of rows
+    const limit = parseInt(root.dataset.liveLimit, 10);
+    if (limit > 0) {
+        const items = rows.querySelectorAll('[data-grievance-id]');
+        for (let i = limit; i < items.length; i++) {
+            items[i].remove();
+        }
+    }
+}
+
+function applyGrievanceUpdate(root, grievance) {
+    const row = root.querySelector(`[data-live-rows] [data-grievance-id="${CSS.escape(grievance.id)}"]`);
+    if (!row) {
+        if (grievance.new) {
+            addGrievanceRow(root, grievance);
+        }
+        return;
+    }
+    if (row.dataset.status === grievance.status) {
+        return;
+    }
+
+    const badge = row.querySelector('.status-badge');
+    if (badge) {
+        badge.classList.remove(`status-${row.dataset.status}`);
+        badge.classList.add(`status-${grievance.status}`);
+        badge.textContent = formatStatusLabel(grievance.status);
+    }
+    const updatedAt = row.querySelector('[data-field="updatedAt"]');
+    if (updatedAt) {
+        updatedAt.textContent = formatTimestamp(grievance.updatedAt);
+    }
+    row.dataset.status = grievance.status;
+    row.classList.remove('live-updated');
+    void row.offsetWidth;
+    row.classList.add('live-updated');
+}
+
+function initLiveUpdates(root) {
+    if (!window.EventSource) return;
+
+    const source = new EventSource(root.dataset.liveUpdates);
+    source.addEventListener('grievance', function(e) {
+        applyGrievanceUpdate(root, JSON.parse(e.data));
+        if (root.dataset.liveCounts === 'rows') {
+            countRows(root);
+        }
+    });
+    source.addEventListener('stats', function(e) {
+        if (root.dataset.liveCounts !== 'rows') {
+            applyStats(root, JSON.parse(e.data));
+        }
+    });
+    source.onerror = function() {
+        // The browser reconnects by itself unless the server refused the stream
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(() => initLiveUpdates(root), 30000);
+        }
+    };
+}
+
+// Replace a "show more" link with the next page of entries it points to
+function loadMore(container, link) {
+    if (link.classList.contains('disabled')) return;
+    link.classList.add('disabled');
+
+    fetch(link.href, { headers: { 'Accept': 'text/html' } })
+        .then(function(response) {
+            if (!response.ok) throw new Error(response.statusText);
+            return response.text();
+        })
+        .then(function(html) {
+            container.outerHTML = html;
+        })
+        .catch(function() {
+            link.classList.remove('disabled');
+        });
+}
+
+document.addEventListener('click', function(e) {
+    const link = e.target.closest('[data-load-more] a');
+    if (link) {
+        e.preventDefault();
+        loadMore(link.closest('[data-load-more]'), link);
+    }
+});
+
 // Auto-dismiss flash messages after 5 seconds
 document.addEventListener('DOMContentLoaded', function() {
     const flashMessages = document.querySelectorAll('.alert');
@@ -61,4 +210,7 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
     });
+    
+    // Live dashboard updates
+    document.querySelectorAll('[data-live-updates]').forEach(initLiveUpdates);
 }); 
\ No newline at end of file
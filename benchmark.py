@@ -0,0 +1,485 @@
+#!/usr/bin/env python
+"""
+Benchmark Script for DUT Student Grievance Management System
+
+Boots the application against the in-memory data backend (no Firebase
+project or credentials needed), seeds it with a realistic volume of users
+and grievances, and drives the student and admin pages with concurrent
+simulated users. For every scenario it reports p50/p95/p99 latency,
+throughput and errors, plus the process's resident memory, and can save
+the results as JSON so runs on different commits can be compared.
+
+Requests go straight to the WSGI application from worker threads, without
+a network in between, so the numbers measure the application itself. Data
+access is served by the in-memory store rather than Firestore: use the
+results to compare commits with each other, not as production latencies.
+
+Usage: python benchmark.py [options]
+
+Examples:
+    python benchmark.py
+    python benchmark.py --grievances 100000 --concurrency 16 --output results/main.json
+    python benchmark.py --scenario admin_dashboard --scenario admin_reports --compare results/main.json
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import argparse
+import platform
+import threading
+import subprocess
+import contextlib
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+# The benchmark always runs offline, with emails printed (and discarded) instead of sent
+os.environ['DATA_BACKEND'] = 'memory'
+os.environ['SESSION_BACKEND'] = 'memory'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ['EMAIL_USER'] = ''
+os.environ['EMAIL_PASSWORD'] = ''
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PASSWORD = 'benchmark-password'
+# Accounts that log in during the run; scenarios with more simulated users share them
+BENCHMARK_STUDENTS = 16
+# Grievances owned by each of those accounts, for the student dashboard and detail pages
+GRIEVANCES_PER_STUDENT = 5
+
+STATUS_WEIGHTS = {
+    'pending': 30,
+    'in_progress': 15,
+    'assigned': 10,
+    'under_review': 10,
+    'resolved': 25,
+    'closed': 10
+}
+
+WORDS = (
+    'lecture venue projector exam timetable results residence room water electricity wifi network '
+    'library fees payment refund bursary registration module lecturer assignment marks portal login '
+    'transport bus security parking cafeteria laboratory equipment broken delayed missing incorrect '
+    'urgent again still week semester campus building office staff response email account access '
+    'schedule clash printing noise cleaning maintenance leak heating safety students support'
+).split()
+
+def sentence(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def rss_mb():
+    """Current resident set size in MB, where the platform reports it"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+# Seeding
+
+def seed(grievance_count, user_count, rng):
+    """Fill the in-memory store; returns the login accounts and sample IDs the scenarios use"""
+    from app.models.clients import get_clients
+    from app.models.firebase_utils import (
+        create_user, add_department, recompute_grievance_stats, recompute_report_rollups,
+        search_index, duplicate_index
+    )
+    from app.routes.student_routes import DEFAULT_DEPARTMENTS
+
+    db = get_clients().db
+    timings = {}
+
+    started = perf_counter()
+    for name in DEFAULT_DEPARTMENTS:
+        add_department(name, f"{name} enquiries")
+
+    # Only the accounts that log in need passwords; the rest are profiles
+    admin_email = 'admin@benchmark.dut.ac.za'
+    create_user(admin_email, PASSWORD, 'Benchmark Admin', role='admin')
+    students = []
+    for i in range(min(BENCHMARK_STUDENTS, user_count)):
+        email = f'student{i}@benchmark.dut.ac.za'
+        students.append({'email': email, 'uid': create_user(email, PASSWORD, f'Benchmark Student {i}')})
+
+    user_ids = [student['uid'] for student in students]
+    now = datetime.now(timezone.utc)
+    batch = db.batch()
+    for i in range(user_count - len(students)):
+        ref = db.collection('users').document()
+        batch.set(ref, {
+            'email': f'user{i}@benchmark.dut.ac.za',
+            'displayName': f'Student {i}',
+            'role': 'student',
+            'createdAt': now - timedelta(days=rng.randint(0, 1500))
+        })
+        user_ids.append(ref.id)
+        if (i + 1) % 500 == 0:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+    timings['users_seconds'] = perf_counter() - started
+
+    started = perf_counter()
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    grievance_ids = []
+    own = {student['uid']: [] for student in students}
+    batch = db.batch()
+    writes = 0
+    for i in range(grievance_count):
+        created_at = now - timedelta(days=rng.uniform(0, 365))
+        status = rng.choices(statuses, weights)[0]
+        history = [{'status': 'pending', 'note': 'Grievance submitted', 'timestamp': created_at}]
+        updated_at = created_at
+        if status != 'pending':
+            updated_at = created_at + timedelta(hours=rng.uniform(1, 24 * 14))
+            history.append({'status': status, 'note': sentence(rng, 3, 12), 'timestamp': updated_at})
+
+        if i < len(students) * GRIEVANCES_PER_STUDENT:
+            student_id = students[i % len(students)]['uid']
+        else:
+            student_id = rng.choice(user_ids)
+
+        ref = db.collection('grievances').document()
+        batch.set(ref, {
+            'studentId': student_id,
+            'title': sentence(rng, 3, 8).capitalize(),
+            'description': sentence(rng, 20, 80).capitalize() + '.',
+            'department': rng.choice(DEFAULT_DEPARTMENTS),
+            'status': status,
+            'createdAt': created_at,
+            'updatedAt': updated_at,
+            'attachmentCount': 0
+        })
+        for entry in history:
+            batch.set(ref.collection('status_history').document(), entry)
+        writes += 1 + len(history)
+        grievance_ids.append(ref.id)
+        if student_id in own:
+            own[student_id].append(ref.id)
+        if writes >= 450:
+            batch.commit()
+            batch = db.batch()
+            writes = 0
+    batch.commit()
+    timings['grievances_seconds'] = perf_counter() - started
+
+    started = perf_counter()
+    recompute_grievance_stats()
+    recompute_report_rollups()
+    timings['counters_seconds'] = perf_counter() - started
+
+    # One pass over the store instead of rebuild_search_index(), whose page-by-page
+    # reads are cheap on Firestore but re-sort the whole in-memory collection per page
+    started = perf_counter()
+    for index in (search_index, duplicate_index):
+        index.rebuild({'id': snapshot.id, **snapshot.to_dict()}
+                      for snapshot in db.collection('grievances').order_by('createdAt').stream())
+    timings['indexes_seconds'] = perf_counter() - started
+
+    return {
+        'admin': {'email': admin_email},
+        'students': students,
+        'grievance_ids': grievance_ids,
+        'own_grievances': own,
+        'departments': DEFAULT_DEPARTMENTS,
+        'timings': timings
+    }
+
+# Scenarios
+
+def _submit(client, rng, data, user):
+    return client.post('/student/new-grievance', data={
+        'title': sentence(rng, 4, 8).capitalize(),
+        'description': sentence(rng, 20, 60).capitalize() + '.',
+        'department': rng.choice(data['departments'])
+    })
+
+def _student_detail(client, rng, data, user):
+    own = data['own_grievances'].get(user['uid'])
+    grievance_id = rng.choice(own) if own else rng.choice(data['grievance_ids'])
+    return client.get(f'/student/grievance/{grievance_id}')
+
+def _prime_dashboard_etag(client, data, user):
+    # The first view after logging in shows a flashed message and has no ETag
+    for _ in range(2):
+        response = client.get('/student/dashboard')
+        etag = response.headers.get('ETag')
+        response.close()
+        if etag:
+            data.setdefault('etags', {})[user['uid']] = etag
+            return
+    raise RuntimeError("The student dashboard did not send an ETag")
+
+def _student_revalidate(client, rng, data, user):
+    # A reload of a page the browser already has, as sent with If-None-Match
+    return client.get('/student/dashboard', headers={'If-None-Match': data['etags'][user['uid']]})
+
+# name: untimed setup run once per simulated user before the scenario
+SCENARIO_SETUP = {
+    'student_revalidate': _prime_dashboard_etag
+}
+
+# name: (role, expected status, request function)
+SCENARIOS = {
+    'student_submit': ('student', 302, _submit),
+    'student_dashboard': ('student', 200, lambda client, rng, data, user: client.get('/student/dashboard')),
+    'student_detail': ('student', 200, _student_detail),
+    'student_revalidate': ('student', 304, _student_revalidate),
+    'admin_dashboard': ('admin', 200, lambda client, rng, data, user: client.get('/admin/dashboard')),
+    'admin_reports': ('admin', 200, lambda client, rng, data, user: client.get('/admin/reports')),
+    'admin_list_all': ('admin', 200, lambda client, rng, data, user: client.get('/admin/grievances/all')),
+    'admin_list_open': ('admin', 200, lambda client, rng, data, user: client.get('/admin/grievances/open')),
+    'admin_list_department': ('admin', 200, lambda client, rng, data, user: client.get(
+        f"/admin/department-grievances/{rng.choice(data['departments'])}")),
+    'admin_search': ('admin', 200, lambda client, rng, data, user: client.get(
+        f"/admin/search?q={rng.choice(WORDS)}+{rng.choice(WORDS)}")),
+    'admin_detail': ('admin', 200, lambda client, rng, data, user: client.get(
+        f"/admin/grievance/{rng.choice(data['grievance_ids'])}"))
+}
+
+def login(app, email):
+    client = app.test_client()
+    response = client.post('/auth/login', data={'email': email, 'password': PASSWORD})
+    if response.status_code != 302 or '/auth/login' in (response.location or ''):
+        raise RuntimeError(f"Could not log in as {email}")
+    return client
+
+def run_scenario(app, name, data, requests, concurrency, warmup, seed_value):
+    """Run one scenario and return its latency, throughput and memory figures"""
+    role, expected_status, make_request = SCENARIOS[name]
+    if role == 'admin':
+        users = [data['admin']] * concurrency
+    else:
+        users = [data['students'][i % len(data['students'])] for i in range(concurrency)]
+    clients = [login(app, user['email']) for user in users]
+    if name in SCENARIO_SETUP:
+        for client, user in zip(clients, users):
+            SCENARIO_SETUP[name](client, data, user)
+
+    rng = random.Random(seed_value)
+    for i in range(warmup):
+        make_request(clients[i % concurrency], rng, data, users[i % concurrency]).close()
+
+    latencies = []
+    errors = []
+    remaining = [requests]
+    lock = threading.Lock()
+
+    def worker(index):
+        worker_rng = random.Random(f"{seed_value}-{name}-{index}")
+        client, user = clients[index], users[index]
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = perf_counter()
+            response = make_request(client, worker_rng, data, user)
+            response.get_data()
+            elapsed = perf_counter() - started
+            response.close()
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != expected_status:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'duration_seconds': round(duration, 3),
+        'throughput_rps': round(len(latencies) / duration, 2) if duration else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            'p50': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+            'p95': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+            'max': round(latencies[-1] * 1000, 3) if latencies else None
+        },
+        'rss_mb': rss_mb(),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+# Reporting
+
+def print_results(results):
+    print(f"\n{'Scenario':<24}{'Requests':>9}{'Errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'RSS MB':>9}")
+    for name, result in results['scenarios'].items():
+        latency = result['latency_ms']
+        rss = f"{result['rss_mb']:.0f}" if result['rss_mb'] is not None else '-'
+        print(f"{name:<24}{result['requests']:>9}{result['errors']:>8}{latency['p50']:>10.1f}{latency['p95']:>10.1f}"
+              f"{latency['p99']:>10.1f}{result['throughput_rps']:>10.1f}{rss:>9}")
+    if results['peak_rss_mb'] is not None:
+        print(f"\nPeak RSS: {results['peak_rss_mb']:.0f} MB")
+
+def compare(results, baseline, threshold):
+    """Print changes against a baseline run; returns the scenarios that regressed"""
+    print(f"\n-- Compared with {baseline.get('commit') or 'baseline'} ({baseline.get('started_at', '?')}) --")
+    if baseline.get('parameters') != results['parameters']:
+        print("  Note: the runs used different parameters, so differences may not be regressions")
+
+    regressions = []
+    for name, result in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            print(f"  {name}: not in baseline")
+            continue
+
+        changes = []
+        regressed = False
+        for key in ('p50', 'p95', 'p99'):
+            old, new = before['latency_ms'].get(key), result['latency_ms'].get(key)
+            if old:
+                change = (new - old) / old * 100
+                changes.append(f"{key} {change:+.0f}%")
+                regressed = regressed or (key == 'p95' and change > threshold)
+        old, new = before.get('throughput_rps'), result.get('throughput_rps')
+        if old:
+            change = (new - old) / old * 100
+            changes.append(f"throughput {change:+.0f}%")
+            regressed = regressed or change < -threshold
+
+        print(f"  {'❌' if regressed else '✅'} {name}: {', '.join(changes)}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the application against the in-memory data backend')
+    parser.add_argument('--grievances', type=int, default=10000, help='Grievances to seed (default: 10000)')
+    parser.add_argument('--users', type=int, default=50000, help='Student profiles to seed (default: 50000)')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Scenario to run; repeat for several (default: all)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Simulated users per scenario (default: 8)')
+    parser.add_argument('--warmup', type=int, default=10, help='Untimed requests before each scenario (default: 10)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for data and requests (default: 42)')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare with the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Percent change in p95 or throughput counted as a regression (default: 10)')
+    args = parser.parse_args()
+
+    if args.concurrency < 1 or args.requests < 1:
+        parser.error('--concurrency and --requests must be at least 1')
+
+    try:
+        from app import create_app
+    except ImportError as e:
+        print(f"Error importing required modules: {e}")
+        print("Make sure you're running this script from the project root directory.")
+        sys.exit(1)
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read {args.compare}: {e}")
+            sys.exit(1)
+
+    results = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'grievances': args.grievances,
+            'users': args.users,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'warmup': args.warmup,
+            'seed': args.seed
+        },
+        'scenarios': {}
+    }
+
+    # The application prints emails and progress; keep the benchmark output readable
+    quiet = open(os.devnull, 'w')
+
+    print(f"\n-- Seeding {args.grievances} grievances and {args.users} users --")
+    try:
+        with contextlib.redirect_stdout(quiet):
+            app = create_app()
+            data = seed(args.grievances, args.users, random.Random(args.seed))
+    except Exception as e:
+        print(f"❌ Error seeding data: {e}")
+        sys.exit(1)
+    results['seed'] = {key: round(value, 2) for key, value in data['timings'].items()}
+    results['seed']['rss_mb'] = rss_mb()
+    for key, value in data['timings'].items():
+        print(f"  {key.replace('_seconds', '').capitalize()}: {value:.1f}s")
+
+    for name in args.scenario or list(SCENARIOS):
+        print(f"\n-- Running {name} ({args.requests} requests, {args.concurrency} users) --")
+        try:
+            with contextlib.redirect_stdout(quiet):
+                result = run_scenario(app, name, data, args.requests, args.concurrency, args.warmup, args.seed)
+        except Exception as e:
+            print(f"❌ Error running {name}: {e}")
+            sys.exit(1)
+        results['scenarios'][name] = result
+        print(f"  p95 {result['latency_ms']['p95']:.1f} ms, {result['throughput_rps']:.1f} req/s, {result['errors']} errors")
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    print_results(results)
+
+    if args.output:
+        directory = os.path.dirname(os.path.abspath(args.output))
+        os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} scenario(s) regressed by more than {args.threshold:.0f}%")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+if __name__ == "__main__":
+    main()
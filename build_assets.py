@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Static Asset Build Script for DUT Student Grievance Management System
+
+Copies every file under app/static into app/static/dist with a content
+hash in its name, minifies the stylesheets and scripts, and writes gzip
+and brotli versions of the text files. The application then links to the
+built copies and lets browsers cache them for a year (see
+app/models/assets.py). The build fails if rcssmin, rjsmin or brotli is not
+installed, rather than producing unminified or uncompressed files. It
+warns about third-party files such as Chart.js that are not yet in
+app/static/vendor; pages load those from the pinned CDN URL instead.
+
+Run it on every deploy, after the static files change and before the
+servers restart. Without a build the static files are served as before.
+
+Usage: python build_assets.py [--clean]
+"""
+
+import os
+import sys
+import argparse
+
+def main():
+    parser = argparse.ArgumentParser(description='Fingerprint, minify and precompress the static files')
+    parser.add_argument('--clean', action='store_true', help='Delete the built files of earlier builds')
+    args = parser.parse_args()
+
+    try:
+        from app.models.assets import build_assets, missing_vendor_files
+    except ImportError as e:
+        print(f"Error importing required modules: {e}")
+        print("Make sure you're running this script from the project root directory.")
+        sys.exit(1)
+
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'static')
+
+    print("\n-- Building Static Files --")
+
+    for path, url in missing_vendor_files(static_folder):
+        print(f"  Warning: app/static/{path} is missing; pages will load {url}")
+
+    def on_file(source, path, size, built_size, encodings):
+        print(f"  {source} -> {path} ({size:,} -> {built_size:,} bytes{', ' if encodings else ''}{', '.join(encodings)})")
+
+    try:
+        files, removed = build_assets(static_folder, clean=args.clean, on_file=on_file)
+    except Exception as e:
+        print(f"\n❌ Error building static files: {e}")
+        sys.exit(1)
+
+    if args.clean:
+        print(f"  Removed {removed} files of earlier builds")
+    print(f"\n✅ Built {len(files)} static files!")
+    print("Restart the application to serve them.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Grievance Export Script for DUT Student Grievance Management System
+
+Streams grievances to CSV or JSON Lines for audits and spreadsheets. Rows
+are read from Firestore one page at a time and written out as they arrive,
+so memory use stays flat no matter how many grievances are exported.
+
+Usage: python export_grievances.py [options]
+
+Examples:
+    python export_grievances.py --output grievances.csv
+    python export_grievances.py --format jsonl --status open --start 2025-01-01 --end 2025-03-31
+"""
+
+import sys
+import argparse
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD command line date"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}', use YYYY-MM-DD")
+
+def main():
+    parser = argparse.ArgumentParser(description='Export grievances to CSV or JSON Lines')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help='Output format (default: csv)')
+    parser.add_argument('--department', help='Only export grievances for this department')
+    parser.add_argument('--status', action='append',
+                        help='Only export grievances with this status; repeat for several, or use open/resolved')
+    parser.add_argument('--start', type=parse_date, help='Only export grievances created on or after this date')
+    parser.add_argument('--end', type=parse_date, help='Only export grievances created on or before this date')
+    parser.add_argument('--output', help='File to write to (default: standard output)')
+    args = parser.parse_args()
+    
+    try:
+        from app.models.firebase_utils import iter_grievances, OPEN_STATUSES, RESOLVED_STATUSES
+        from app.models.export_utils import EXPORT_FORMATS
+    except ImportError as e:
+        print(f"Error importing required modules: {e}", file=sys.stderr)
+        print("Make sure you're running this script from the project root directory.", file=sys.stderr)
+        sys.exit(1)
+    
+    statuses = []
+    for status in args.status or []:
+        if status == 'open':
+            statuses.extend(OPEN_STATUSES)
+        elif status == 'resolved':
+            statuses.extend(RESOLVED_STATUSES)
+        else:
+            statuses.append(status)
+    
+    end = args.end + timedelta(days=1) if args.end else None
+    rows = iter_grievances(department=args.department, statuses=statuses or None, start=args.start, end=end)
+    serializer, _ = EXPORT_FORMATS[args.format]
+    
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    count = -1 if args.format == 'csv' else 0  # Don't count the CSV header
+    try:
+        for chunk in serializer(rows):
+            output.write(chunk)
+            count += 1
+    except Exception as e:
+        print(f"\n❌ Error exporting grievances: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.output:
+            output.close()
+    
+    print(f"✅ Exported {count} grievances", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
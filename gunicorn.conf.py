@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for the DUT Student Grievance Management System
+
+Usage: gunicorn run:app
+
+The application can be preloaded in the master because Firebase clients
+are only created inside each worker (see app/models/clients.py). Every
+worker opens its own Firestore connection as soon as it boots, so the
+first request does not pay for it, and starts delivering any email left
+in the spool by the previous run.
+
+Workers are threaded (gthread) because the dashboards keep a live updates
+stream open (see the /events route): each open stream holds one thread, so
+with sync workers it would hold a whole worker. LIVE_MAX_STREAMS in the
+app caps streams per worker below GUNICORN_THREADS so page requests always
+have threads left.
+
+Each worker keeps its request metrics in files under
+PROMETHEUS_MULTIPROC_DIR, which is emptied when Gunicorn starts, so a
+/metrics scrape answered by any worker covers all of them.
+"""
+
+import os
+import shutil
+import tempfile
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+preload_app = True
+
+# Must be set before the application (and prometheus_client) is imported
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'grievance-metrics'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+def on_starting(server):
+    # Metrics left over from an earlier run would be added to this one's
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def post_worker_init(worker):
+    from app.models.clients import warm_clients
+    warm_clients()
+
+    # Deliver mail spooled before a restart without waiting for a new email
+    from app.models.email_utils import start_email_queue
+    start_email_queue()
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
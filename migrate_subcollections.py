@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Subcollection Migration Script for DUT Student Grievance Management System
+
+Grievances used to keep their status history and attachment records in
+`statusHistory` and `attachments` arrays on the grievance document. They
+now live in the `status_history` and `attachments` subcollections of each
+grievance, and the detail pages read them a page at a time. This script
+moves the arrays of existing grievances into the subcollections, a page of
+grievances per transaction. Progress is checkpointed in Firestore
+(migrations/grievanceSubcollections), so if it is interrupted, run it again
+and it carries on where it stopped. The site can keep running while it does.
+
+Usage: python migrate_subcollections.py [--batch-size 100] [--restart]
+"""
+
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description='Move grievance status history and attachments into subcollections')
+    parser.add_argument('--batch-size', type=int, default=100, help='Grievances moved per transaction (default 100)')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first grievance')
+    args = parser.parse_args()
+
+    try:
+        from app.models.firebase_utils import migrate_grievance_subcollections
+    except ImportError as e:
+        print(f"Error importing required modules: {e}")
+        print("Make sure you're running this script from the project root directory.")
+        sys.exit(1)
+
+    print("\n-- Moving Status History and Attachments --")
+    started = time.monotonic()
+
+    def on_progress(checkpoint):
+        if not checkpoint['done']:
+            print(f"  Scanned {checkpoint['scanned']}, moved {checkpoint['converted']} (last ID {checkpoint['lastId']})")
+
+    try:
+        checkpoint = migrate_grievance_subcollections(batch_size=args.batch_size, restart=args.restart,
+                                                      on_progress=on_progress)
+    except Exception as e:
+        print(f"\n❌ Error moving status history and attachments: {e}")
+        print("Run the script again to resume from the last checkpoint.")
+        sys.exit(1)
+
+    print(f"  Grievances scanned: {checkpoint['scanned']}")
+    print(f"  Grievances moved: {checkpoint['converted']}")
+    print(f"  Took {time.monotonic() - started:.1f}s")
+
+    print("\n✅ Status history and attachments migrated successfully!")
+
+if __name__ == "__main__":
+    main()
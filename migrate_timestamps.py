@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Timestamp Migration Script for DUT Student Grievance Management System
+
+Grievances used to store createdAt, updatedAt, status history and
+attachment times as ISO strings. They are now written as native Firestore
+timestamps, which sort and filter by date correctly. This script converts
+the grievances written before that, a page at a time in transactions, and
+then rebuilds the monthly report rollups, which are now keyed by the UTC
+month. Progress is checkpointed in Firestore (migrations/grievanceTimestamps),
+so if it is interrupted, run it again and it carries on where it stopped.
+The site can keep running while it does.
+
+Usage: python migrate_timestamps.py [--batch-size 400] [--restart]
+"""
+
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert ISO string grievance timestamps to native Firestore timestamps')
+    parser.add_argument('--batch-size', type=int, default=400, help='Grievances converted per transaction (default 400)')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first grievance')
+    args = parser.parse_args()
+
+    try:
+        from app.models.firebase_utils import migrate_grievance_timestamps, recompute_report_rollups
+    except ImportError as e:
+        print(f"Error importing required modules: {e}")
+        print("Make sure you're running this script from the project root directory.")
+        sys.exit(1)
+
+    print("\n-- Converting Grievance Timestamps --")
+    started = time.monotonic()
+
+    def on_progress(checkpoint):
+        if not checkpoint['done']:
+            print(f"  Scanned {checkpoint['scanned']}, converted {checkpoint['converted']} (last ID {checkpoint['lastId']})")
+
+    try:
+        checkpoint = migrate_grievance_timestamps(batch_size=args.batch_size, restart=args.restart,
+                                                  on_progress=on_progress)
+    except Exception as e:
+        print(f"\n❌ Error converting timestamps: {e}")
+        print("Run the script again to resume from the last checkpoint.")
+        sys.exit(1)
+
+    print(f"  Grievances scanned: {checkpoint['scanned']}")
+    print(f"  Grievances converted: {checkpoint['converted']}")
+    print(f"  Took {time.monotonic() - started:.1f}s")
+
+    print("\n-- Rebuilding Monthly Report Rollups --")
+    try:
+        rollups = recompute_report_rollups()
+    except Exception as e:
+        print(f"\n❌ Error rebuilding report rollups: {e}")
+        sys.exit(1)
+    print(f"  Months: {len(rollups)}")
+
+    print("\n✅ Grievance timestamps migrated successfully!")
+    print("Run python rebuild_search_index.py on each server to re-index the converted grievances.")
+
+if __name__ == "__main__":
+    main()
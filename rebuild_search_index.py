@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Rebuild Search Index Script for DUT Student Grievance Management System
+
+The admin search page answers from a local SQLite full-text index
+(SEARCH_INDEX_PATH, default search_index.sqlite3) that is updated whenever
+a grievance is created or its status changes, and new grievances are
+checked for near-duplicates against a local MinHash index
+(DUPLICATE_INDEX_PATH, default duplicate_index.sqlite3). This script
+re-indexes every grievance from Firestore into both; duplicate clusters
+already recorded on the grievances are kept. Run it once after deploying,
+on a new server, after importing data directly into Firestore, or if
+search results ever look out of date. The site can keep running while it
+does.
+
+Usage: python rebuild_search_index.py
+"""
+
+import sys
+import time
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+def main():
+    try:
+        from app.models.firebase_utils import (
+            rebuild_search_index, rebuild_duplicate_index, search_index, duplicate_index
+        )
+    except ImportError as e:
+        print(f"Error importing required modules: {e}")
+        print("Make sure you're running this script from the project root directory.")
+        sys.exit(1)
+
+    print(f"\n-- Rebuilding Search Index ({search_index.path}) --")
+    started = time.monotonic()
+    try:
+        indexed, removed = rebuild_search_index()
+    except Exception as e:
+        print(f"\n❌ Error rebuilding search index: {e}")
+        sys.exit(1)
+
+    print(f"  Indexed grievances: {indexed}")
+    print(f"  Removed stale entries: {removed}")
+    print(f"  Took {time.monotonic() - started:.1f}s")
+
+    print(f"\n-- Rebuilding Duplicate Index ({duplicate_index.path}) --")
+    started = time.monotonic()
+    try:
+        indexed, removed = rebuild_duplicate_index()
+    except Exception as e:
+        print(f"\n❌ Error rebuilding duplicate index: {e}")
+        sys.exit(1)
+
+    print(f"  Indexed grievances: {indexed}")
+    print(f"  Removed stale entries: {removed}")
+    print(f"  Took {time.monotonic() - started:.1f}s")
+
+    print("\n✅ Search and duplicate indexes rebuilt successfully!")
+
+if __name__ == "__main__":
+    main()
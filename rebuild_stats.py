@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Rebuild Statistics Script for DUT Student Grievance Management System
+
+The admin dashboard reads grievance counts from a single `stats/grievances`
+document and the reports page reads per-month rollups from the
+`report_rollups` collection. Both are kept up to date whenever a grievance
+is created or its status changes. This script recomputes them from scratch
+by scanning the grievances collection. Run it after importing data directly
+into Firestore, to backfill the rollups for existing history, or if the
+dashboard or report counts ever look wrong.
+
+Usage: python rebuild_stats.py
+"""
+
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+def main():
+    try:
+        from app.models.firebase_utils import recompute_grievance_stats, recompute_report_rollups
+    except ImportError as e:
+        print(f"Error importing required modules: {e}")
+        print("Make sure you're running this script from the project root directory.")
+        sys.exit(1)
+    
+    print("\n-- Rebuilding Grievance Counters --")
+    try:
+        stats = recompute_grievance_stats()
+    except Exception as e:
+        print(f"\n❌ Error rebuilding counters: {e}")
+        sys.exit(1)
+    
+    print(f"  Total grievances: {stats['total']}")
+    for status, count in sorted(stats['byStatus'].items()):
+        print(f"  {status}: {count}")
+    print(f"  Departments: {len(stats['byDepartment'])}")
+    
+    
+    print("\n-- Rebuilding Monthly Report Rollups --")
+    try:
+        rollups = recompute_report_rollups()
+    except Exception as e:
+        print(f"\n❌ Error rebuilding report rollups: {e}")
+        sys.exit(1)
+    
+    for month, rollup in sorted(rollups.items()):
+        print(f"  {month}: {rollup['total']} grievances")
+    
+    print("\n✅ Grievance counters and report rollups rebuilt successfully!")
+
+if __name__ == "__main__":
+    main()
@@ -3,4 +3,7 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # Under Gunicorn this is done in each worker (see gunicorn.conf.py)
+    from app.models.email_utils import start_email_queue
+    start_email_queue()
     app.run(debug=True) 
\ No newline at end of file
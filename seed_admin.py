@@ -8,25 +8,24 @@ Run this script once to create an admin account.
 
 import os
 import sys
-import firebase_admin
-from firebase_admin import credentials
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 def main():
-    # Check if Firebase app is already initialized
-    if not firebase_admin._apps:
-        # Initialize Firebase Admin SDK
-        try:
-            cred = credentials.Certificate("service_account.json")
-            firebase_admin.initialize_app(cred)
-        except Exception as e:
-            print(f"Error initializing Firebase: {e}")
-            sys.exit(1)
+    # Initialize Firebase through the same client provider as the web application
+    try:
+        from app.models.clients import get_clients
+        get_clients()
+    except ImportError as e:
+        print(f"Error importing required modules: {e}")
+        print("Make sure you're running this script from the project root directory.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error initializing Firebase: {e}")
+        sys.exit(1)
     
-    # Import after Firebase initialization to avoid circular imports
     try:
         from app.models.firebase_utils import create_user
     except ImportError as e:
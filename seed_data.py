@@ -15,8 +15,6 @@ import os
 import sys
 import time
 import random
-import firebase_admin
-from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -93,19 +91,20 @@ GRIEVANCE_DESCRIPTIONS = [
 ]
 
 def main():
-    # Check if Firebase app is already initialized
-    if not firebase_admin._apps:
-        # Initialize Firebase Admin SDK
-        try:
-            cred = credentials.Certificate("service_account.json")
-            firebase_admin.initialize_app(cred)
-        except Exception as e:
-            print(f"Error initializing Firebase: {e}")
-            sys.exit(1)
+    # Initialize Firebase through the same client provider as the web application
+    try:
+        from app.models.clients import get_clients
+        get_clients()
+    except ImportError as e:
+        print(f"Error importing required modules: {e}")
+        print("Make sure you're running this script from the project root directory.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error initializing Firebase: {e}")
+        sys.exit(1)
     
-    # Import after Firebase initialization to avoid circular imports
     try:
-        from app.models.firebase_utils import create_user, create_grievance
+        from app.models.firebase_utils import create_user, create_grievance, update_grievance_status
     except ImportError as e:
         print(f"Error importing required modules: {e}")
         print("Make sure you're running this script from the project root directory.")
@@ -215,26 +214,11 @@ def main():
                 
                 # Randomly update status for some grievances
                 if random.random() > 0.3:  # 70% chance to have a status other than pending
-                    # Connect to Firestore directly for this update
-                    db = firestore.client()
-                    grievance_ref = db.collection('grievances').document(grievance_id)
-                    
                     # Choose a random status
                     status = random.choice(STATUSES)
                     
-                    # Create a status history entry
-                    status_update = {
-                        'status': status,
-                        'timestamp': firestore.SERVER_TIMESTAMP,
-                        'note': f'Status updated to {status} (test data)'
-                    }
-                    
-                    # Update the grievance
-                    grievance_ref.update({
-                        'status': status,
-                        'updatedAt': firestore.SERVER_TIMESTAMP,
-                        'statusHistory': firestore.ArrayUnion([status_update])
-                    })
+                    # Update through the shared helper so the dashboard counters stay in sync
+                    update_grievance_status(grievance_id, status, f'Status updated to {status} (test data)')
                     
                     print(f"    ↪ Status updated to '{status}'")
             except Exception as e:
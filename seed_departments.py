@@ -1,5 +1,3 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
 from dotenv import load_dotenv
 import sys
@@ -94,24 +92,17 @@ DUT_DEPARTMENTS = {
 }
 
 def initialize_firebase():
-    """Initialize Firebase Admin SDK if not already initialized."""
+    """Initialize Firebase through the same client provider as the web application."""
     try:
-        # Try to get existing app
-        return firebase_admin.get_app()
-    except ValueError:
-        # If no app exists, initialize with credentials
-        try:
-            # Load service account
-            service_account_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service_account.json')
-            cred = credentials.Certificate(service_account_path)
-            return firebase_admin.initialize_app(cred)
-        except Exception as e:
-            print(f"Error initializing Firebase: {e}")
-            print("\nTroubleshooting tips:")
-            print("1. Verify that 'service_account.json' exists in the project root directory")
-            print("2. Check that the file has valid credentials")
-            print("3. Ensure you have proper permissions to the Firebase project")
-            sys.exit(1)
+        from app.models.clients import get_clients
+        return get_clients()
+    except Exception as e:
+        print(f"Error initializing Firebase: {e}")
+        print("\nTroubleshooting tips:")
+        print("1. Set SERVICE_ACCOUNT or place 'service_account.json' in the project root directory")
+        print("2. Check that the file has valid credentials")
+        print("3. Ensure you have proper permissions to the Firebase project")
+        sys.exit(1)
 
 def seed_departments(db):
     """Seed the departments into Firestore."""
@@ -151,9 +142,9 @@ def main():
     
     # Initialize Firebase
     try:
-        app = initialize_firebase()
+        clients = initialize_firebase()
         print("Firebase initialized successfully.")
-        db = firestore.client()
+        db = clients.db
     except Exception as e:
         print(f"Error initializing Firebase: {e}")
         return
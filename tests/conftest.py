@@ -0,0 +1,57 @@
+"""
+Tests run the application on the in-memory data backend (see
+app/models/local_store.py), so they need no Firebase project or network.
+"""
+
+import os
+import tempfile
+
+# Must be set before the application is imported
+os.environ['DATA_BACKEND'] = 'memory'
+os.environ['SESSION_BACKEND'] = 'memory'
+os.environ['SECRET_KEY'] = 'test-secret-key'
+os.environ['EMAIL_USER'] = ''
+os.environ['EMAIL_SPOOL_DIR'] = tempfile.mkdtemp(prefix='grievance-test-spool-')
+os.environ['METRICS_ENABLED'] = '0'
+
+import pytest
+
+from app import create_app
+from app.models import firebase_utils
+
+@pytest.fixture(autouse=True)
+def clean_store():
+    """Start every test with an empty store and empty caches"""
+    firebase_utils.db.reset()
+    firebase_utils.auth.reset()
+    for cache in (firebase_utils.user_profile_cache, firebase_utils.version_cache,
+                  firebase_utils.department_cache):
+        cache.invalidate()
+    firebase_utils.search_index.clear()
+    firebase_utils.duplicate_index.clear()
+    yield
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.testing = True
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def login():
+    """login(client, email, role=...) creates an account and logs the client in; returns the user ID"""
+    def login(client, email, password='password123', display_name='Test User', role='student'):
+        user_id = firebase_utils.create_user(email, password, display_name, role=role)
+        response = client.post('/auth/login', data={'email': email, 'password': password})
+        assert response.status_code == 302
+        return user_id
+    return login
+
+@pytest.fixture
+def admin_client(client, login):
+    login(client, 'admin@dut.ac.za', display_name='Admin', role='admin')
+    return client
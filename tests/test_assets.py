@@ -0,0 +1,38 @@
+import os
+
+from flask import Flask, render_template_string
+
+from app.models.assets import VENDOR_FILES, build_assets, install_assets, load_manifest
+
+CHART_JS = 'vendor/chart.js/chart.min.js'
+
+def _app(static_folder):
+    app = Flask(__name__, static_folder=str(static_folder), static_url_path='/static')
+    install_assets(app)
+    return app
+
+def _vendor_url(app, path):
+    with app.test_request_context():
+        return render_template_string("{{ vendor_url(path) }}", path=path)
+
+def test_missing_vendor_file_links_to_the_pinned_cdn_copy(tmp_path):
+    assert _vendor_url(_app(tmp_path), CHART_JS) == VENDOR_FILES[CHART_JS]
+
+def test_committed_vendor_file_is_served_locally(tmp_path):
+    os.makedirs(tmp_path / 'vendor' / 'chart.js')
+    (tmp_path / 'vendor' / 'chart.js' / 'chart.min.js').write_text('window.Chart = {};')
+    app = _app(tmp_path)
+    assert _vendor_url(app, CHART_JS) == '/static/vendor/chart.js/chart.min.js'
+    assert app.test_client().get('/static/vendor/chart.js/chart.min.js').status_code == 200
+
+def test_build_fingerprints_files_without_the_vendor_files(tmp_path):
+    os.makedirs(tmp_path / 'js')
+    (tmp_path / 'js' / 'main.js').write_text('function hello() {\n    return "hello";\n}\n' * 20)
+    files, _ = build_assets(str(tmp_path))
+    assert set(files) == {'js/main.js'}
+    assert set(load_manifest(str(tmp_path))) == {'js/main.js'}
+
+def test_dashboard_loads_chart_js(admin_client):
+    response = admin_client.get('/admin/dashboard')
+    assert response.status_code == 200
+    assert 'chart.min.js' in response.get_data(as_text=True)
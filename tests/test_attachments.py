@@ -0,0 +1,52 @@
+import io
+import hashlib
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.models import firebase_utils
+
+# A Word 97 file signature; no preview is made for these
+DOC_CONTENT = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'grievance evidence' * 20
+
+def _file(content=DOC_CONTENT, filename='evidence.doc'):
+    return FileStorage(io.BytesIO(content), filename=filename)
+
+def _grievance():
+    return firebase_utils.create_grievance('student-1', 'Wifi down', 'No signal in the library', 'IT')
+
+def _blob(content=DOC_CONTENT):
+    return firebase_utils._blob_ref(hashlib.sha256(content).hexdigest()).get().to_dict()
+
+def test_identical_uploads_share_one_stored_file():
+    first, second = _grievance(), _grievance()
+    firebase_utils.upload_attachment(_file(), first)
+    firebase_utils.upload_attachment(_file(filename='copy.doc'), second)
+
+    assert _blob()['refCount'] == 2
+    urls = {attachment['url'] for grievance_id in (first, second)
+            for attachment in firebase_utils.get_grievance_attachments(grievance_id)['items']}
+    assert len(urls) == 1
+
+def test_batch_upload_counts_each_reference():
+    grievance_id = _grievance()
+    results = firebase_utils.upload_attachments([_file(), _file(filename='again.doc')], grievance_id)
+    assert all(url and error is None for url, error in results)
+    assert _blob()['refCount'] == 2
+    assert firebase_utils.get_grievance_by_id(grievance_id)['attachmentCount'] == 2
+
+def test_release_drops_the_references():
+    first, second = _grievance(), _grievance()
+    firebase_utils.upload_attachment(_file(), first)
+    firebase_utils.upload_attachment(_file(), second)
+
+    attachments = firebase_utils.get_grievance_attachments(first)['items']
+    assert firebase_utils.release_attachments(attachments) == {attachments[0]['sha256']: 1}
+    assert _blob()['refCount'] == 1
+
+    firebase_utils.release_attachments(firebase_utils.get_grievance_attachments(second)['items'])
+    assert _blob()['refCount'] == 0
+
+def test_mismatched_content_is_rejected():
+    with pytest.raises(ValueError):
+        firebase_utils.upload_attachment(_file(b'%PDF-1.4 not a word file'), _grievance())
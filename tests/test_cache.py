@@ -0,0 +1,64 @@
+import threading
+
+from app.models.cache import TTLCache
+
+def test_get_or_load_caches_the_value():
+    cache = TTLCache()
+    calls = []
+    loader = lambda: calls.append(1) or 'value'
+    assert cache.get_or_load('key', loader) == 'value'
+    assert cache.get_or_load('key', loader) == 'value'
+    assert len(calls) == 1
+
+def test_invalidate_drops_the_value():
+    cache = TTLCache()
+    cache.set('key', 'old')
+    cache.invalidate('key')
+    assert cache.get('key') is None
+    assert cache.get_or_load('key', lambda: 'new') == 'new'
+
+def test_expired_values_are_reloaded():
+    cache = TTLCache(ttl=0)
+    cache.set('key', 'old')
+    assert cache.get('key') is None
+
+def test_value_loaded_across_an_invalidation_is_not_stored():
+    cache = TTLCache()
+    loading = threading.Event()
+    invalidated = threading.Event()
+
+    def slow_loader():
+        # The data changes (and the cache is invalidated) while this read is in flight
+        loading.set()
+        invalidated.wait(5)
+        return 'stale'
+
+    results = []
+    reader = threading.Thread(target=lambda: results.append(cache.get_or_load('key', slow_loader)))
+    reader.start()
+    loading.wait(5)
+    cache.invalidate('key')
+    invalidated.set()
+    reader.join(5)
+
+    assert results == ['stale']
+    assert cache.get('key') is None
+    assert cache.get_or_load('key', lambda: 'fresh') == 'fresh'
+
+def test_values_are_copied():
+    cache = TTLCache()
+    value = {'items': [1]}
+    cache.set('key', value)
+    value['items'].append(2)
+    cache.get('key')['items'].append(3)
+    assert cache.get('key') == {'items': [1]}
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,59 @@
+from app.models import firebase_utils
+
+def _get(client, url, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(url, headers=headers)
+
+def _validated(client, url):
+    """ETag of a first full response, after showing the login's flashed message"""
+    client.get('/admin/dashboard')
+    response = _get(client, url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    return response.headers['ETag']
+
+def test_unchanged_list_is_not_modified(admin_client):
+    firebase_utils.create_grievance('student-1', 'Wifi down', 'No signal in the library', 'IT')
+    etag = _validated(admin_client, '/admin/grievances/all')
+
+    response = _get(admin_client, '/admin/grievances/all', etag)
+    assert response.status_code == 304
+    assert response.data == b''
+
+def test_new_grievance_changes_the_list(admin_client):
+    firebase_utils.create_grievance('student-1', 'Wifi down', 'No signal in the library', 'IT')
+    etag = _validated(admin_client, '/admin/grievances/all')
+
+    firebase_utils.create_grievance('student-2', 'Broken heater', 'Room 12 is cold', 'Facilities')
+    response = _get(admin_client, '/admin/grievances/all', etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_student_profile_change_changes_the_list(admin_client):
+    student_id = firebase_utils.create_user('old@dut.ac.za', 'password123', 'Student')
+    firebase_utils.create_grievance(student_id, 'Wifi down', 'No signal in the library', 'IT')
+    etag = _validated(admin_client, '/admin/grievances/all')
+
+    # The list shows each student's email, so changing it must not be answered with 304
+    assert firebase_utils.update_user(student_id, {'email': 'new@dut.ac.za'})
+    response = _get(admin_client, '/admin/grievances/all', etag)
+    assert response.status_code == 200
+    assert b'new@dut.ac.za' in response.data
+
+def test_status_update_changes_the_grievance_page(admin_client):
+    grievance_id = firebase_utils.create_grievance('student-1', 'Wifi down', 'No signal in the library', 'IT')
+    url = f'/admin/grievance/{grievance_id}'
+    etag = _validated(admin_client, url)
+    assert _get(admin_client, url, etag).status_code == 304
+
+    firebase_utils.update_grievance_status(grievance_id, 'in-progress', 'Looking into it')
+    assert _get(admin_client, url, etag).status_code == 200
+
+def test_etag_is_per_user(admin_client, app, login):
+    firebase_utils.create_grievance('student-1', 'Wifi down', 'No signal in the library', 'IT')
+    etag = _validated(admin_client, '/admin/grievances/all')
+
+    other = app.test_client()
+    login(other, 'admin2@dut.ac.za', role='admin')
+    other.get('/admin/dashboard')
+    assert _get(other, '/admin/grievances/all', etag).status_code == 200
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models import firebase_utils
+from app.models.export_utils import grievances_to_csv, grievances_to_jsonl
+
+def _grievance(**fields):
+    return {
+        'id': 'g1', 'studentId': 's1', 'title': 'Wifi down', 'description': 'No signal',
+        'department': 'IT', 'status': 'pending',
+        'createdAt': datetime(2024, 3, 1, 10, 0, tzinfo=timezone.utc),
+        'updatedAt': datetime(2024, 3, 2, 10, 0, tzinfo=timezone.utc),
+        **fields
+    }
+
+def _csv_rows(grievances):
+    return list(csv.DictReader(io.StringIO(''.join(grievances_to_csv(grievances)))))
+
+def test_csv_writes_header_and_rows():
+    rows = _csv_rows([_grievance(), _grievance(id='g2')])
+    assert [row['id'] for row in rows] == ['g1', 'g2']
+    assert rows[0]['title'] == 'Wifi down'
+    assert rows[0]['createdAt'] == '2024-03-01T10:00:00+00:00'
+
+@pytest.mark.parametrize('text', [
+    '=HYPERLINK("http://evil.example","click")',
+    '+1+1',
+    '-2+3',
+    '@SUM(A1:A2)',
+    '\t=1+1',
+    '\r=1+1',
+    "=cmd|' /C calc'!A0"
+])
+def test_csv_neutralises_formulas(text):
+    row = _csv_rows([_grievance(title=text, description=text)])[0]
+    assert row['title'] == "'" + text
+    assert row['description'] == "'" + text
+
+def test_csv_leaves_plain_text_alone():
+    row = _csv_rows([_grievance(title='Broken = fixed?', description='Email me @ home')])[0]
+    assert row['title'] == 'Broken = fixed?'
+    assert row['description'] == 'Email me @ home'
+
+def test_jsonl_keeps_values_unchanged():
+    line = ''.join(grievances_to_jsonl([_grievance(title='=1+1')]))
+    assert json.loads(line)['title'] == '=1+1'
+
+def test_export_route_streams_the_filtered_grievances(admin_client):
+    firebase_utils.create_grievance('student-1', '=cmd|calc', 'Formula in the title', 'IT')
+    firebase_utils.create_grievance('student-2', 'Broken heater', 'Room 12 is cold', 'Facilities')
+
+    response = admin_client.get('/admin/grievances/export?format=csv&department=IT')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment; filename="grievances-' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['title'] for row in rows] == ["'=cmd|calc"]
+
+def test_export_route_rejects_unknown_formats(admin_client):
+    response = admin_client.get('/admin/grievances/export?format=xlsx')
+    assert response.status_code == 302
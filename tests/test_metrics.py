@@ -0,0 +1,20 @@
+# Instrumentation is off in the tests (METRICS_ENABLED=0), so a request that
+# is let through gets 404 rather than the metrics
+
+def test_metrics_are_private_without_a_token(client, monkeypatch):
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    assert client.get('/metrics').status_code == 401
+
+def test_students_cannot_see_the_metrics(client, login, monkeypatch):
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    login(client, 'student@dut.ac.za')
+    assert client.get('/metrics').status_code == 401
+
+def test_admins_can_see_the_metrics(admin_client, monkeypatch):
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    assert admin_client.get('/metrics').status_code == 404
+
+def test_scrapers_need_the_token(client, monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', 'scrape-token')
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'}).status_code == 404
@@ -0,0 +1,50 @@
+from app.models import firebase_utils
+
+def _create_grievances(count, department='IT'):
+    return [firebase_utils.create_grievance('student-1', f'Grievance {i}', f'Description number {i}', department)
+            for i in range(count)]
+
+def _ids(page):
+    return [grievance['id'] for grievance in page['items']]
+
+def test_pages_cover_every_grievance_once():
+    created = _create_grievances(12)
+    seen = []
+    cursor = None
+    while True:
+        page = firebase_utils.get_all_grievances_page(page_size=5, cursor=cursor)
+        seen.extend(_ids(page))
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 12
+    assert set(seen) == set(created)
+
+def test_previous_cursor_returns_the_previous_page():
+    _create_grievances(12)
+    first = firebase_utils.get_all_grievances_page(page_size=5)
+    second = firebase_utils.get_all_grievances_page(page_size=5, cursor=first['next_cursor'])
+    assert not set(_ids(first)) & set(_ids(second))
+    assert first['prev_cursor'] is None
+
+    back = firebase_utils.get_all_grievances_page(page_size=5, cursor=second['prev_cursor'])
+    assert _ids(back) == _ids(first)
+
+def test_last_page_has_no_next_cursor():
+    _create_grievances(7)
+    first = firebase_utils.get_all_grievances_page(page_size=5)
+    last = firebase_utils.get_all_grievances_page(page_size=5, cursor=first['next_cursor'])
+    assert len(last['items']) == 2
+    assert last['next_cursor'] is None
+
+def test_department_pages_only_hold_that_department():
+    it_ids = _create_grievances(4, department='IT')
+    _create_grievances(3, department='Finance')
+    page = firebase_utils.get_department_grievances_page('IT', page_size=10)
+    assert set(_ids(page)) == set(it_ids)
+
+def test_invalid_cursor_starts_from_the_first_page():
+    _create_grievances(3)
+    first = firebase_utils.get_all_grievances_page(page_size=2)
+    page = firebase_utils.get_all_grievances_page(page_size=2, cursor='not-a-cursor')
+    assert _ids(page) == _ids(first)
@@ -0,0 +1,87 @@
+import time
+
+from app.models import session_store
+from app.models.session_store import MemoryStore
+
+class Clock:
+    """Stands in for time.time in the session store"""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+def test_memory_store_entries_expire(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, 'time', clock)
+    store = MemoryStore()
+    store.setex('key', 60, 'value')
+
+    clock.now += 59
+    assert store.get('key') == 'value'
+    clock.now += 2
+    assert store.get('key') is None
+
+def test_memory_store_expire_extends_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, 'time', clock)
+    store = MemoryStore()
+    store.setex('key', 60, 'value')
+
+    clock.now += 50
+    assert store.expire('key', 60)
+    clock.now += 50
+    assert store.get('key') == 'value'
+    assert not store.expire('missing', 60)
+
+def test_sqlite_store_entries_expire(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, 'time', clock)
+    store = session_store.SQLiteStore(str(tmp_path / 'sessions.sqlite3'))
+    store.setex('key', 60, 'value')
+    assert store.get('key') == 'value'
+
+    clock.now += 61
+    assert store.get('key') is None
+
+def test_session_expires_after_its_lifetime(app, client, login, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, 'time', clock)
+    login(client, 'student@dut.ac.za')
+    assert client.get('/student/dashboard').status_code == 200
+
+    clock.now += app.permanent_session_lifetime.total_seconds() + 1
+    response = client.get('/student/dashboard')
+    assert response.status_code == 302
+    assert '/auth/login' in response.headers['Location']
+
+def test_login_starts_a_new_session(app, client, login):
+    # A rejected registration flashes a message for the next page, which needs a session
+    client.post('/auth/register', data={'email': 'someone@example.com', 'password': 'password123'})
+    before = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    login(client, 'student@dut.ac.za')
+    after = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    assert before is not None and after is not None
+    assert before.value != after.value
+
+def test_logout_removes_the_session(client, login):
+    login(client, 'student@dut.ac.za')
+    client.get('/auth/logout')
+    assert client.get('/student/dashboard').status_code == 302
+
+def test_activity_renews_the_session(app, client, login, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, 'time', clock)
+    login(client, 'student@dut.ac.za')
+    lifetime = app.permanent_session_lifetime.total_seconds()
+
+    # Each visit within the lifetime starts it again
+    for _ in range(3):
+        clock.now += lifetime * 0.75
+        assert client.get('/student/dashboard').status_code == 200
+
+def test_login_sets_a_persistent_cookie(app, client, login):
+    login(client, 'student@dut.ac.za')
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    assert cookie.expires is not None